@@ -0,0 +1,416 @@
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import blake2b
+from os import cpu_count, scandir, stat_result, makedirs, replace, getpid
+from sys import argv
+from math import log10, log2, sqrt, exp, cos, pi
+from cmath import exp as complex_exp
+from array import array
+from operator import mul
+from struct import pack
+from time import perf_counter
+from typing import Union
+
+from wav import read_wav_info, stream_wav_blocks, map_wav_data, WavInfo, WavFormatError, WAVE_FORMAT_PCM
+from mixer import audioop, numpy, can_use_numpy, to_samples
+from library import LibraryCache, load_metadata, list_lyrics_song_names, get_cache_key
+from features import FeatureTable, FEATURE_NAMES
+from info import *
+
+# Batch analysis of the songs in a folder. The results are cached with the rest of each song's metadata in the library cache, so the player picks them up the next time it scans the folder
+# Usage: python analysis.py [songs folder]. Lists any duplicate songs that were found once the analysis is done
+# This can be run while the player is running. The player picks up the results at its next library rescan
+# The math is done on whole blocks of samples with NumPy if it's installed (pip install numpy), otherwise with audioop, which was removed in Python 3.13. One of them is needed
+
+ANALYSIS_BLOCK_SIZE:int = 1 << 20 # Analysis doesn't have to keep up with playback, so it reads bigger blocks than the player to spend less time per block
+ANALYSIS_WORKERS:int = cpu_count() or 1 # Analysis is limited by the CPU, so use one process per core
+SILENCE_LEVEL:float = -120 # dBFS. Reported as the level of a song that's completely silent
+SILENCE_THRESHOLD:float = -60 # dBFS. Frames where every sample is at or below this level count as silence when trimming the edges of songs
+SILENCE_SEARCH_SIZES:"list[int]" = [65536, 2048, 64, 1] # The sizes of the chunks (in frames) that the search for the edges of a song's sound narrows down through
+FINGERPRINT_SEGMENTS:int = 32 # The number of equal parts that a song's energy is measured over for its signature
+FINGERPRINT_LEVEL_STEP:float = 3 # dB. Each part's energy is rounded to a multiple of this, so re-encodes of the same song end up with the same signature
+FINGERPRINT_LEVEL_RANGE:int = 7 # The number of steps above or below the song's overall level that a part's energy is clamped to, so each part fits in a single hex digit
+ONSET_RATE:int = 100 # The number of times per second that a song's energy is measured to find its beats
+MIN_BPM:float = 60
+MAX_BPM:float = 200
+PREFERRED_BPM:float = 120 # Tempos closer to this are preferred when a song's beats fit more than one tempo (ex. 70 and 140 BPM)
+CENTROID_WINDOW_FRAMES:int = 1024 # The number of frames that each spectrum is taken over for the spectral centroid. Has to be a power of 2 for fft()
+CENTROID_INTERVAL:float = 0.25 # Seconds between the windows that the spectral centroid is measured in. Measuring every part of a song barely changes its average, and would make analysis without NumPy much slower
+CENTROID_WINDOW_SHAPE:"list[float]" = [0.5 - 0.5 * cos(2 * pi * i / (CENTROID_WINDOW_FRAMES - 1)) for i in range(CENTROID_WINDOW_FRAMES)] # A Hann window (the same as numpy.hanning()), so the edges of the windows don't smear the spectrum
+ANALYSIS_AVAILABLE:bool = numpy != None or audioop != None
+
+class AnalysisUnavailableError(RuntimeError):
+    pass
+
+# Returns the number that a full-scale sample is represented by in this format
+def get_full_scale(info:WavInfo) -> int:
+    return 1 if info.format_tag != WAVE_FORMAT_PCM else 1 << (8 * info.sample_width - 1)
+
+# Returns a fragment of PCM audio as signed samples that audioop can do math on
+def to_signed(block:memoryview, info:WavInfo) -> "Union[bytes, memoryview]":
+    return audioop.bias(block, 1, -128) if info.sample_width == 1 else block # 8-bit WAV samples are unsigned
+
+# Returns the samples of a block of float audio
+def to_floats(block:memoryview, info:WavInfo) -> array:
+    samples:array = array("f" if info.sample_width == 4 else "d")
+    samples.frombytes(block)
+    return samples
+
+# Converts a level relative to full scale (0 to 1) to dBFS
+def to_decibels(level:float) -> float:
+    return max(SILENCE_LEVEL, 20 * log10(level)) if level > 0 else SILENCE_LEVEL
+
+# The following functions measure a whole fragment at a time with NumPy, or with audioop if NumPy isn't installed
+# Without NumPy, float files (which audioop can't read) are measured one sample at a time with the array module, which is much slower
+
+# Returns the sum of the squares of every sample in a fragment of audio
+def get_sum_of_squares(fragment:memoryview, info:WavInfo) -> float:
+    if can_use_numpy(info):
+        samples:numpy.ndarray = to_samples(fragment, info)
+        return float(numpy.dot(samples, samples))
+    if info.format_tag == WAVE_FORMAT_PCM:
+        return audioop.rms(to_signed(fragment, info), info.sample_width) ** 2 * (len(fragment) // info.sample_width)
+    samples:array = to_floats(fragment, info)
+    return sum(map(mul, samples, samples))
+
+# Returns the highest absolute sample in a fragment of audio, in the same units as the samples
+def get_peak(fragment:memoryview, info:WavInfo) -> float:
+    if can_use_numpy(info):
+        return float(numpy.abs(to_samples(fragment, info)).max(initial = 0))
+    if info.format_tag == WAVE_FORMAT_PCM:
+        return audioop.max(to_signed(fragment, info), info.sample_width)
+    return max(map(abs, to_floats(fragment, info)), default = 0)
+
+# Returns the lowest and the highest sample in a fragment of audio, in the same units as the samples
+def get_min_max(fragment:memoryview, info:WavInfo) -> "tuple[float, float]":
+    if len(fragment) == 0:
+        return 0, 0
+    if can_use_numpy(info):
+        samples:numpy.ndarray = to_samples(fragment, info)
+        return float(samples.min()), float(samples.max())
+    if info.format_tag == WAVE_FORMAT_PCM:
+        return audioop.minmax(to_signed(fragment, info), info.sample_width)
+    samples:array = to_floats(fragment, info)
+    return min(samples), max(samples)
+
+# Measures the RMS level and the peak level of a song, both in dBFS
+# The whole file is measured, since the gain is applied to all of it
+def analyze_loudness(file_name:str, info:WavInfo, *_) -> "dict[str, float]":
+    sum_of_squares:float = 0
+    peak:float = 0
+    for block in stream_wav_blocks(file_name, info, ANALYSIS_BLOCK_SIZE):
+        sum_of_squares += get_sum_of_squares(block, info)
+        peak = max(peak, get_peak(block, info))
+
+    full_scale:int = get_full_scale(info)
+    total_samples_count:int = info.frames * info.channels
+    return {"rms" : round(to_decibels(sqrt(sum_of_squares / total_samples_count) / full_scale if total_samples_count > 0 else 0), 2),
+            "peak" : round(to_decibels(peak / full_scale), 2)}
+
+# Returns the first frame (or the last frame if reverse is True) between start and end that has a sample above threshold, or None if they're all silent
+# Whole chunks are checked at once, and only a chunk that has sound in it is searched through in smaller chunks, down to single frames
+def find_sound(data:memoryview, info:WavInfo, threshold:float, start:int, end:int, reverse:bool = False, sizes:"list[int]" = SILENCE_SEARCH_SIZES) -> "Union[int, None]":
+    chunk_starts:range = range(start, end, sizes[0])
+    for chunk_start in (reversed(chunk_starts) if reverse else chunk_starts):
+        chunk_end:int = min(chunk_start + sizes[0], end)
+        if get_peak(data[chunk_start * info.frame_size : chunk_end * info.frame_size], info) > threshold:
+            return chunk_start if sizes[0] == 1 else find_sound(data, info, threshold, chunk_start, chunk_end, reverse, sizes[1:])
+    return None
+
+# Finds the range of frames between the silence at the start and the end of a song, so the silence can be skipped during playback
+# Only the edges of the song are read. Songs that are silent all the way through aren't trimmed
+def analyze_silence(file_name:str, info:WavInfo) -> "dict[str, int]":
+    threshold:float = get_full_scale(info) * 10 ** (SILENCE_THRESHOLD / 20)
+    with map_wav_data(file_name, info) as data:
+        first_frame:int = find_sound(data, info, threshold, 0, info.frames)
+        if first_frame == None:
+            return {"start" : 0, "end" : info.frames}
+        last_frame:int = find_sound(data, info, threshold, first_frame, info.frames, reverse = True)
+    return {"start" : first_frame, "end" : last_frame + 1}
+
+# Fingerprints a song so that copies of it can be found by find_duplicates()
+# hash: a hash of the song's audio, which is the same for files that only differ in their names or their headers
+# signature: the song's length in seconds and the energy of each of FINGERPRINT_SEGMENTS equal parts of it, relative to the song's overall level
+#   The silence at the start and end of the song is left out, and the energy is coarse, so copies that were re-encoded at a different volume, bit depth, or frame rate usually have the same signature
+# The hash and the energy are measured in the same pass over the audio
+# silence: the result of analyze_silence() for the song
+def analyze_fingerprint(file_name:str, info:WavInfo, silence:"dict[str, int]") -> "dict[str, str]":
+    start_frame, end_frame = silence["start"], silence["end"]
+    bounds:list[int] = [start_frame + (end_frame - start_frame) * i // FINGERPRINT_SEGMENTS for i in range(FINGERPRINT_SEGMENTS + 1)] # The frames that each part starts and ends at
+    sums_of_squares:list[float] = [0] * FINGERPRINT_SEGMENTS
+    hasher = blake2b(digest_size = 16)
+
+    segment:int = 0
+    block_end:int = 0 # The frame that the current block ends at
+    for block in stream_wav_blocks(file_name, info, ANALYSIS_BLOCK_SIZE):
+        hasher.update(block)
+        block_start:int = block_end
+        block_end += len(block) // info.frame_size
+        # Add the part of the block that's in each part of the song to that part's energy
+        while segment < FINGERPRINT_SEGMENTS and bounds[segment] < block_end:
+            fragment_start:int = max(bounds[segment], block_start) - block_start
+            fragment_end:int = min(bounds[segment + 1], block_end) - block_start
+            if fragment_end > fragment_start:
+                sums_of_squares[segment] += get_sum_of_squares(block[fragment_start * info.frame_size : fragment_end * info.frame_size], info)
+            if bounds[segment + 1] > block_end: # The part continues in the next block
+                break
+            segment += 1
+
+    full_scale:int = get_full_scale(info)
+    # Returns the RMS level in dBFS of sum_of_squares spread over the frames between start and end
+    def get_level(sum_of_squares:float, start:int, end:int) -> float:
+        samples_count:int = (end - start) * info.channels
+        return to_decibels(sqrt(sum_of_squares / samples_count) / full_scale if samples_count > 0 else 0)
+
+    overall_level:float = get_level(sum(sums_of_squares), start_frame, end_frame)
+    levels:list[int] = [max(-FINGERPRINT_LEVEL_RANGE, min(FINGERPRINT_LEVEL_RANGE, round((get_level(sums_of_squares[i], bounds[i], bounds[i + 1]) - overall_level) / FINGERPRINT_LEVEL_STEP))) for i in range(FINGERPRINT_SEGMENTS)]
+    return {"hash" : hasher.hexdigest(),
+            "signature" : f"{round((end_frame - start_frame) / info.frame_rate)}:" + "".join(format(level + FINGERPRINT_LEVEL_RANGE, "x") for level in levels)}
+
+# Returns the samples of a fragment of audio with its channels mixed down to one
+def to_mono(fragment:memoryview, info:WavInfo) -> "Union[list[float], numpy.ndarray]":
+    if can_use_numpy(info):
+        return to_samples(fragment, info).reshape(-1, info.channels).mean(axis = 1)
+    if info.format_tag != WAVE_FORMAT_PCM:
+        samples:"Union[array, memoryview]" = to_floats(fragment, info)
+    elif info.sample_width == 3:
+        samples = memoryview(audioop.lin2lin(fragment, 3, 4)).cast("i") # memoryview can't read 3-byte samples
+    else:
+        samples = memoryview(to_signed(fragment, info)).cast({1 : "b", 2 : "h", 4 : "i"}[info.sample_width])
+    if info.channels == 1:
+        return list(samples)
+    return [sum(frame) / info.channels for frame in zip(*(samples[channel::info.channels] for channel in range(info.channels)))]
+
+# Returns the discrete Fourier transform of a list of samples, whose length has to be a power of 2
+# An iterative radix-2 FFT, for when NumPy isn't installed. It only ever runs on short windows (see CENTROID_WINDOW_FRAMES), so it's fast enough in pure Python
+def fft(samples:"list[float]") -> "list[complex]":
+    size:int = len(samples)
+    bits:int = size.bit_length() - 1
+    values:"list[complex]" = [complex(samples[int(format(i, f"0{bits}b")[::-1], 2)]) for i in range(size)] if size > 1 else [complex(sample) for sample in samples] # In bit-reversed order, so the butterflies can be done in place
+    span:int = 1
+    while span < size:
+        twiddles:"list[complex]" = [complex_exp(-1j * pi * i / span) for i in range(span)]
+        for group_start in range(0, size, 2 * span):
+            for i in range(span):
+                even:complex = values[group_start + i]
+                odd:complex = values[group_start + i + span] * twiddles[i]
+                values[group_start + i] = even + odd
+                values[group_start + i + span] = even - odd
+        span *= 2
+    return values
+
+# Returns the spectral centroid of a window of CENTROID_WINDOW_FRAMES frames in Hz, which is the average frequency of its spectrum weighted by how strong each frequency is
+# Returns None if the window is quieter than threshold (an RMS level in the same units as the samples), since the spectrum of near-silence is mostly noise
+def get_spectral_centroid(window:memoryview, info:WavInfo, threshold:float) -> "Union[float, None]":
+    samples:"Union[list[float], numpy.ndarray]" = to_mono(window, info)
+    if can_use_numpy(info):
+        if sqrt(float(numpy.dot(samples, samples)) / len(samples)) <= threshold:
+            return None
+        magnitudes:"Union[list[float], numpy.ndarray]" = numpy.abs(numpy.fft.rfft(samples * numpy.hanning(len(samples))))
+        total:float = float(magnitudes.sum())
+        weighted_total:float = float(numpy.dot(numpy.fft.rfftfreq(len(samples), 1 / info.frame_rate), magnitudes))
+    else:
+        if sqrt(sum(map(mul, samples, samples)) / len(samples)) <= threshold:
+            return None
+        magnitudes = [abs(value) for value in fft(list(map(mul, samples, CENTROID_WINDOW_SHAPE)))[:len(samples) // 2 + 1]] # The rest of the spectrum mirrors this half
+        total = sum(magnitudes)
+        weighted_total = sum(i * magnitude for i, magnitude in enumerate(magnitudes)) * info.frame_rate / len(samples)
+    return weighted_total / total if total > 0 else None
+
+# Returns the tempo (in BPM) that best fits the onsets, or None if the song is too short to have a tempo
+# onsets: how much the song's energy rose in each of the song's ONSET_RATE parts per second
+# The onsets are autocorrelated at the delay of every tempo between MIN_BPM and MAX_BPM, so the tempo whose beats line up with the most onsets wins
+def estimate_tempo(onsets:"list[float]") -> "Union[float, None]":
+    min_lag:int = int(60 * ONSET_RATE / MAX_BPM)
+    max_lag:int = int(60 * ONSET_RATE / MIN_BPM) + 1
+    if len(onsets) <= max_lag + 1:
+        return None
+
+    scores:list[float] = [0] * (max_lag + 2)
+    for lag in range(min_lag - 1, max_lag + 2):
+        scores[lag] = sum(map(mul, onsets, onsets[lag:])) / (len(onsets) - lag)
+    # Weights each tempo by how close it is to PREFERRED_BPM in octaves
+    def get_weight(lag:float) -> float:
+        return exp(-0.5 * log2(60 * ONSET_RATE / lag / PREFERRED_BPM) ** 2)
+    best_lag:int = max(range(min_lag, max_lag + 1), key = lambda lag : scores[lag] * get_weight(lag))
+    if scores[best_lag] <= 0:
+        return None
+
+    # Find where the peak is between the lags around the best lag, so the tempo isn't limited to the delays that were measured
+    previous_score, score, next_score = scores[best_lag - 1 : best_lag + 2]
+    curvature:float = previous_score - 2 * score + next_score
+    offset:float = 0.5 * (previous_score - next_score) / curvature if curvature < 0 else 0
+    return 60 * ONSET_RATE / (best_lag + max(-0.5, min(0.5, offset)))
+
+# Measures a song's tempo, its RMS energy, and its spectral centroid, for shuffle and smart playlists to filter by
+# Everything is measured over the part of the song between the silence at its start and end
+# The tempo comes from how the energy of the song's ONSET_RATE parts per second rises and falls (see estimate_tempo())
+# The spectral centroid is how bright a song sounds. It's averaged over windows of CENTROID_WINDOW_FRAMES frames taken every CENTROID_INTERVAL seconds (see get_spectral_centroid())
+#   Only the windows that are louder than SILENCE_THRESHOLD are counted, so quiet passages and pauses in the middle of a song don't skew it
+# Returns a dict in the form of {"bpm" : float or None, "energy" : dBFS, "spectral_centroid" : Hz or None}
+def analyze_features(file_name:str, info:WavInfo, silence:"dict[str, int]") -> "dict[str, Union[float, None]]":
+    start_frame, end_frame = silence["start"], silence["end"]
+    part_frames:int = max(1, info.frame_rate // ONSET_RATE)
+    threshold:float = get_full_scale(info) * 10 ** (SILENCE_THRESHOLD / 20) # The RMS level that a window has to be above for its spectral centroid to be counted
+    window_step:int = max(CENTROID_WINDOW_FRAMES, int(CENTROID_INTERVAL * info.frame_rate))
+
+    sum_of_squares:float = 0
+    centroids:"list[float]" = []
+    onsets:list[float] = []
+    previous_level:float = 0
+    with map_wav_data(file_name, info) as data:
+        for part_start in range(start_frame, end_frame, part_frames):
+            with data[part_start * info.frame_size : min(part_start + part_frames, end_frame) * info.frame_size] as part: # Released right away, since the file can't be unmapped while any part of it is still in use
+                part_sum_of_squares:float = get_sum_of_squares(part, info)
+                sum_of_squares += part_sum_of_squares
+
+                level:float = sqrt(part_sum_of_squares / (len(part) // info.sample_width))
+                onsets.append(max(0, level - previous_level)) # Beats are where the energy rises, not where it falls
+                previous_level = level
+
+        for window_start in range(start_frame, end_frame - CENTROID_WINDOW_FRAMES + 1, window_step):
+            with data[window_start * info.frame_size : (window_start + CENTROID_WINDOW_FRAMES) * info.frame_size] as window:
+                centroid:Union[float, None] = get_spectral_centroid(window, info, threshold)
+            if centroid != None:
+                centroids.append(centroid)
+
+    samples_count:int = (end_frame - start_frame) * info.channels
+    bpm:Union[float, None] = estimate_tempo(onsets)
+    return {"bpm" : round(bpm, 2) if bpm != None else None,
+            "energy" : round(to_decibels(sqrt(sum_of_squares / samples_count) / get_full_scale(info) if samples_count > 0 else 0), 2),
+            "spectral_centroid" : round(sum(centroids) / len(centroids), 1) if len(centroids) > 0 else None}
+
+# Saves an overview to its own file in OVERVIEWS_DIRECTORY, so song.load_overview() can load it with a single small read
+def save_overview(overview_name:str, overview:bytes) -> None:
+    makedirs(OVERVIEWS_DIRECTORY, exist_ok = True)
+    # Write to a temporary file first, so a song is never shown with half of its overview. Other workers might be saving the same overview at the same time
+    temporary_path:str = f"{OVERVIEWS_DIRECTORY}/{overview_name}.{getpid()}.tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(overview)
+    replace(temporary_path, f"{OVERVIEWS_DIRECTORY}/{overview_name}.bin")
+
+# Measures the lowest and the highest sample in each of OVERVIEW_BUCKETS equal parts of a song, for the waveform progress bar
+# The silence at the start and end of the song is left out, so the overview lines up with the part of the song that's played
+# Each part is stored as a pair of signed bytes relative to full scale. The overview is named after a hash of itself, so songs with the same overview share a file
+# Returns the overview's name
+def analyze_overview(file_name:str, info:WavInfo, silence:"dict[str, int]") -> str:
+    start_frame, end_frame = silence["start"], silence["end"]
+    full_scale:int = get_full_scale(info)
+
+    overview:bytearray = bytearray()
+    with map_wav_data(file_name, info) as data:
+        for i in range(OVERVIEW_BUCKETS):
+            bucket_start:int = start_frame + (end_frame - start_frame) * i // OVERVIEW_BUCKETS
+            bucket_end:int = start_frame + (end_frame - start_frame) * (i + 1) // OVERVIEW_BUCKETS
+            low, high = get_min_max(data[bucket_start * info.frame_size : bucket_end * info.frame_size], info)
+            overview += pack("bb", max(-127, round(low / full_scale * 127)), min(127, round(high / full_scale * 127)))
+
+    overview_name:str = blake2b(overview, digest_size = 8).hexdigest()
+    save_overview(overview_name, overview)
+    return overview_name
+
+# Each analyzer measures one thing about a song. Its results are cached in the song's metadata under its name
+# Every analyzer is given the song's file name, its info, and the result of analyze_silence(), which is only found once per song
+ANALYZERS:"dict[str, function]" = {
+    "loudness" : analyze_loudness,
+    "silence" : lambda file_name, info, silence : silence,
+    "fingerprint" : analyze_fingerprint,
+    "overview" : analyze_overview,
+    "features" : analyze_features
+}
+
+# Runs the analyzers on a file in a worker process. Returns a dict of their results keyed by analyzer name, or None if the file couldn't be read
+# silence: the song's cached silence, if it was already analyzed
+# Any other error is raised, so a bug in an analyzer (or a missing dependency) stops the analysis instead of looking like an unreadable file
+def analyze_file(file_name:str, analyzer_names:"list[str]", silence:"dict[str, int]" = None) -> "Union[dict[str, dict[str, any]], None]":
+    try:
+        info:WavInfo = read_wav_info(file_name)
+        if silence == None:
+            silence = analyze_silence(file_name, info)
+        return {analyzer_name : ANALYZERS[analyzer_name](file_name, info, silence) for analyzer_name in analyzer_names}
+    except (OSError, WavFormatError): # The file was removed or changed while it was being analyzed. It's tried again the next time the folder is analyzed
+        return None
+
+# Analyzes every song in the folder that doesn't already have results for every analyzer cached
+# A song's cached results are dropped whenever its file changes, so only new and changed files are analyzed
+# The feature table is then rebuilt from the cached features of every song in the folder
+# Returns the number of files that were analyzed. Raises AnalysisUnavailableError if neither NumPy nor audioop can be imported
+def analyze_library(directory:str, cache:LibraryCache, analyzer_names:"list[str]" = None, max_workers:int = ANALYSIS_WORKERS, silent:bool = False) -> int:
+    if not ANALYSIS_AVAILABLE:
+        raise AnalysisUnavailableError("Analyzing songs needs NumPy (pip install numpy), or audioop, which was removed in Python 3.13 (pip install audioop-lts)")
+    start_time:float = perf_counter()
+    analyzer_names = analyzer_names or list(ANALYZERS.keys())
+    lyrics_song_names:set[str] = list_lyrics_song_names()
+
+    # Each job is in the form of (file name, stat result, metadata, names of the analyzers that need to run)
+    jobs:list[tuple[str, stat_result, dict[str, any], list[str]]] = []
+    file_names:list[str] = [] # Every readable song in the folder
+    for entry in scandir(directory):
+        if not (entry.is_file() and entry.name.endswith(".wav")):
+            continue
+        file_name:str = f"{directory}/{entry.name}"
+        stat:stat_result = entry.stat()
+        try:
+            metadata:dict[str, any] = load_metadata(entry.name[:-4], file_name, stat, cache, lyrics_song_names)
+        except Exception: # Not a readable wav file
+            continue
+        file_names.append(file_name)
+        missing_analyzer_names:list[str] = [analyzer_name for analyzer_name in analyzer_names if analyzer_name not in metadata]
+        if "features" in analyzer_names and "features" in metadata and not set(FEATURE_NAMES) <= metadata["features"].keys(): # Measured before the current set of features
+            missing_analyzer_names.append("features")
+        if missing_analyzer_names:
+            jobs.append((file_name, stat, metadata, missing_analyzer_names))
+
+    analyzed_count:int = 0
+    if len(jobs) > 0:
+        with ProcessPoolExecutor(max_workers = max(1, min(max_workers, len(jobs)))) as executor:
+            results_list = executor.map(analyze_file, [job[0] for job in jobs], [job[3] for job in jobs], [job[2].get("silence") for job in jobs], chunksize = max(1, len(jobs) // (max_workers * 8))) # Small chunks keep every worker busy until the end
+            for (file_name, stat, metadata, _), results in zip(jobs, results_list):
+                if results != None:
+                    cache.put(file_name, stat, {**metadata, **results})
+                    analyzed_count += 1
+    cache.save()
+    FeatureTable.from_metadata({get_cache_key(file_name) : cache.peek(file_name) for file_name in file_names}).save()
+
+    if not silent:
+        print(color(f"Analyzed {analyzed_count} files in {perf_counter() - start_time:.2f}s", Colors.faint))
+        if analyzed_count < len(jobs):
+            print(color(f"{len(jobs) - analyzed_count} files changed or were removed while they were being analyzed. Run this again to analyze them", Colors.orange))
+    return analyzed_count
+
+# Groups the files whose fingerprints match, using the fingerprints cached by analyze_library()
+# file_names: the files to look for duplicates among. Files that haven't been fingerprinted yet are left out
+# Returns a list of groups in the form of (file names in the same order as file_names, whether the files are exact copies), with every group having at least 2 files
+# Exact copies have the same hash. Files whose signatures match but whose audio is different are grouped as similar audio, which is only a hint, since different songs can have the same signature
+# The exact copies come first. A file can be in a group of exact copies and in a group of similar audio at once
+def find_duplicates(cache:LibraryCache, file_names:"list[str]") -> "list[tuple[list[str], bool]]":
+    exact_groups:dict[str, list[str]] = {}
+    similar_groups:dict[str, list[str]] = {}
+    hashes:dict[str, str] = {}
+    for file_name in file_names:
+        fingerprint:dict[str, str] = (cache.peek(file_name) or {}).get("fingerprint")
+        if fingerprint:
+            exact_groups.setdefault(fingerprint["hash"], []).append(file_name)
+            similar_groups.setdefault(fingerprint["signature"], []).append(file_name)
+            hashes[file_name] = fingerprint["hash"]
+
+    return ([(group, True) for group in exact_groups.values() if len(group) > 1]
+            + [(group, False) for group in similar_groups.values() if len({hashes[file_name] for file_name in group}) > 1])
+
+# Prints each group of duplicates returned by find_duplicates()
+def print_duplicates(duplicates:"list[tuple[list[str], bool]]") -> None:
+    if not duplicates:
+        print("No duplicates found")
+    for group, exact in duplicates:
+        print(color("Exact copies:" if exact else "Similar audio:", Colors.bold))
+        for file_name in group:
+            print(f"    {file_name}")
+
+if __name__ == "__main__":
+    directory:str = argv[1] if len(argv) > 1 else "songs"
+    library_cache:LibraryCache = LibraryCache()
+    try:
+        analyze_library(directory, library_cache)
+    except AnalysisUnavailableError as error:
+        print(color(str(error), Colors.red))
+        exit(1)
+    print_duplicates(find_duplicates(library_cache, sorted(f"{directory}/{entry.name}" for entry in scandir(directory) if entry.name.endswith(".wav"))))
@@ -0,0 +1,460 @@
+from threading import Condition, Thread
+from time import monotonic, perf_counter
+from mmap import PAGESIZE
+from os import makedirs, remove
+from os.path import basename
+from tempfile import mkstemp
+from typing import Union, Iterator, BinaryIO
+
+from wav import read_wav_info, stream_wav_blocks, make_wav_header, WavInfo, WavFormatError
+from mixer import crossfade_blocks, scale_blocks, can_crossfade, MIXING_AVAILABLE
+
+try:
+    from winsound import PlaySound, SND_ASYNC
+except ImportError: # winsound is only available on Windows
+    PlaySound = None
+
+PLAYBACK_BLOCK_SIZE:int = 16384 # The number of bytes of audio that are written to the output at a time. Bounds the memory used to play a song, no matter how long the song is
+
+# Yields first_block and then the rest of blocks. Closing the returned generator also closes blocks
+def prepend_block(first_block:memoryview, blocks:"Iterator[memoryview]") -> "Iterator[memoryview]":
+    try:
+        yield first_block
+        yield from blocks
+    finally:
+        blocks.close()
+
+# Returns the frame that a song in this format stops playing at. end_frame is clamped to the song's audio, and None means the end of the audio
+def get_end_frame(info:WavInfo, end_frame:"Union[int, None]") -> int:
+    return max(0, min(end_frame, info.frames)) if end_frame != None else info.frames
+
+# An audio output that songs are played through
+# Subclasses override open(), write(), and close() to send PCM audio somewhere. play_file() then streams a WAV file to the output on its own thread
+# write() blocks until the output has accepted the audio, so the thread that writes the audio is paced by the output
+# Positions are in frames from the start of the song's audio, so playback can start from, and seek to, any frame
+class AudioOutput:
+    supports_crossfade:bool = MIXING_AVAILABLE # Whether play_file() can mix the next song into the end of the current one
+    CROSSFADE_UNAVAILABLE_MESSAGE:str = "Crossfading needs NumPy (pip install numpy), or audioop, which was removed in Python 3.13" # Shown when the user tries to turn on crossfade while supports_crossfade is False
+    supports_gain:bool = True # Whether play_file() applies the gain it's given, such as a song's loudness normalization
+    supports_seeking:bool = True # Whether starting partway through a song is as cheap as starting at its beginning
+
+    def __init__(self):
+        self.condition:Condition = Condition() # Wakes up the writing thread when the output is paused, resumed, or stopped
+        self.info:WavInfo = None # The format of the audio that's being written
+        self.file_name:str = None # The file that's currently being played
+        self.start_frame:int = 0 # The frame that the audio being written started from
+        self.end_frame:int = 0 # The frame that the current song stops at, such as where the silence at the end of the song starts
+        self.gain:float = 1 # What the current song's samples are multiplied by
+        self.paused:bool = False
+        self.stopped:bool = True # Whether the current song has finished or was stopped
+        self.interrupted:bool = False # Tells the feeder thread to stop writing, either because the song was stopped or because it's seeking
+        self.feeder:Thread = None # The thread started by play_file()
+        self.source:Iterator[Union[bytes, memoryview]] = None # The blocks that the feeder thread writes. Only replaced while holding self.condition
+        self.fed_frames:int = 0 # The frame of the current song that the feeder thread has taken blocks from up to
+        # The start of the next song, read ahead of time by prefetch() in the form of (file name, start frame, end frame, info, remaining blocks, first block)
+        self.prefetched:tuple[str, int, Union[int, None], WavInfo, Iterator[memoryview], memoryview] = None
+        self.request_time:float = None # The perf_counter() time that play_file() was last called at
+        self.start_latency:float = None # The number of seconds between the last call to play_file() and the song's first block being written
+
+    # Prepares the output for audio in the format described by info
+    def open(self, info:WavInfo) -> None:
+        with self.condition:
+            self.info = info
+            self.paused = False
+            self.stopped = False
+
+    # Writes PCM audio in the format given to open(). Returns once the output has accepted all of it, or once the output has been interrupted
+    def write(self, data:"Union[bytes, memoryview]") -> None:
+        raise NotImplementedError(f"{type(self).__name__} can't play PCM audio")
+
+    # Called once the song has been written or stopped. Can be called more than once per song
+    def close(self) -> None:
+        pass
+
+    # Returns the number of seconds into the song that the output has played up to
+    def position(self) -> float:
+        return 0
+
+    # Returns the frame that the output has played up to
+    def frame_position(self) -> int:
+        return int(self.position() * self.info.frame_rate) if self.info else 0
+
+    def pause(self) -> None:
+        with self.condition:
+            self.paused = True
+            self.condition.notify_all()
+    def resume(self) -> None:
+        with self.condition:
+            self.paused = False
+            self.condition.notify_all()
+
+    # Stops the current song. Blocks until the output has finished with it
+    def stop(self) -> None:
+        with self.condition:
+            self.stopped = True
+            self.interrupted = True
+            self.condition.notify_all()
+        self.join_feeder()
+        self.close()
+
+    # Blocks until the first block of the song passed to play_file() has been written, or until the song is stopped
+    # Returns the song's start latency, or None if the song was stopped before it started
+    def wait_for_start(self, timeout:float = None) -> "Union[float, None]":
+        with self.condition:
+            self.condition.wait_for(lambda : self.start_latency != None or self.stopped, timeout)
+            return self.start_latency
+
+    # Starts playing a WAV file from start_frame without blocking, stopping the song that's currently playing first
+    # Starts from the prefetched blocks if the same file and frame were prefetched
+    # crossfade: mix the start of the song into the rest of the current song instead of stopping the current song, if the current song is still playing
+    # gain: what to multiply the song's samples by, such as the song's loudness normalization gain
+    # end_frame: the frame to stop playing at, such as where the silence at the end of the song starts. Plays until the end of the file if it's None
+    def play_file(self, file_name:str, start_frame:int = 0, crossfade:bool = False, gain:float = 1, end_frame:int = None) -> None:
+        self.request_time = perf_counter()
+        self.start_latency = None
+        info, blocks = self.take_prefetched(file_name, start_frame, end_frame)
+        if crossfade and self.crossfade_into(file_name, info, start_frame, end_frame, blocks, gain):
+            return
+
+        self.stop()
+        self.open(info)
+        self.file_name = file_name
+        self.gain = gain
+        self.end_frame = get_end_frame(info, end_frame)
+        self.start_feeder(start_frame, blocks)
+
+    # Helper function for play_file(). Returns the song's info and its prefetched blocks, or None instead of the blocks if the song wasn't prefetched
+    def take_prefetched(self, file_name:str, start_frame:int, end_frame:"Union[int, None]") -> "tuple[WavInfo, Union[Iterator[memoryview], None]]":
+        if self.prefetched and self.prefetched[:3] == (file_name, start_frame, end_frame):
+            _, _, _, info, remaining_blocks, first_block = self.prefetched
+            self.prefetched = None
+            return info, (prepend_block(first_block, remaining_blocks) if first_block else remaining_blocks)
+
+        self.discard_prefetch()
+        return read_wav_info(file_name), None
+
+    # Helper function for play_file(). Makes the feeder thread mix the new song into the frames that are left in the current song, then carry on with the new song
+    # Returns False without changing anything if the current song has already finished, or if the songs' formats can't be mixed
+    def crossfade_into(self, file_name:str, info:WavInfo, start_frame:int, end_frame:"Union[int, None]", blocks:"Union[Iterator[memoryview], None]", gain:float) -> bool:
+        with self.condition:
+            if self.stopped or self.interrupted or not can_crossfade(self.info, info):
+                return False
+
+            end_frame = get_end_frame(info, end_frame)
+            start_frame = max(0, min(start_frame, end_frame))
+            if blocks == None:
+                blocks = stream_wav_blocks(file_name, info, PLAYBACK_BLOCK_SIZE, start_frame, end_frame)
+            self.source = crossfade_blocks(self.source, scale_blocks(blocks, info, gain), info, self.end_frame - self.fed_frames, PLAYBACK_BLOCK_SIZE) # The current song's blocks were already scaled by its own gain
+
+            self.info = info
+            self.file_name = file_name
+            self.gain = gain
+            self.end_frame = end_frame
+            self.start_frame = start_frame
+            self.fed_frames = start_frame
+            self.reset_position()
+        return True
+
+    # Returns True if play_file() would be able to crossfade the prefetched song into the song that's playing now
+    # Songs in formats that can't be mixed (see can_crossfade()) would cut off the end of the current song instead
+    def can_crossfade_into_prefetched(self) -> bool:
+        with self.condition:
+            return (self.supports_crossfade and self.prefetched != None
+                    and not (self.stopped or self.interrupted) and can_crossfade(self.info, self.prefetched[3]))
+
+    # Reads the headers and the first block of a song ahead of time, so play_file() can start writing the song right away
+    # Call this as soon as the next song is known
+    def prefetch(self, file_name:str, start_frame:int = 0, end_frame:int = None) -> None:
+        self.discard_prefetch()
+        info:WavInfo = read_wav_info(file_name)
+        blocks:Iterator[memoryview] = stream_wav_blocks(file_name, info, PLAYBACK_BLOCK_SIZE, max(0, min(start_frame, info.frames)), end_frame)
+        first_block:memoryview = next(blocks, None)
+        if first_block:
+            first_block[::PAGESIZE].tobytes() # Touches one byte in each page, so the block is read from the disk now instead of when it's first written
+        self.prefetched = (file_name, start_frame, end_frame, info, blocks, first_block)
+    def discard_prefetch(self) -> None:
+        if self.prefetched:
+            self.prefetched[4].close() # Unmaps the file
+            self.prefetched = None
+
+    # Continues the current song from frame, keeping it paused if it was paused
+    # Returns False if there's no song to seek in
+    def seek(self, frame:int) -> bool:
+        with self.condition:
+            if self.stopped:
+                return False
+            self.interrupted = True
+            self.condition.notify_all()
+        self.join_feeder()
+        self.start_feeder(frame)
+        return True
+
+    # Helper functions for play_file() and seek()
+    # blocks: the audio to write, starting from start_frame. Streamed from the current file if it isn't given
+    def start_feeder(self, start_frame:int, blocks:"Iterator[memoryview]" = None) -> None:
+        with self.condition:
+            self.start_frame = max(0, min(start_frame, self.end_frame))
+            self.fed_frames = self.start_frame
+            self.interrupted = False
+            self.source = scale_blocks(blocks if blocks != None else stream_wav_blocks(self.file_name, self.info, PLAYBACK_BLOCK_SIZE, self.start_frame, self.end_frame), self.info, self.gain)
+            self.reset_position()
+        self.feeder = Thread(target = self.feed_blocks, name = "Audio output", daemon = True)
+        self.feeder.start()
+    def join_feeder(self) -> None:
+        if self.feeder and self.feeder.is_alive():
+            self.feeder.join()
+
+    # Called with self.condition held whenever a new song (or a new part of the song) starts feeding. Resets anything that position() depends on
+    def reset_position(self) -> None:
+        pass
+
+    # Helper function for start_feeder(). Writes the audio to the output one block at a time
+    # The next block is taken while holding self.condition, so crossfade_into() can swap self.source between any 2 blocks
+    def feed_blocks(self) -> None:
+        try:
+            while True:
+                with self.condition:
+                    if self.interrupted:
+                        return
+                    try:
+                        block:Union[bytes, memoryview] = next(self.source, None)
+                    except (OSError, WavFormatError): # The file was deleted or changed while it was playing, so end the song early
+                        block = None
+                    if block == None:
+                        self.stopped = True # The song played until its end
+                        break
+                    self.fed_frames += len(block) // self.info.frame_size
+                    if self.start_latency == None and self.request_time != None:
+                        self.start_latency = perf_counter() - self.request_time
+                        self.condition.notify_all() # Wakes up wait_for_start()
+                self.write(block)
+        finally:
+            with self.condition:
+                self.source.close() # Unmaps the file right away, even if the song was stopped partway through
+        self.close()
+
+# Consumes audio at the speed that it would be played at, so everything that depends on the timing of the songs works without a sound card
+class NullOutput(AudioOutput):
+    def __init__(self):
+        super().__init__()
+        self.played_time:float = 0 # The number of seconds of audio that were consumed since self.start_frame, up to self.consume_start_time
+        self.consume_start_time:float = None # The monotonic time that the block that's currently being consumed started at, or None if no block is being consumed
+
+    def reset_position(self) -> None:
+        # If a block is being consumed, only count the part of it that's consumed from now on
+        self.played_time = -(monotonic() - self.consume_start_time) if self.consume_start_time != None else 0
+
+    def write(self, data:"Union[bytes, memoryview]") -> None:
+        self.consume(len(data) // self.info.frame_size / self.info.frame_rate)
+
+    # Blocks for duration seconds of unpaused time, or until the output is interrupted
+    def consume(self, duration:float) -> None:
+        with self.condition:
+            while duration > 0 and not self.interrupted:
+                if self.paused:
+                    self.condition.wait()
+                    continue
+
+                self.consume_start_time = monotonic()
+                self.condition.wait(duration)
+                elapsed_time:float = min(monotonic() - self.consume_start_time, duration)
+                self.consume_start_time = None
+
+                self.played_time += elapsed_time
+                duration -= elapsed_time
+
+    def position(self) -> float:
+        if not self.info:
+            return 0
+        with self.condition:
+            played_time:float = self.played_time
+            if self.consume_start_time != None:
+                played_time += monotonic() - self.consume_start_time
+            return self.start_frame / self.info.frame_rate + played_time
+
+# Records the audio that would have been played into WAV files, one file per song, while consuming it at the speed that it would be played at
+# Seeking doesn't start a new file, so each recording is exactly what was heard
+class WavFileOutput(NullOutput):
+    RECORDINGS_DIRECTORY:str = "recordings"
+
+    # realtime: whether to consume the audio at the speed that it would be played at. Turn this off to record songs as fast as possible
+    def __init__(self, directory:str = RECORDINGS_DIRECTORY, realtime:bool = True):
+        super().__init__()
+        self.directory:str = directory
+        self.realtime:bool = realtime
+        self.recording:BinaryIO = None
+        self.recording_info:WavInfo = None # The format that the recording's headers were written with
+        self.recorded_frames:int = 0
+        self.recordings_count:int = 0
+        self.next_recording_name:str = None
+
+    def play_file(self, file_name:str, start_frame:int = 0, crossfade:bool = False, gain:float = 1, end_frame:int = None) -> None:
+        self.next_recording_name = basename(file_name)
+        super().play_file(file_name, start_frame, crossfade, gain, end_frame) # A crossfaded song is recorded into the same file as the song that it was mixed into
+
+    def open(self, info:WavInfo) -> None:
+        super().open(info)
+        makedirs(self.directory, exist_ok = True)
+        self.recordings_count += 1
+
+        self.recording = open(f"{self.directory}/{self.recordings_count:04d} {self.next_recording_name or 'recording.wav'}", "wb")
+        self.recording_info = info
+        self.recorded_frames = 0
+        self.recording.write(make_wav_header(info, 0)) # The sizes in the headers are filled in by close()
+
+    def write(self, data:"Union[bytes, memoryview]") -> None:
+        if self.interrupted:
+            return
+        self.recording.write(data)
+        self.recorded_frames += len(data) // self.info.frame_size
+        if self.realtime:
+            super().write(data)
+        else:
+            with self.condition:
+                self.played_time += len(data) // self.info.frame_size / self.info.frame_rate
+
+    def close(self) -> None:
+        if self.recording:
+            if self.recorded_frames * self.recording_info.frame_size % 2 == 1:
+                self.recording.write(b"\0")
+            self.recording.seek(0)
+            self.recording.write(make_wav_header(self.recording_info, self.recorded_frames))
+            self.recording.close()
+            self.recording = None
+
+# Plays whole files through winsound, which can't be given PCM audio directly. Only available on Windows
+# Pausing stops the song, since winsound can't pause. Playing from partway through a song plays a temporary copy of the rest of the song
+# Songs that are played from their beginning are played straight from their files and stopped at their end frame, so they're never copied
+# The copy is written on its own thread, so seeking and resuming don't block the thread that asked for them
+class WinsoundOutput(AudioOutput):
+    supports_crossfade:bool = False
+    CROSSFADE_UNAVAILABLE_MESSAGE:str = "Crossfading isn't available through winsound, which can only play one song at a time"
+    supports_gain:bool = False # winsound plays the files as they are
+    supports_seeking:bool = False
+    SILENCE_FILE_PATH:str = "1s_silence.wav" # Playing this stops whatever winsound is currently playing
+
+    def __init__(self):
+        super().__init__()
+        self.start_time:float = None # The monotonic time that winsound started playing from self.start_frame, or None if it hasn't started yet
+        self.stop_time:float = None # The monotonic time that the song was stopped, or None while it's playing
+        self.partial_file_name:str = None # The temporary file that's being played from partway through a song
+        self.leftover_file_names:list[str] = [] # Temporary files that winsound still had open when they were no longer needed. Removing them is retried whenever a song starts or stops
+
+    # winsound plays the file as it is, so gain is ignored
+    def play_file(self, file_name:str, start_frame:int = 0, crossfade:bool = False, gain:float = 1, end_frame:int = None) -> None:
+        self.request_time = perf_counter()
+        self.start_latency = None
+        self.stop()
+        # winsound reads the file itself, so only the headers are used from a prefetch. Prefetching still brings the start of the file into the disk cache
+        if self.prefetched and self.prefetched[:3] == (file_name, start_frame, end_frame):
+            info:WavInfo = self.prefetched[3]
+        else:
+            info:WavInfo = read_wav_info(file_name)
+        self.discard_prefetch()
+
+        self.open(info)
+        self.file_name = file_name
+        self.end_frame = get_end_frame(info, end_frame)
+        self.start_feeder(start_frame)
+
+    # Starts a thread that copies the part of the song that's played into a temporary file if needed, and then starts winsound
+    # The thread keeps running until the song reaches its end frame, so it can stop winsound there
+    def start_feeder(self, start_frame:int, blocks:"Iterator[memoryview]" = None) -> None:
+        with self.condition:
+            self.start_frame = max(0, min(start_frame, self.end_frame))
+            self.interrupted = False
+            self.start_time = None
+            self.stop_time = None
+        self.feeder = Thread(target = self.play_sound, name = "Audio output", daemon = True)
+        self.feeder.start()
+
+    # Helper function for start_feeder()
+    def play_sound(self) -> None:
+        self.remove_leftover_files()
+        file_name:str = self.file_name
+        if self.start_frame > 0:
+            file_name = self.write_partial_file(self.start_frame, self.end_frame)
+
+        with self.condition:
+            if file_name == None or self.interrupted: # Stopped or seeking again while the copy was being written
+                self.discard_file(file_name)
+                return
+            PlaySound(file_name, SND_ASYNC) # Replaces whatever winsound was playing
+            self.discard_file(self.partial_file_name)
+            self.partial_file_name = file_name if file_name != self.file_name else None
+            self.start_time = monotonic()
+            self.start_latency = perf_counter() - self.request_time
+            self.condition.notify_all() # Wakes up wait_for_start()
+
+            # winsound can't be told where to stop, so stop it once it reaches the end frame instead of letting it play the rest of the file. stop() and seek() wake this up early
+            if file_name == self.file_name and self.end_frame < self.info.frames and not self.condition.wait_for(lambda : self.interrupted, (self.end_frame - self.start_frame) / self.info.frame_rate):
+                PlaySound(self.SILENCE_FILE_PATH, SND_ASYNC)
+                self.stop_time = monotonic()
+                self.stopped = True # The song played until its end
+
+    # Copies the audio of the current song from start_frame up to end_frame into a temporary WAV file and returns the file's name
+    # Returns None if the output was interrupted before the copy was finished, or if the song's file couldn't be read
+    def write_partial_file(self, start_frame:int, end_frame:int) -> "Union[str, None]":
+        file_descriptor, partial_file_name = mkstemp(suffix = ".wav")
+        try:
+            with open(file_descriptor, "wb") as file:
+                file.write(make_wav_header(self.info, end_frame - start_frame)) # Keeps the song's format tag, so float songs are still played as floats
+                for block in stream_wav_blocks(self.file_name, self.info, PLAYBACK_BLOCK_SIZE, start_frame, end_frame):
+                    if self.interrupted:
+                        break
+                    file.write(block)
+                if (end_frame - start_frame) * self.info.frame_size % 2 == 1:
+                    file.write(b"\0")
+        except OSError: # The file was deleted or changed since the song started
+            self.discard_file(partial_file_name)
+            return None
+
+        if self.interrupted:
+            self.discard_file(partial_file_name)
+            return None
+        return partial_file_name
+
+    # Removes a temporary file once it's no longer needed, or leaves it to be removed later if winsound still has it open. Does nothing if file_name isn't a temporary file
+    def discard_file(self, file_name:"Union[str, None]") -> None:
+        if file_name != None and file_name != self.file_name:
+            self.leftover_file_names.append(file_name)
+            self.remove_leftover_files()
+
+    def remove_leftover_files(self) -> None:
+        remaining_file_names:list[str] = []
+        for file_name in self.leftover_file_names:
+            try:
+                remove(file_name)
+            except FileNotFoundError:
+                pass
+            except OSError: # winsound might still have the file open
+                remaining_file_names.append(file_name)
+        self.leftover_file_names = remaining_file_names
+
+    def position(self) -> float:
+        if not self.info:
+            return 0
+        if self.start_time == None: # winsound hasn't started yet, so the song is still at the frame that it was started from
+            return self.start_frame / self.info.frame_rate
+        end_time:float = self.stop_time if self.stop_time != None else monotonic()
+        return min(self.start_frame / self.info.frame_rate + end_time - self.start_time, self.end_frame / self.info.frame_rate)
+
+    def pause(self) -> None:
+        self.stop()
+    def stop(self) -> None:
+        super().stop() # Interrupts the copy of the partial file if one is being written
+        if self.start_time != None and self.stop_time == None:
+            PlaySound(self.SILENCE_FILE_PATH, SND_ASYNC)
+            self.stop_time = monotonic()
+        self.discard_file(self.partial_file_name)
+        self.partial_file_name = None
+
+AUDIO_OUTPUTS:"dict[str, type]" = {"winsound" : WinsoundOutput, "null" : NullOutput, "file" : WavFileOutput}
+
+# name: a key in AUDIO_OUTPUTS. Defaults to winsound on Windows, and to the null output everywhere else
+def create_audio_output(name:str = None) -> AudioOutput:
+    if name == None:
+        name = "winsound" if PlaySound else "null"
+    if name == "winsound" and not PlaySound:
+        raise ValueError("The winsound audio output is only available on Windows")
+    return AUDIO_OUTPUTS[name]()
@@ -0,0 +1,235 @@
+# Benchmarks for the parts of the player that need to scale to large libraries
+# Usage: python benchmark.py <benchmark name> [arguments]
+# Run without a benchmark name to list the available benchmarks
+from sys import argv
+from time import perf_counter
+from threading import Thread
+from statistics import median
+from contextlib import redirect_stdout
+from io import StringIO
+from tempfile import TemporaryDirectory
+from typing import Union, Iterator
+import tracemalloc
+import wave
+
+try:
+    from os import posix_fadvise, POSIX_FADV_DONTNEED
+except ImportError: # Not available on Windows
+    posix_fadvise = None
+
+from song import Song
+from main import spotify
+from audio import NullOutput, PLAYBACK_BLOCK_SIZE
+from mixer import crossfade_blocks, MIXING_AVAILABLE
+from wav import WavInfo, WAVE_FORMAT_PCM, read_wav_info
+from analysis import analyze_silence, analyze_fingerprint, find_duplicates
+from library import LibraryCache, get_cache_key
+from random import randbytes
+from info import *
+
+# Rebuilds the per-instance layout that Song used before it was slotted and bit-packed, so the two can be compared
+class LegacySong:
+    def __init__(self, song_name:str, file_name:str, index:int, duration:int):
+        self.file_name:str = file_name
+        self.song_name:str = song_name
+        self.index:int = index
+        self.duration:int = duration
+        self.has_lyrics:bool = False
+        self.curr_duration:int = 1
+        self.start_time = None
+        self.attributes:dict[SongAttributes, Union[bool, set]] = {SongAttributes.playing : False,
+                                                        SongAttributes.disabled : False,
+                                                        SongAttributes.queued : False,
+                                                        SongAttributes.has_sequence : False,
+                                                        SongAttributes.sequenced : False,
+                                                        SongAttributes.modifiers : set()}
+        self.attributes_changed:bool = True
+        self.listing_colors:list[tuple[SongAttributes, list[Colors]]] = []
+        self.sequence:list[str] = []
+        self.BASE_WEIGHT:int = BASE_SONG_WEIGHT
+        self.weight:int = self.BASE_WEIGHT
+
+# Returns the number of bytes allocated while creating the objects returned by factory, and keeps them alive until they are measured
+def measure_allocations(factory:"function") -> int:
+    tracemalloc.start()
+    start_size, _ = tracemalloc.get_traced_memory()
+    objects:list = factory()
+    end_size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    del objects
+    return end_size - start_size
+
+# Compares the memory used by a synthetic library of Song objects with the memory the same library used with the old Song layout
+# The song names and file names are created beforehand so only the per-song overhead is measured
+def benchmark_memory(song_count:str = "100000") -> None:
+    song_count:int = int(song_count)
+    song_names:list[str] = [f"Synthetic song {i}" for i in range(song_count)]
+    file_names:list[str] = [f"songs/{song_name}.wav" for song_name in song_names]
+    metadata:dict[str, Union[int, bool]] = {"format" : 1, "frames" : 44100 * 200, "frame_rate" : 44100, "channels" : 2, "sample_width" : 2, "data_offset" : 44, "lyrics" : False}
+
+    legacy_size:int = measure_allocations(lambda : [LegacySong(song_names[i], file_names[i], i, 200) for i in range(song_count)])
+    compact_size:int = measure_allocations(lambda : [Song(song_names[i], file_names[i], i, metadata) for i in range(song_count)])
+
+    print(f"{song_count} songs")
+    print(f"Before (dict attributes): {legacy_size / 1024**2:8.2f} MiB ({legacy_size / song_count:.0f} bytes per song)")
+    print(f"After (slotted, packed):  {compact_size / 1024**2:8.2f} MiB ({compact_size / song_count:.0f} bytes per song)")
+    print(f"Saved {100 * (1 - compact_size / legacy_size):.1f}%")
+
+# Writes a silent WAV file that's seconds long
+def write_silent_song(file_name:str, seconds:float, frame_rate:int = 44100) -> None:
+    with wave.open(file_name, "wb") as file:
+        file.setnchannels(2)
+        file.setsampwidth(2)
+        file.setframerate(frame_rate)
+        file.writeframes(bytes(4 * int(seconds * frame_rate)))
+
+# Runs the player without drawing its UI, so its commands can be timed without a console
+class HeadlessPlayer(spotify):
+    def update_ui(self, command:str = "") -> None:
+        pass
+
+# Measures the time from skip() being called to the next song starting, through the player's own song-playing thread
+# Every skip goes through the same steps as it does in the player: stopping the output and its feeder thread, picking the next song, prefetching it, saving, and starting it with play_file()
+# The old polling loop always took 1 + TIMER_RESOLUTION + 0.25 + TICK_DURATION + 0.5 = 2.45 seconds
+def benchmark_latency(trials:str = "200") -> None:
+    trials:int = int(trials)
+    latencies:list[float] = []
+
+    with TemporaryDirectory() as directory:
+        songs:dict[str, Song] = {}
+        for i in range(4):
+            write_silent_song(f"{directory}/song {i}.wav", 60)
+            songs[f"song {i}"] = Song(f"song {i}", f"{directory}/song {i}.wav", i)
+        HeadlessPlayer.SAVE_FILE_PATH = f"{directory}/save_file.json" # Don't overwrite the player's real save file
+        player:HeadlessPlayer = HeadlessPlayer(songs, list(songs.keys()))
+        player.output = NullOutput()
+        player_thread:Thread = Thread(target = player.play_songs, name = "Audio player", daemon = True)
+        player_thread.start()
+
+        with redirect_stdout(StringIO()): # skip() prints a message each time
+            player.skip() # Warm up, so the first skip doesn't also measure one-time setup costs
+            for _ in range(trials):
+                start_time:float = perf_counter()
+                player.skip() # Returns once the song-playing thread has started the next song
+                latencies.append(perf_counter() - start_time)
+
+        player.terminated = True
+        player.output.stop()
+        player.clock.stop()
+        player_thread.join()
+
+    print(f"{trials} skips")
+    print(f"Command to next song: median {median(latencies) * 1000:.3f} ms, max {max(latencies) * 1000:.3f} ms")
+
+# Removes a file from the OS's disk cache, so the next read of the file has to go to the disk. Does nothing where the OS doesn't allow it
+def evict_from_cache(file_name:str) -> None:
+    if not posix_fadvise:
+        return
+    with open(file_name, "rb") as file:
+        posix_fadvise(file.fileno(), 0, 0, POSIX_FADV_DONTNEED)
+
+# Measures the time from play_file() being called to the first block of each song being written, with and without prefetching the song during the interlude
+# Every song is evicted from the disk cache first, so the songs start cold like they would after a long song
+def benchmark_startup(song_count:str = "10") -> None:
+    song_count:int = int(song_count)
+    output:NullOutput = NullOutput()
+    cold_latencies:list[float] = []
+    prefetched_latencies:list[float] = []
+
+    with TemporaryDirectory() as directory:
+        file_names:list[str] = [f"{directory}/song {i}.wav" for i in range(song_count)]
+        for file_name in file_names:
+            write_silent_song(file_name, 30)
+        output.play_file(file_names[0]) # Warm up, so the first song doesn't also measure one-time setup costs
+        output.stop()
+
+        print(f"{'Song' : <10} {'Cold' : >10} {'Prefetched' : >12}")
+        for i, file_name in enumerate(file_names):
+            evict_from_cache(file_name)
+            output.play_file(file_name)
+            cold_latencies.append(output.wait_for_start()) # Waits without holding the GIL, so the feeder thread that's being timed isn't slowed down
+            output.stop()
+
+            evict_from_cache(file_name)
+            output.prefetch(file_name) # Done during the interlude
+            output.play_file(file_name)
+            prefetched_latencies.append(output.wait_for_start())
+            output.stop()
+
+            print(f"{f'song {i}' : <10} {cold_latencies[-1] * 1000 : >7.3f} ms {prefetched_latencies[-1] * 1000 : >9.3f} ms")
+
+    print(f"Median start latency: cold {median(cold_latencies) * 1000:.3f} ms, prefetched {median(prefetched_latencies) * 1000:.3f} ms")
+
+# Yields audio in blocks the same way stream_wav_blocks() does, without reading a file
+def split_into_blocks(audio:bytes, block_size:int) -> "Iterator[memoryview]":
+    view:memoryview = memoryview(audio)
+    for position in range(0, len(audio), block_size):
+        yield view[position : position + block_size]
+
+# Measures how much faster than real time a crossfade of 48 kHz stereo songs can be mixed
+# Every frame of both songs is part of the overlap, so the whole time is spent mixing
+def benchmark_crossfade(seconds:str = "60") -> None:
+    if not MIXING_AVAILABLE:
+        print("Crossfading isn't available, since neither NumPy nor audioop could be imported")
+        return
+
+    seconds:float = float(seconds)
+    info:WavInfo = WavInfo(WAVE_FORMAT_PCM, 2, 48000, 2, int(seconds * 48000), 44, int(seconds * 48000) * 4)
+    outgoing_audio:bytes = randbytes(info.data_size)
+    incoming_audio:bytes = randbytes(info.data_size)
+
+    start_time:float = perf_counter()
+    mixed_size:int = 0
+    for block in crossfade_blocks(split_into_blocks(outgoing_audio, PLAYBACK_BLOCK_SIZE), split_into_blocks(incoming_audio, PLAYBACK_BLOCK_SIZE), info, info.frames, PLAYBACK_BLOCK_SIZE):
+        mixed_size += len(block)
+    mixing_time:float = perf_counter() - start_time
+
+    print(f"Crossfaded {seconds:g}s of 48 kHz 16-bit stereo in {mixing_time:.3f}s ({mixed_size // info.frame_size} frames)")
+    print(f"{seconds / mixing_time:.1f}x faster than real time")
+
+# Measures how fast songs are fingerprinted, and how long grouping the fingerprints of a large library takes
+# Fingerprinting is run on one process here, so a library is fingerprinted about ANALYSIS_WORKERS times faster than this by analysis.py
+def benchmark_duplicates(song_count:str = "50000", seconds:str = "60") -> None:
+    song_count:int = int(song_count)
+    seconds:float = float(seconds)
+    with TemporaryDirectory() as directory:
+        file_name:str = f"{directory}/song.wav"
+        with wave.open(file_name, "wb") as file:
+            file.setnchannels(2)
+            file.setsampwidth(2)
+            file.setframerate(44100)
+            file.writeframes(randbytes(4 * int(seconds * 44100)))
+        info:WavInfo = read_wav_info(file_name)
+
+        start_time:float = perf_counter()
+        analyze_fingerprint(file_name, info, analyze_silence(file_name, info))
+        fingerprint_time:float = perf_counter() - start_time
+
+    # Every 10th song is a copy of the song before it
+    cache:LibraryCache = LibraryCache(path = "")
+    file_names:list[str] = [f"songs/Synthetic song {i}.wav" for i in range(song_count)]
+    for i, file_name in enumerate(file_names):
+        cache.entries[get_cache_key(file_name)] = {"size" : 0, "mtime" : 0, "metadata" : {"fingerprint" : {"hash" : str(i - (i % 10 == 9)), "signature" : f"200:{i - (i % 10 == 9):032x}"}}}
+    start_time = perf_counter()
+    duplicates:list[tuple[list[str], bool]] = find_duplicates(cache, file_names)
+    grouping_time:float = perf_counter() - start_time
+
+    print(f"Fingerprinted {seconds:g}s of 44.1 kHz 16-bit stereo in {fingerprint_time:.3f}s ({info.data_size / fingerprint_time / 1024**2:.0f} MiB/s on one process)")
+    print(f"Grouped {song_count} fingerprints into {len(duplicates)} groups of duplicates in {grouping_time * 1000:.1f} ms")
+
+BENCHMARKS:"dict[str, function]" = {
+    "memory" : benchmark_memory,
+    "latency" : benchmark_latency,
+    "startup" : benchmark_startup,
+    "crossfade" : benchmark_crossfade,
+    "duplicates" : benchmark_duplicates
+}
+
+if __name__ == "__main__":
+    if len(argv) < 2 or argv[1] not in BENCHMARKS:
+        print(f"Available benchmarks: {', '.join(BENCHMARKS.keys())}")
+    else:
+        start_time:float = perf_counter()
+        BENCHMARKS[argv[1]](*argv[2:])
+        print(color(f"Finished in {perf_counter() - start_time:.2f}s", Colors.faint))
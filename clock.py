@@ -0,0 +1,137 @@
+from enum import Enum
+from threading import Condition
+from time import monotonic
+
+class ClockStates(Enum):
+    Stopped = 0 # No song has started yet, or the song was interrupted
+    Playing = 1
+    Paused = 2
+    Ended = 3 # The song played until its end
+
+# Keeps track of how far into the current song the player is, using the monotonic clock so the position can be calculated exactly whenever it's needed
+# Threads can wait on the clock for the next second, for the song to end, or for anything about the clock to change, instead of repeatedly sleeping and checking
+# Every method can be called from any thread
+class PlaybackClock:
+    def __init__(self):
+        self.condition:Condition = Condition() # Wakes up every waiting thread whenever self.version changes
+        self.state:ClockStates = ClockStates.Stopped
+        self.duration:float = 0 # The length of the current song in seconds
+        self.start_time:float = 0 # The monotonic time that the song would have started at if it was never paused. Only used while playing
+        self.stopped_position:float = 0 # The position of the song while the clock isn't playing
+        self.origin:float = 0 # The position that whole seconds are counted from, such as where the silence at the start of the song ends
+        self.version:int = 0 # Incremented whenever the state of the clock changes or notify_listeners() is called
+
+    # Returns the number of seconds into the current song, including fractions of a second
+    def position(self) -> float:
+        with self.condition:
+            if self.state == ClockStates.Playing:
+                return min(monotonic() - self.start_time, self.duration)
+            return self.stopped_position
+
+    # Returns the position relative to the origin, rounded down to a whole second
+    def whole_seconds(self) -> int:
+        return int(max(0, self.position() - self.origin))
+
+    def remaining(self) -> float:
+        return self.duration - self.position()
+
+    # Call this (with the lock held) after changing anything about the clock
+    def changed(self) -> None:
+        self.version += 1
+        self.condition.notify_all()
+
+    # Starts timing a song of this duration from position (in seconds)
+    # origin: the position that whole_seconds() counts from
+    def start(self, duration:float, position:float = 0, origin:float = 0) -> None:
+        with self.condition:
+            self.duration = duration
+            self.origin = origin
+            self.start_time = monotonic() - position
+            self.state = ClockStates.Playing
+            self.changed()
+
+    def pause(self) -> None:
+        with self.condition:
+            if self.state == ClockStates.Playing:
+                self.stopped_position = self.position()
+                self.state = ClockStates.Paused
+                self.changed()
+    def resume(self) -> None:
+        with self.condition:
+            if self.state == ClockStates.Paused:
+                self.start_time = monotonic() - self.stopped_position
+                self.state = ClockStates.Playing
+                self.changed()
+
+    # Interrupts the current song. The position stays where the song was stopped
+    def stop(self) -> None:
+        with self.condition:
+            if self.state in (ClockStates.Playing, ClockStates.Paused):
+                self.stopped_position = self.position()
+                self.state = ClockStates.Stopped
+                self.changed()
+
+    # Moves the current song to position (in seconds), whether it's playing or not
+    def seek(self, position:float) -> None:
+        with self.condition:
+            position = max(0, min(position, self.duration))
+            if self.state == ClockStates.Playing:
+                self.start_time = monotonic() - position
+            else:
+                self.stopped_position = position
+            self.changed()
+
+    # Wakes up every waiting thread without changing the clock. Use this when something the waiting threads care about has changed (ex. a key was pressed)
+    def notify_listeners(self) -> None:
+        with self.condition:
+            self.changed()
+
+    # Blocks until the position reaches target, the clock changes, or timeout seconds have passed (if timeout isn't None)
+    # Returns True only if the position has reached target
+    def wait_until(self, target:float, timeout:float = None) -> bool:
+        with self.condition:
+            version:int = self.version
+            deadline:float = monotonic() + timeout if timeout != None else None
+            while True:
+                if self.position() >= target:
+                    return True
+                if self.version != version:
+                    return False
+
+                wait_time:float = target - self.position() if self.state == ClockStates.Playing else None # A clock that isn't playing can only reach target after it changes
+                if deadline != None:
+                    if monotonic() >= deadline:
+                        return False
+                    wait_time = deadline - monotonic() if wait_time == None else min(wait_time, deadline - monotonic())
+                self.condition.wait(wait_time)
+
+    # Blocks until the next second boundary after last_second, or until the clock changes. Returns the current whole second
+    def wait_for_second(self, last_second:int, timeout:float = None) -> int:
+        self.wait_until(self.origin + last_second + 1, timeout)
+        return self.whole_seconds()
+
+    # Blocks until the clock's version is different from version, or timeout seconds have passed. Returns the current version
+    def wait_for_change(self, version:int, timeout:float = None) -> int:
+        with self.condition:
+            self.condition.wait_for(lambda : self.version != version, timeout)
+            return self.version
+
+    # Blocks until the current song reaches its end or is stopped
+    # end: the position to stop waiting at instead, such as where the next song starts crossfading in. The clock keeps playing the rest of the song, since the next song might not be able to crossfade in. Defaults to the song's duration
+    # Returns True if the song played until end, False if it was stopped
+    def wait_until_ended(self, end:float = None) -> bool:
+        with self.condition:
+            while True:
+                if self.state == ClockStates.Ended:
+                    return True
+                if self.state == ClockStates.Stopped:
+                    return False
+
+                end_position:float = min(end, self.duration) if end != None else self.duration
+                if self.wait_until(end_position):
+                    if end_position < self.duration:
+                        return True
+                    self.stopped_position = self.position()
+                    self.state = ClockStates.Ended
+                    self.changed()
+                    return True
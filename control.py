@@ -0,0 +1,41 @@
+from collections import deque
+from enum import Enum
+from threading import Condition, Event
+from typing import Union
+
+class PlayerCommands(Enum):
+    Pause = 0
+    Resume = 1
+    Skip = 2
+
+# Carries commands from the console thread to the song-playing thread, so the song-playing thread can react as soon as a command is sent instead of polling shared flags
+# Each sent command comes with an Event that the song-playing thread sets once the command has taken effect, so the sender can wait for exactly as long as it needs to
+class ControlChannel:
+    def __init__(self):
+        self.condition:Condition = Condition()
+        self.commands:deque[tuple[PlayerCommands, Event]] = deque()
+
+    # Returns the Event that will be set once the command has taken effect
+    def send(self, command:PlayerCommands) -> Event:
+        done:Event = Event()
+        with self.condition:
+            self.commands.append((command, done))
+            self.condition.notify_all()
+        return done
+
+    # Blocks until a command is sent or timeout seconds have passed (if timeout isn't None)
+    # Returns a tuple in the form of (command, done event), or None if no command was sent before the timeout
+    def receive(self, timeout:float = None) -> "Union[tuple[PlayerCommands, Event], None]":
+        with self.condition:
+            if not self.condition.wait_for(lambda : len(self.commands) > 0, timeout):
+                return None
+            return self.commands.popleft()
+
+    # Returns True if there are any commands that haven't been received yet
+    def pending(self) -> bool:
+        with self.condition:
+            return len(self.commands) > 0
+
+    # Returns the oldest unhandled command without blocking, or None if there aren't any
+    def poll(self) -> "Union[tuple[PlayerCommands, Event], None]":
+        return self.receive(timeout = 0)
@@ -0,0 +1,87 @@
+from array import array
+from os import replace
+from typing import Union
+import json
+
+FEATURE_NAMES:"tuple[str]" = ("bpm", "energy", "spectral_centroid") # Tempo in beats per minute, RMS level in dBFS, and spectral centroid in Hz (see analysis.analyze_features())
+
+# The audio features of every analyzed song, stored one column per feature so that a whole library can be loaded or filtered at once
+# The file is a line of JSON describing the table, followed by the file names of the songs and then each column as an array of floats
+# Files are named by their library cache keys (see library.get_cache_key()), so the player finds a song's row no matter how analysis.py was given the songs folder
+# Loading the table is a single read, and the columns are copied straight into arrays, so even large libraries load in milliseconds
+# Features that couldn't be measured for a song are stored as NaN, which never falls inside a range passed to select()
+class FeatureTable:
+    FEATURES_FILE_PATH:str = "features.bin" # Kept next to the library cache
+    VERSION:int = 2 # Increment this whenever the layout of the file changes so older tables are discarded
+
+    # file_names: the files that the table has features for, in the order of the rows
+    # columns: an array of floats for each name in FEATURE_NAMES, with a value for each file
+    def __init__(self, file_names:"list[str]" = None, columns:"dict[str, array]" = None):
+        self.file_names:list[str] = file_names or []
+        self.columns:dict[str, array] = columns or {feature_name : array("f") for feature_name in FEATURE_NAMES}
+        self.rows:dict[str, int] = {file_name : row for row, file_name in enumerate(self.file_names)} # The row of each file, keyed by file name
+
+    def __len__(self) -> int:
+        return len(self.file_names)
+
+    # Builds a table out of the features that analysis.py cached in each file's metadata. Files that haven't been analyzed yet are left out
+    # metadata_by_file: the cached metadata of each file, keyed by file name
+    @classmethod
+    def from_metadata(cls, metadata_by_file:"dict[str, dict[str, any]]") -> "FeatureTable":
+        table:FeatureTable = cls()
+        for file_name, metadata in metadata_by_file.items():
+            features:dict[str, float] = metadata.get("features")
+            if features:
+                table.file_names.append(file_name)
+                for feature_name in FEATURE_NAMES:
+                    value:Union[float, None] = features.get(feature_name)
+                    table.columns[feature_name].append(value if value != None else float("nan"))
+        table.rows = {file_name : row for row, file_name in enumerate(table.file_names)}
+        return table
+
+    # Returns an empty table if there isn't a features file yet, or if the file is unreadable or outdated
+    @classmethod
+    def load(cls, path:str = FEATURES_FILE_PATH) -> "FeatureTable":
+        try:
+            with open(path, "rb") as file:
+                data:bytes = file.read()
+            header_end:int = data.index(b"\n")
+            header:dict[str, any] = json.loads(data[:header_end])
+            if header.get("version") != cls.VERSION or tuple(header["columns"]) != FEATURE_NAMES:
+                return cls()
+
+            position:int = header_end + 1
+            file_names:list[str] = data[position : position + header["names_size"]].decode("utf-8").split("\n") if header["count"] > 0 else []
+            position += header["names_size"]
+            columns:dict[str, array] = {}
+            for feature_name in FEATURE_NAMES:
+                column:array = array("f")
+                column.frombytes(data[position : position + header["count"] * column.itemsize])
+                position += header["count"] * column.itemsize
+                columns[feature_name] = column
+            return cls(file_names, columns)
+        except: # If there isn't a features file yet or the file is unreadable
+            return cls()
+
+    def save(self, path:str = FEATURES_FILE_PATH) -> None:
+        names:bytes = "\n".join(self.file_names).encode("utf-8")
+        header:bytes = json.dumps({"version" : self.VERSION, "count" : len(self.file_names), "columns" : list(FEATURE_NAMES), "names_size" : len(names)}).encode("utf-8")
+
+        # Write to a temporary file first so an interrupted save can't corrupt the table
+        temporary_path:str = path + ".tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(header + b"\n" + names)
+            for feature_name in FEATURE_NAMES:
+                self.columns[feature_name].tofile(file)
+        replace(temporary_path, path)
+
+    # Returns the features of a file in the form of {feature name : value}, or None if the file isn't in the table
+    def get(self, file_name:str) -> "Union[dict[str, float], None]":
+        row:int = self.rows.get(file_name)
+        if row == None:
+            return None
+        return {feature_name : self.columns[feature_name][row] for feature_name in FEATURE_NAMES}
+
+    # Returns the files whose value of the feature is between low and high (inclusive), in the order of the rows
+    def select(self, feature_name:str, low:float, high:float) -> "list[str]":
+        return [file_name for file_name, value in zip(self.file_names, self.columns[feature_name]) if low <= value <= high]
@@ -7,24 +7,75 @@ class SongGroup:
     def __init__(self, songs:"Union[list[Song], set[Song]]", allow_duplicates:bool = False):
         self.songs:Union[list, set][Song]
         self.song_names:list[str]
+        self.positions:dict[str, int] # The index of each song in self.songs, keyed by song name
         self.set_songs(songs)
         
         self.allow_duplicates:bool = allow_duplicates
         
-    # Makes a copy of songs before filtering the list and updating self.songs and self.song_names
+    # Makes a copy of songs before filtering the list and updating self.songs, self.song_names and self.positions
     def set_songs(self, songs:"Union[list[Song], set[Song]]") -> None:
-        songs = songs.copy()
-        
-        if type(songs) == list: # Remove duplicates from songs in-place
+        if type(songs) == list: # Remove duplicates, keeping the last occurrence of each song
             encountered_items:set[Song] = set()
-            for i in range(len(songs) - 1, -1, -1):
-                if songs[i] in encountered_items:
-                    del songs[i]
-                else:
-                    encountered_items.add(songs[i])
+            unique_songs:list[Song] = []
+            for song in reversed(songs):
+                if song not in encountered_items:
+                    encountered_items.add(song)
+                    unique_songs.append(song)
+            unique_songs.reverse()
+            songs = unique_songs
+        else:
+            songs = songs.copy()
 
         self.songs = songs
         self.song_names = [song.song_name for song in self.songs]
+        self.positions = {song_name : position for position, song_name in enumerate(self.song_names)}
+
+    def __contains__(self, song_name:str) -> bool:
+        return song_name in self.positions
+
+    # The insert, remove and move functions only work on groups whose songs are in a list
+    # They only re-index the songs whose positions changed, instead of rebuilding the whole group
+    # Updates self.positions for the songs between start and end (exclusive)
+    def reindex(self, start:int, end:int) -> None:
+        for position in range(start, end):
+            self.positions[self.song_names[position]] = position
+
+    # Inserts the song at position (or at the end if position is None). Does nothing and returns False if the song is already in the group
+    def insert(self, song:Song, position:int = None) -> bool:
+        if song.song_name in self.positions:
+            return False
+        if position is None or position > len(self.songs):
+            position = len(self.songs)
+
+        self.songs.insert(position, song)
+        self.song_names.insert(position, song.song_name)
+        self.reindex(position, len(self.song_names))
+        return True
+
+    # Returns the position that the song was removed from, or None if the song isn't in the group
+    def remove(self, song_name:str) -> "Union[int, None]":
+        position:int = self.positions.pop(song_name, None)
+        if position is None:
+            return None
+
+        del self.songs[position]
+        del self.song_names[position]
+        self.reindex(position, len(self.song_names))
+        return position
+
+    # Moves the song to new_position, shifting the songs in between by one. Returns False if the song isn't in the group
+    def move(self, song_name:str, new_position:int) -> bool:
+        old_position:int = self.positions.get(song_name)
+        if old_position is None:
+            return False
+        new_position = max(0, min(new_position, len(self.songs) - 1))
+
+        song:Song = self.songs.pop(old_position)
+        del self.song_names[old_position]
+        self.songs.insert(new_position, song)
+        self.song_names.insert(new_position, song_name)
+        self.reindex(min(old_position, new_position), max(old_position, new_position) + 1)
+        return True
 
     def get_save_list(self) -> "list[str]":
         return [song.song_name for song in self.songs]
@@ -36,21 +87,35 @@ class Playlist(SongGroup):
 
         self.curr_song_index:int = None
 
-    def update_songs(self, songs:"list[Song]") -> None:
-        if self.curr_song_index != None:
-            match_found:bool = False
-            # If the song name at self.curr_song_index also exists in the new song list, move the index
-            for i, song in enumerate(songs):
-                if song.song_name == self.song_names[self.curr_song_index]:
-                    self.curr_song_index = i
-                    match_found = True
-                    break
-            # Otherwise, reset self.curr_song_index to 0
-            if not match_found:
-                self.curr_song_index = 0
-        
-        # Update self.songs and self.song_names
-        self.set_songs(songs) # Superclass method
+    # The following functions keep self.curr_song_index on the same song, unless that song is removed
+    def insert(self, song:Song, position:int = None) -> bool:
+        if position is None or position > len(self.songs):
+            position = len(self.songs)
+        inserted:bool = super().insert(song, position)
+
+        if inserted and self.curr_song_index != None and position <= self.curr_song_index:
+            self.curr_song_index += 1
+        return inserted
+
+    def remove(self, song_name:str) -> "Union[int, None]":
+        position:int = super().remove(song_name)
+
+        if position != None and self.curr_song_index != None:
+            if len(self.songs) == 0:
+                self.curr_song_index = None
+            elif position < self.curr_song_index:
+                self.curr_song_index -= 1
+            elif position == self.curr_song_index: # Point at the song before the removed one, so the song that took its place plays next in loop mode
+                self.curr_song_index = (position - 1) % len(self.songs)
+        return position
+
+    def move(self, song_name:str, new_position:int) -> bool:
+        curr_song_name:str = self.song_names[self.curr_song_index] if self.curr_song_index != None else None
+        moved:bool = super().move(song_name, new_position)
+
+        if moved and curr_song_name != None:
+            self.curr_song_index = self.positions[curr_song_name]
+        return moved
 
     def __str__(self) -> str:
         return self.name
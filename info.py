@@ -2,7 +2,18 @@ from enum import Enum
 from types import FunctionType as function
 
 TICK_DURATION:float = 0.5 # seconds. Best if TICK_DURATION <= 1
-TIMER_RESOLUTION:float = 0.2 # seconds
+SEEK_DURATION:int = 10 # The number of seconds that the seek keybinds move the current song by
+COMMAND_TIMEOUT:float = 2 # The max number of seconds the console waits for the song-playing thread to carry out a pause, resume, or skip
+LIBRARY_RESCAN_INTERVAL:float = 5 # seconds between each check for songs that were added to, changed in, or removed from the songs folder
+LYRICS_CACHE_SIZE:int = 16 # The max number of songs whose parsed lyrics are kept in memory at a time
+OVERVIEWS_DIRECTORY:str = "overviews" # Where analysis.py saves the waveform overviews of the songs
+OVERVIEW_BUCKETS:int = 256 # The number of equal parts of each song that its waveform overview has the lowest and highest sample of
+OVERVIEW_CACHE_SIZE:int = 16 # The max number of songs whose waveform overviews are kept in memory at a time
+WAVEFORM_WIDTH:int = 64 # The number of characters in the waveform progress bar
+TARGET_LOUDNESS:float = -18 # dBFS. The RMS level that songs are turned up or down to, using the loudness found by analysis.py
+MAX_NORMALIZATION_GAIN:float = 12 # dB. The most that a quiet song will be turned up by
+PEAK_HEADROOM:float = 0.5 # dB. Songs aren't turned up any further than this far below full scale, so they don't clip
+AUDIO_OUTPUT:str = None # "winsound", "null" (plays nothing, but keeps the songs' timing), or "file" (records the songs to WAV files). None uses winsound on Windows and the null output everywhere else
 
 PLACEHOLDER_SONGNAME:str = "*"
 LYRIC_PLACEHOLDER_CHARACTER:str = "\u2669" # Used in lyric lines when the song doesn't have any words for that part
@@ -48,6 +59,7 @@ def remove_tags(string:str) -> str:
 STANDARD_SONG_LENGTH:int = 180 # Used to scale the weight of each song by its length
 BASE_SONG_WEIGHT:int = 120 # because 120 is divisible by almost everything
 RATE_CHANGE:int = 3 # How many times more/less likely it is for a hot/cold song to be chosen
+FOCUS_RATE_CHANGE:int = 4 # How many times more likely it is for a song whose features are in the shuffle focus to be chosen
 class Modifiers(Enum):
     hot = {"color" : Colors.pink, "description" : "While in shuffle mode, increase the chance of a song being played and disables its cooldown", "weight update" : lambda curr_weight, *_ : round(curr_weight*RATE_CHANGE)}
     cold = {"color" : Colors.cool_blue, "description" : "While in shuffle mode, decrease the chance of a song being played", "weight update" : lambda curr_weight, *_ : round(curr_weight/RATE_CHANGE)}
@@ -63,6 +75,10 @@ class SongAttributes(Enum):
     modifiers = None
 ATTRIBUTES_COLORING_ORDER:"list[SongAttributes]" = [SongAttributes.disabled, SongAttributes.playing, SongAttributes.queued, SongAttributes.has_sequence, SongAttributes.sequenced, SongAttributes.modifiers]
 
+# Each song packs its boolean attributes and its modifiers into 2 ints, with one bit per attribute/modifier
+ATTRIBUTE_FLAGS:"dict[SongAttributes, int]" = {attribute : 1 << i for i, attribute in enumerate(SongAttributes) if attribute != SongAttributes.modifiers}
+MODIFIER_FLAGS:"dict[Modifiers, int]" = {modifier : 1 << i for i, modifier in enumerate(Modifiers)}
+
 # Each song can only have up to one of the modifiers in each set at the same time
 EXCLUSIVE_MODIFIERS:"list[set[Modifiers]]" = [{Modifiers.hot, Modifiers.cold}]
 
@@ -0,0 +1,236 @@
+from concurrent.futures import ThreadPoolExecutor
+from os import cpu_count, stat_result, replace, listdir, scandir, getpid, remove, stat as get_stat
+from os.path import abspath, normcase
+from threading import Lock
+from time import perf_counter
+from typing import Union
+from itertools import chain
+import json
+
+from song import Song, probe_song
+from info import *
+
+# Probing a song is mostly spent waiting on the disk (or the network), so use more threads than there are cores
+SCAN_WORKERS:int = min(32, (cpu_count() or 1) * 4)
+LYRICS_DIRECTORY:str = "lyrics"
+
+# Returns the key that a file's entry is stored under in the library cache
+# Keys are absolute and normalized, so the player and analysis.py share each file's entry no matter how they name the songs folder
+def get_cache_key(file_name:str) -> str:
+    return normcase(abspath(file_name))
+
+# Stores the metadata of each song file on disk so unchanged files don't have to be opened each time the program starts
+# Each entry is keyed by the file's path (see get_cache_key()) and is only valid while the file's size and modification time stay the same
+# The player and analysis.py can both have the cache open at once. Saving only writes the entries that were changed here over the ones in the file, and reload() picks up the entries that the other program saved
+class LibraryCache:
+    CACHE_FILE_PATH:str = "library_cache.json" # Kept next to the save file
+    VERSION:int = 2 # Increment this whenever the layout of the metadata changes so older caches are discarded
+
+    def __init__(self, path:str = CACHE_FILE_PATH):
+        self.path:str = path
+        self.lock:Lock = Lock()
+        self.changed:bool = False
+        self.changed_keys:set[str] = set() # The entries that were put here since the cache was last saved
+        self.removed_keys:set[str] = set() # The entries that were pruned here since the cache was last saved
+        self.updated_keys:set[str] = set() # The entries that another program changed, which haven't been returned by reload() yet
+        self.file_mtime:int = None # The modification time of the cache file when it was last read or written
+        self.dropped_overview_names:set[str] = set() # The overviews of the entries that were pruned or replaced since the cache was last saved. Saving deletes the ones that no entry uses anymore
+
+        # Each value is in the form of {"size" : int, "mtime" : int, "metadata" : the dict returned by probe_song()}
+        self.entries:dict[str, dict[str, any]] = {}
+        self.read_file()
+        self.updated_keys.clear()
+
+    # Returns the cached metadata of the file, or None if the file isn't cached or was changed since it was cached
+    def get(self, file_name:str, stat:stat_result) -> "Union[dict[str, Union[int, bool]], None]":
+        entry:dict[str, any] = self.entries.get(get_cache_key(file_name))
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+            return entry["metadata"]
+        return None
+
+    # Returns the cached metadata of the file without checking whether the file has changed since it was cached, or None if the file isn't cached
+    def peek(self, file_name:str) -> "Union[dict[str, Union[int, bool]], None]":
+        entry:dict[str, any] = self.entries.get(get_cache_key(file_name))
+        return entry["metadata"] if entry else None
+
+    def put(self, file_name:str, stat:stat_result, metadata:"dict[str, Union[int, bool]]") -> None:
+        with self.lock:
+            key:str = get_cache_key(file_name)
+            self.drop_overview(self.entries.get(key), metadata.get("overview"))
+            self.entries[key] = {"size" : stat.st_size, "mtime" : stat.st_mtime_ns, "metadata" : metadata}
+            self.changed_keys.add(key)
+            self.removed_keys.discard(key)
+            self.changed = True
+
+    # Removes the entries of any files that aren't in file_names
+    def prune(self, file_names:"set[str]") -> None:
+        with self.lock:
+            keys:set[str] = {get_cache_key(file_name) for file_name in file_names}
+            for key in [key for key in self.entries if key not in keys]:
+                self.drop_overview(self.entries.pop(key))
+                self.changed_keys.discard(key)
+                self.removed_keys.add(key)
+                self.changed = True
+
+    # Helper function for put() and prune(). Remembers the entry's overview if the entry is being replaced by one with a different overview (or is being removed)
+    def drop_overview(self, entry:"Union[dict[str, any], None]", new_overview_name:str = None) -> None:
+        overview_name:str = entry["metadata"].get("overview") if entry else None
+        if overview_name != None and overview_name != new_overview_name:
+            self.dropped_overview_names.add(overview_name)
+
+    # Helper function for save(). Deletes the files of the dropped overviews that no entry uses anymore. Songs with the same overview share its file
+    def remove_orphaned_overviews(self) -> None:
+        used_overview_names:set[str] = {entry["metadata"].get("overview") for entry in self.entries.values()}
+        for overview_name in self.dropped_overview_names - used_overview_names:
+            try:
+                remove(f"{OVERVIEWS_DIRECTORY}/{overview_name}.bin")
+            except OSError: # Already removed, or the other program still has it open
+                pass
+        self.dropped_overview_names.clear()
+
+    # Helper function for __init__(), reload() and save(). Call this with self.lock held (except from __init__())
+    # Reads the cache file if it changed since it was last read or written, and takes in the entries that another program changed
+    # Entries that were changed here and haven't been saved yet are kept. If another program added results to the same version of a file (ex. analysis.py), the results are added to the entry
+    def read_file(self) -> None:
+        try:
+            file_mtime:int = get_stat(self.path).st_mtime_ns
+            if file_mtime == self.file_mtime:
+                return
+            with open(self.path, "r", encoding = "utf-8") as file:
+                data:dict[str, any] = json.load(file)
+        except: # If there isn't a cache file yet or the file is unreadable, keep the entries that are already loaded
+            return
+        self.file_mtime = file_mtime
+        if data.get("version") != self.VERSION:
+            return
+
+        for file_name, entry in data["entries"].items():
+            key:str = get_cache_key(file_name) # Caches saved before the keys were normalized are still used
+            own_entry:dict[str, any] = self.entries.get(key)
+            if key in self.removed_keys or own_entry == entry:
+                continue
+            if key in self.changed_keys:
+                if (own_entry["size"], own_entry["mtime"]) == (entry["size"], entry["mtime"]) and not entry["metadata"].keys() <= own_entry["metadata"].keys():
+                    own_entry["metadata"] = {**entry["metadata"], **own_entry["metadata"]}
+                    self.updated_keys.add(key)
+            else:
+                self.entries[key] = entry
+                self.updated_keys.add(key)
+
+    # Takes in any entries that another program (such as analysis.py) saved since the cache file was last read or written
+    # Returns the keys of the entries that changed, which are the same as get_cache_key() of the files' names
+    def reload(self) -> "set[str]":
+        with self.lock:
+            self.read_file()
+            updated_keys:set[str] = self.updated_keys
+            self.updated_keys = set()
+            return updated_keys
+
+    # Rewrites the cache file, if anything has changed since it was loaded or last saved
+    # Any entries that another program saved in the meantime are read first, so they aren't overwritten
+    def save(self) -> None:
+        with self.lock:
+            if not self.changed:
+                return
+            self.read_file()
+
+            # Write to a temporary file first so an interrupted save can't corrupt the cache. Each program uses its own temporary file, in case both save at once
+            temporary_path:str = f"{self.path}.{getpid()}.tmp"
+            with open(temporary_path, "w", encoding = "utf-8") as file:
+                json.dump({"version" : self.VERSION, "entries" : self.entries}, file, separators = (",", ":"))
+            replace(temporary_path, self.path)
+            self.file_mtime = get_stat(self.path).st_mtime_ns
+            if self.dropped_overview_names:
+                self.remove_orphaned_overviews() # Only once the entries that were read from the file have been merged in, so overviews that the other program still uses are kept
+            self.changed = False
+            self.changed_keys.clear()
+            self.removed_keys.clear()
+
+# Returns the names of the songs that have a lyrics file, using a single listing of the lyrics folder
+def list_lyrics_song_names() -> "set[str]":
+    try:
+        return {file_name[:-4] for file_name in listdir(LYRICS_DIRECTORY) if file_name.endswith(".txt")}
+    except: # If there is no lyrics folder
+        return set()
+
+# Returns the cached metadata of the file if it hasn't changed, otherwise probes the file and caches the result
+# lyrics_song_names: the set returned by list_lyrics_song_names(), used so the lyrics files don't have to be checked one by one
+def load_metadata(song_name:str, file_name:str, stat:stat_result, cache:LibraryCache, lyrics_song_names:"set[str]") -> "dict[str, Union[int, bool]]":
+    metadata:dict[str, Union[int, bool]] = cache.get(file_name, stat)
+    if not metadata:
+        metadata = probe_song(song_name, file_name)
+        cache.put(file_name, stat, metadata)
+
+    # Lyrics files can be added or removed without the song file changing
+    if metadata["lyrics"] != (song_name in lyrics_song_names):
+        metadata = {**metadata, "lyrics" : song_name in lyrics_song_names}
+        cache.put(file_name, stat, metadata)
+
+    return metadata
+
+# Helper function for scan_songs()
+def load_song(job:"tuple[str, str, int, stat_result]", cache:LibraryCache, lyrics_song_names:"set[str]") -> Song:
+    song_name, file_name, index, stat = job
+    return Song(song_name, file_name, index, load_metadata(song_name, file_name, stat, cache, lyrics_song_names))
+
+# jobs: a list of (song name, file name, index, stat result of the file) tuples in the order that the songs should be listed in
+# Creates the Song objects on a bounded pool of worker threads, using the metadata in cache for any unchanged files
+# Returns a dict of the created songs keyed by song name, in the same order as jobs
+def scan_songs(jobs:"list[tuple[str, str, int, stat_result]]", cache:LibraryCache = None, max_workers:int = SCAN_WORKERS, silent:bool = False) -> "dict[str, Song]":
+    start_time:float = perf_counter()
+    if cache is None:
+        cache = LibraryCache()
+
+    songs:dict[str, Song] = {}
+    lyrics_song_names:set[str] = list_lyrics_song_names()
+    if len(jobs) > 0:
+        with ThreadPoolExecutor(max_workers = max(1, min(max_workers, len(jobs))), thread_name_prefix = "Library scanner") as executor:
+            # executor.map() yields the results in the order of jobs, regardless of which worker finishes first
+            for song in executor.map(lambda job : load_song(job, cache, lyrics_song_names), jobs):
+                songs[song.song_name] = song
+
+    cache.prune({job[1] for job in jobs})
+    cache.save()
+
+    elapsed_time:float = perf_counter() - start_time
+    if not silent:
+        files_per_second:float = len(jobs) / elapsed_time if elapsed_time > 0 else float(len(jobs))
+        print(color(f"Scanned {len(jobs)} files in {elapsed_time:.2f}s ({files_per_second:.0f} files/s)", Colors.faint))
+
+    return songs
+
+# Keeps track of the files in the songs folder so that changes can be found while the player is running
+# entries: the stat results of every file that was in the folder when the songs were last scanned, keyed by file name
+class LibraryWatcher:
+    def __init__(self, directory:str, entries:"dict[str, stat_result]"):
+        self.directory:str = directory
+        self.known_files:dict[str, tuple[int, int]] = {file_name : (stat.st_size, stat.st_mtime_ns) for file_name, stat in entries.items()} # Values are in the form of (size, modification time)
+
+    # Lists the folder and diffs its entries against the known files, then updates the known files
+    # Nothing is opened or probed here, so this only costs a single listing of the folder
+    # Returns a tuple in the form of (added files, modified files, removed file names), where the added and modified files are dicts of stat results keyed by file name
+    def poll(self) -> "tuple[dict[str, stat_result], dict[str, stat_result], set[str]]":
+        added_files:dict[str, stat_result] = {}
+        modified_files:dict[str, stat_result] = {}
+        listed_file_names:set[str] = set()
+
+        for entry in scandir(self.directory):
+            if not entry.is_file():
+                continue
+            listed_file_names.add(entry.name)
+
+            stat:stat_result = entry.stat()
+            known_file:tuple[int, int] = self.known_files.get(entry.name)
+            if known_file is None:
+                added_files[entry.name] = stat
+            elif known_file != (stat.st_size, stat.st_mtime_ns):
+                modified_files[entry.name] = stat
+
+        removed_file_names:set[str] = set(self.known_files.keys()) - listed_file_names
+
+        for file_name, stat in chain(added_files.items(), modified_files.items()):
+            self.known_files[file_name] = (stat.st_size, stat.st_mtime_ns)
+        for file_name in removed_file_names:
+            del self.known_files[file_name]
+
+        return (added_files, modified_files, removed_file_names)
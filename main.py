@@ -1,21 +1,33 @@
 from enum import Enum
-from time import sleep as wait, time
-from os import listdir, get_terminal_size
-from winsound import PlaySound, SND_ASYNC
-from msvcrt import getch
-from threading import Thread
+from time import sleep as wait
+from os import scandir, get_terminal_size, DirEntry, stat_result, stat as get_stat
+try:
+    from msvcrt import getch
+except ImportError: # msvcrt is only available on Windows. The player needs it for keyboard input, but its classes can still be imported elsewhere
+    getch = None
+from threading import Thread, RLock, Event
 from random import randint
 from difflib import get_close_matches
-from math import ceil
 from typing import Union
 from types import FunctionType as function
 from unicodedata import east_asian_width
 from itertools import chain
+from math import ceil
+from struct import iter_unpack
+from array import array
 import json
 
-from song import Song
+from song import Song, find_lyric_line
 from info import *
 from group import Playlist, SyncedList
+from structures import FenwickTree, CooldownRing, CountedQueue
+from clock import PlaybackClock, ClockStates
+from control import ControlChannel, PlayerCommands
+from audio import AudioOutput, create_audio_output
+from wav import WavFormatError
+from library import scan_songs, load_metadata, list_lyrics_song_names, get_cache_key, LibraryCache, LibraryWatcher
+from analysis import find_duplicates
+from features import FeatureTable, FEATURE_NAMES
 # Converts the number of seconds into a str in mm:ss format
 def to_minutes_str(seconds:int) -> str:
     if type(seconds) == int:
@@ -27,6 +39,22 @@ def to_minutes_str(seconds:int) -> str:
     else:
         return "--"
 
+WAVEFORM_CHARACTERS:str = "▁▂▃▄▅▆▇█" # From quietest to loudest
+
+# Draws a song's waveform overview (see song.load_overview()) as a bar of width characters, with the part of the song that has been played in color
+# The bar is scaled to the loudest part of the song, so quiet songs still fill the bar
+# progress: how much of the song has been played, from 0 to 1
+def draw_waveform(overview:bytes, progress:float, width:int = WAVEFORM_WIDTH) -> str:
+    peaks:list[int] = [max(-low, high) for low, high in iter_unpack("bb", overview)]
+    loudest_peak:int = max(peaks, default = 0) + 1
+    characters:list[str] = []
+    for column in range(width):
+        peak:int = max(peaks[column * len(peaks) // width : (column + 1) * len(peaks) // width], default = 0) # Each character shows the loudest of the parts under it
+        characters.append(WAVEFORM_CHARACTERS[min(len(WAVEFORM_CHARACTERS) - 1, peak * len(WAVEFORM_CHARACTERS) // loudest_peak)])
+
+    played_width:int = max(0, min(width, int(progress * width)))
+    return color("".join(characters[:played_width]), Colors.light_blue) + color("".join(characters[played_width:]), Colors.faint)
+
 def clear_console() -> None:
     print("\033c", end = "")
 
@@ -267,7 +295,8 @@ class ListModes(Enum):
     Playlist = 6
     Sequences = 7
     Sequence = 8
-    Default = 9
+    Duplicates = 9
+    Default = 10
 class ReturnFlags(Enum): # Used in spotify.list_actions()
     UnrecognizedInput = 1 # Currently only used when returning listing results for ListModes.ListCreation
     ListCompleted = 2 # Used when editing a list to signify the completion of the list
@@ -322,13 +351,15 @@ class Keybind:
 class spotify:
     # Constant + static variables
     DEFAULT_INTERLUDE_DURATION:int = 8 # Seconds
+    CROSSFADE_DURATION:float = 6 # The number of seconds that each song overlaps with the next song while crossfading
     # When the playback mode is shuffle, the minimum number of songs that would have to play between each repeat
     DEFAULT_REPEAT_COOLDOWN:int = 5 # Will be capped at len(playlist) - 1 in the constructor
     
     DEFAULT_PLAYBACK_MODE:str = "Shuffle" # Name of the default playback mode, used if one isn't saved in the save file
     SAVE_FILE_PATH:str = "save_file.json"
 
-    def __init__(self, songs:"dict[str, Song]", song_names:"list[str]"): # Pass song_names as an argument to keep the order of the names the same each time the code runs
+    # library_cache: the cache that the songs were scanned with, which also holds analysis.py's results. Loaded from the default path if it isn't given
+    def __init__(self, songs:"dict[str, Song]", song_names:"list[str]", library_cache:LibraryCache = None): # Pass song_names as an argument to keep the order of the names the same each time the code runs
         save_file:dict[str, any] = {}
         try:
             with open(self.SAVE_FILE_PATH, "r", encoding = "utf-8") as file:
@@ -341,6 +372,21 @@ class spotify:
 
         self.songs:dict[str, Song] = songs # Keys are the name of the song
         self.song_names:list[str] = song_names
+        self.library_lock:RLock = RLock() # Held while the next song is chosen and while library rescans change the songs
+        self.library_cache:LibraryCache = library_cache if library_cache != None else LibraryCache()
+        self.clock:PlaybackClock = PlaybackClock() # Tracks the position of the current song. The UI waits on it instead of polling
+        self.clock_song:Song = None # The song that self.clock was last started for. During interludes, and before the first song starts, this isn't self.curr_song
+        self.controls:ControlChannel = ControlChannel() # Sends pause, resume and skip commands from the console thread to the song-playing thread
+        self.output:AudioOutput = create_audio_output(AUDIO_OUTPUT) # Where the songs are played. See audio.py
+        self.pending_acknowledgements:list[Event] = [] # The done events of commands that take effect once the next song starts
+        # The weight that shuffle mode gives each song right now, indexed by the songs' indices. See self.get_shuffle_weight()
+        # Built at the end of the constructor and updated in place whenever a song's weight or eligibility changes
+        self.shuffle_weights:FenwickTree = None
+        self.shuffle_pool:set[str] = set() # The names of the songs that shuffle mode can pick from (the active playlist, or every song)
+        self.focused_song_names:set[str] = set() # The songs whose features are in the range set with the 'focus' command, which shuffle mode picks FOCUS_RATE_CHANGE times as often
+        # 1 for each enabled song and 0 for each disabled song, in the order that loop mode plays them (the active playlist, or every song)
+        # Lets loop mode find the next enabled song without copying or searching the song list. Built along with self.shuffle_weights
+        self.loop_order:FenwickTree = None
         self.max_song_name_length:int = 0
         for name, song in self.songs.items(): # Set self.max_song_name_length and the sequences of each Song object
             if len(name) > self.max_song_name_length:
@@ -362,17 +408,15 @@ class spotify:
         for song_name in self.disabled_song_names:
             self.songs[song_name].disable() # Avoid using self.disable_song() because it will print confirmation messages
 
-        self.queue:list[Song] = []
-        self.queue_song_names:list[str] = []
+        # The names of the queued songs. Placeholder songs are queued as PLACEHOLDER_SONGNAME
+        self.queue:CountedQueue = CountedQueue()
         for song_name in save_file.get("queue", []):
             if song_name == PLACEHOLDER_SONGNAME:
-                self.queue.append(None)
-                self.queue_song_names.append(PLACEHOLDER_SONGNAME)
+                self.queue.append(PLACEHOLDER_SONGNAME)
 
-            elif song_name in self.song_names:
+            elif song_name in self.songs:
                 # Don't use self.enqueue since it will print things for every song that's enqueued
-                self.queue.append(self.songs[song_name])
-                self.queue_song_names.append(song_name)
+                self.queue.append(song_name)
 
                 self.songs[song_name].set_enqueued() # Update the enqueued status in the song
 
@@ -387,7 +431,7 @@ class spotify:
             # Add this modifier to the songs that are initialized with the modifier
             # Temporarily set the synced_list_count of all songs to 1
             for song in [self.songs[song_name] for song_name in self.modifiers[modifier]]:
-                song.attributes[SongAttributes.modifiers].add(modifier)
+                song.attributes[SongAttributes.modifiers] |= {modifier}
         for song in self.songs.values():
             song.recalculate_weight(1)
 
@@ -415,22 +459,26 @@ class spotify:
                         del sequenced_names[sequenced_index]
 
         self.interlude_duration:int = max(0, self.DEFAULT_INTERLUDE_DURATION)
-        self.remaining_interlude_indicator:str = None # Indicates how much time is left for the cooldown period between this song and the next one
+        self.interlude_indicator_text:str = None # Read and write this through self.remaining_interlude_indicator
         self.cooldown_between_repeats:int = min(len(self.song_names) - 2, self.DEFAULT_REPEAT_COOLDOWN) # Leave at least 2 songs off cooldown so shuffle mode can remain semi-randomized
-        self.songs_on_cooldown:list[list[str]] = []
+        # Each list holds the songs that went on cooldown when one song was picked. The oldest list leaves the ring when a new song is picked after the ring is full
+        self.songs_on_cooldown:CooldownRing = CooldownRing(self.cooldown_between_repeats)
 
         self.encore_activated:bool = False
         self.exit_later:bool = False
 
         self.playing:bool = True
         self.pause_bookmark_index:int = None # The index of the song to restart after resuming. Will be reset to None by self.set_next_song() after resuming
+        self.pause_bookmark_frame:int = 0 # The frame of the bookmarked song to resume from
         self.terminated:bool = False
         self.interlude_flag:bool = True # Whether there will be a cooldown period before the next song plays. Will be (re)set to True when the next song starts playing
+        self.crossfade_enabled:bool = False # Whether to crossfade from each song into the next instead of playing interludes
 
         self.indicator_conditions:dict[str, bool] = {
             "🎤" : (lambda:bool(self.curr_song.lyrics)),
             "🔁" : (lambda:self.encore_activated),
-            "⌛" : (lambda:self.exit_later)
+            "⌛" : (lambda:self.exit_later),
+            "🎚" : (lambda:self.crossfade_enabled)
         }
 
         self.listing_info:dict[ListModes, dict[str, any]] = {
@@ -444,10 +492,12 @@ class spotify:
             },
             ListModes.Queue : {
                 "header line" : f"Select a command, or a song to remove from the queue",
-                "special commands" : {"clear" : {"confirmation" : confirmation, "action" : self.clear_queue}},
+                "special commands" : {"clear" : {"confirmation" : confirmation, "action" : self.clear_queue},
+                                        "shuffle" : {"confirmation" : None, "action" : self.shuffle_queue},
+                                        "dedupe" : {"confirmation" : None, "action" : self.dedupe_queue}},
                 "no results" : {"message" : "No songs found! Please check your spelling", "action" : self.list_queue},
                 "disabled color keys" : [SongAttributes.playing, SongAttributes.disabled, SongAttributes.has_sequence, SongAttributes.sequenced, SongAttributes.modifiers],
-                "prompt" : f"Enter the index or the name of the song to remove ({color('q')}/{color('quit')} to cancel, {color('clear')} to clear queue): ",
+                "prompt" : f"Enter the index or the name of the song to remove ({color('q')}/{color('quit')} to cancel, {color('clear')} to clear queue, {color('shuffle')} to shuffle it, {color('dedupe')} to remove repeats): ",
                 "no input" : valid_commands["quit"]
             },
             ListModes.Modifiers : {
@@ -481,15 +531,17 @@ class spotify:
             ListModes.Playlists : {
                 "header line" : f"Select a command to run or a playlist to view",
                 "special commands" : {"new" : {"confirmation" : None, "action" : self.create_playlist},
+                                        "smart" : {"confirmation" : None, "action" : (lambda:self.create_playlist(smart = True))},
                                         "clear" : {"confirmation" : confirmation, "action" : self.clear_all_playlists}},
                 "no results" : {"message" : "No results found! Please check your spelling", "action" : self.list_playlists},
                 "disabled color keys" : [],
-                "prompt" : f"Enter the index or name of a playlist ({color('new')} to create a playlist, {color('clear')} to clear all playlists): ",
+                "prompt" : f"Enter the index or name of a playlist ({color('new')} to create a playlist, {color('smart')} to create one from the songs' tempo, energy, or brightness, {color('clear')} to clear all playlists): ",
                 "no input" : valid_commands["quit"]
             },
             ListModes.Playlist : {
                 "header line" : "Select a command to run for {item_name}",
                 "special commands" : {"play" : {"confirmation" : None, "action" : (lambda playlist_name:self.start_playlist(playlist_name))},
+                                    "enqueue" : {"confirmation" : None, "action" : (lambda playlist_name:self.enqueue_playlist(playlist_name))},
                                     "stop" : {"confirmation" : None, "action" : self.stop_playlist},
                                     "edit" : {"confirmation" : None, "action" : (lambda playlist_name:self.edit_playlist(playlist_name))},
                                     "clear" : {"confirmation" : confirmation, "action" : (lambda playlist_name:self.clear_playlist(playlist_name))}
@@ -507,6 +559,15 @@ class spotify:
                 "prompt" : f"Enter the index or name of a standalone song ({color('new')} to create a new sequence, {color('clear')} to clear all sequences): ",
                 "no input" : valid_commands["quit"]
             },
+            ListModes.Duplicates : {
+                "header line" : f"Select a command to run on every group of exact copies, or a song to view. Songs with similar audio are only listed, since they might not be the same song",
+                "special commands" : {"sync" : {"confirmation" : confirmation, "action" : self.sync_duplicates},
+                                        "disable" : {"confirmation" : confirmation, "action" : self.disable_duplicates}},
+                "no results" : {"message" : "No results found! Please check your spelling", "action" : self.list_duplicates},
+                "disabled color keys" : [SongAttributes.playing, SongAttributes.queued, SongAttributes.has_sequence, SongAttributes.sequenced],
+                "prompt" : f"Enter the index or the name of a song ({color('sync')} to sync the songs in each group, {color('disable')} to disable every song but the first one in each group): ",
+                "no input" : valid_commands["quit"]
+            },
             ListModes.Default : {
                 "header line" : f"Which one do you mean?",
                 "special commands" : {},
@@ -519,7 +580,7 @@ class spotify:
         self.listing_attributes:dict[SongAttributes, dict[str, any]] = {
             SongAttributes.playing : {"enabled" : True, "color" : SongAttributes.playing.value, "nameset" : (lambda : {self.curr_song.song_name}), "message" : "Currently playing"},
             SongAttributes.disabled : {"enabled" : True, "color" : SongAttributes.disabled.value, "nameset" : (lambda : set(self.disabled_song_names)), "message" : "Disabled"},
-            SongAttributes.queued : {"enabled" : True, "color" : SongAttributes.queued.value, "nameset" : (lambda : set(self.queue_song_names)), "message" : "Queued"},
+            SongAttributes.queued : {"enabled" : True, "color" : SongAttributes.queued.value, "nameset" : (lambda : set(self.queue.counts.keys())), "message" : "Queued"},
             SongAttributes.has_sequence : {"enabled" : True, "color" : SongAttributes.has_sequence.value, "nameset" : (lambda : set(self.sequences.keys())), "message" : "Has sequence"},
             SongAttributes.sequenced : {"enabled" : True, "color" : SongAttributes.sequenced.value, "nameset" : (lambda : set(chain(*(sequence for sequence in self.sequences.values())))), "message" : "In sequence"},
             SongAttributes.modifiers : {"enabled" : True, "color" : SongAttributes.modifiers.value}
@@ -532,7 +593,10 @@ class spotify:
         # Add the key commands
         Keybind(" ", lambda : self.pause() if self.playing else self.resume(), description = "pause/resume")
         Keybind("e", self.encore, description = "repeat the current song")
+        Keybind("f", self.toggle_crossfade, description = "crossfade between songs instead of pausing between them")
         Keybind(">", self.skip, description = "skip to the next song")
+        Keybind("[", lambda : self.seek(-SEEK_DURATION), description = f"rewind {SEEK_DURATION} seconds")
+        Keybind("]", lambda : self.seek(SEEK_DURATION), description = f"fast forward {SEEK_DURATION} seconds")
         Keybind("k", self.karaoke, description = "enter karaoke mode (if lyrics are available)")
         Keybind("l", self.list_songs, description = "list songs")
         Keybind("x", self.stop, description = "terminate the program")
@@ -551,6 +615,18 @@ class spotify:
         if save_file.get("curr_song", None) in self.songs.keys():
             self.pause_bookmark_index = self.song_names.index(save_file["curr_song"]) # Don't call play_next_song() here, as it will be called from another thread
 
+        self.rebuild_song_indexes()
+
+    # Indicates how much time is left for the cooldown period between this song and the next one
+    # Setting it wakes up any threads waiting on self.clock, so the UI can redraw the indicator as soon as it changes
+    @property
+    def remaining_interlude_indicator(self) -> str:
+        return self.interlude_indicator_text
+    @remaining_interlude_indicator.setter
+    def remaining_interlude_indicator(self, indicator:str) -> None:
+        self.interlude_indicator_text = indicator
+        self.clock.notify_listeners()
+
     # Returns the number of songs synced with this song, including this song
     def get_synced_count(self, song_name:str) -> int:
         pure_name:str = get_pure_song_name(song_name)
@@ -559,6 +635,60 @@ class spotify:
         else:
             return 1 # Becuase each song is technically always synced with itself
 
+    # Returns the weight that shuffle mode should give this song right now
+    # Songs outside of the active playlist, songs on cooldown, and queued songs (unless they're hot) can't be picked. Disabled songs already have a weight of 0
+    # Songs in the shuffle focus (see self.focus_shuffle()) are picked more often
+    def get_shuffle_weight(self, song:Song) -> int:
+        if (song.song_name not in self.shuffle_pool) or self.is_on_cooldown(song.song_name):
+            return 0
+        if song.attributes[SongAttributes.queued] and (Modifiers.hot not in song.attributes[SongAttributes.modifiers]):
+            return 0
+        if song.song_name in self.focused_song_names:
+            return song.weight * FOCUS_RATE_CHANGE
+        return song.weight
+    # Called by songs whenever their weight, disabled status, or queued status changes
+    def update_shuffle_weight(self, song:Song) -> None:
+        if self.shuffle_weights is None: # If the constructor hasn't finished yet
+            return
+
+        with self.library_lock:
+            # Songs that were removed by a library rescan don't have a place in self.shuffle_weights anymore
+            if song.index < len(self.shuffle_weights) and self.song_names[song.index] == song.song_name:
+                self.shuffle_weights[song.index] = self.get_shuffle_weight(song)
+    # Called by songs whenever they are disabled or enabled
+    def update_loop_order(self, song:Song) -> None:
+        if self.loop_order is None: # If the constructor hasn't finished yet
+            return
+
+        with self.library_lock:
+            position:int = self.get_loop_position(song)
+            if position != None:
+                self.loop_order[position] = 0 if song.attributes[SongAttributes.disabled] else 1
+    # Returns the position of the song in self.loop_order, or None if loop mode doesn't play the song right now
+    def get_loop_position(self, song:Song) -> "Union[int, None]":
+        if self.active_playlist:
+            return self.active_playlist.positions.get(song.song_name)
+        # Songs that were removed by a library rescan don't have a place in self.loop_order anymore
+        if song.index < len(self.loop_order) and self.song_names[song.index] == song.song_name:
+            return song.index
+        return None
+    # Recalculates the shuffle weight of every song and which songs loop mode can stop on. Call this when the active playlist changes or songs are removed
+    def rebuild_song_indexes(self) -> None:
+        with self.library_lock:
+            self.shuffle_pool = set(self.active_playlist.song_names if self.active_playlist else self.song_names)
+            self.shuffle_weights = FenwickTree([self.get_shuffle_weight(self.songs[song_name]) if song_name in self.songs else 0 for song_name in self.song_names])
+
+            loop_songs:list[Song] = self.active_playlist.songs if self.active_playlist else [self.songs[song_name] for song_name in self.song_names]
+            self.loop_order = FenwickTree([0 if song.attributes[SongAttributes.disabled] else 1 for song in loop_songs])
+
+    def is_on_cooldown(self, song_name:str) -> bool:
+        return song_name in self.songs_on_cooldown
+    # Updates self.cooldown_between_repeats and resizes self.songs_on_cooldown to match
+    # Returns the names of the songs that came off cooldown because the ring shrank
+    def set_repeat_cooldown(self, cooldown_between_repeats:int) -> "list[str]":
+        self.cooldown_between_repeats = cooldown_between_repeats
+        return self.songs_on_cooldown.resize(cooldown_between_repeats)
+
     # Call this after the thread that plays the songs has been started
     def start(self) -> None:
         if len(self.songs) > 0:
@@ -574,7 +704,7 @@ class spotify:
             "mode" : self.mode.name,
             "curr_song" : self.curr_song.song_name,
             "disabled" : list(self.disabled_song_names),
-            "queue" : self.queue_song_names,
+            "queue" : list(self.queue),
             "active_sequence" : self.sequence,
             "modifiers" : {modifier.name : modifier_list for modifier, modifier_list in self.modifiers.items()},
             "sequences" : self.sequences,
@@ -590,7 +720,9 @@ class spotify:
         clear_console()
         # If the current song will be over in 5 seconds or less, set curr_song to the next song and save that before exitting
         # The remaining time for the current song will be 0 if a delayed exit was used, unless the last song before the exit was skipped midway through
-        if (self.exit_later) or (self.curr_song.duration - self.curr_song.curr_duration <= 5):
+        # During interludes set_next_song() has already been called, so only check the clock while it's timing the current song (playing, or paused with the song bookmarked)
+        song_in_progress:bool = self.clock_song != None and self.clock_song is self.curr_song and (self.clock.state == ClockStates.Playing or self.pause_bookmark_index is not None)
+        if (self.exit_later) or (song_in_progress and self.clock.remaining() <= 5):
             self.set_next_song()
 
         self.save()
@@ -603,13 +735,30 @@ class spotify:
         self.autoupdating = False # Keyboard inputs will not work if program exits while getch() is active (while in standby mode)
         self.update_ui()
 
+    def toggle_crossfade(self) -> None:
+        if not self.output.supports_crossfade:
+            clear_console()
+            print(self.output.CROSSFADE_UNAVAILABLE_MESSAGE)
+            block_until_input()
+            self.update_ui()
+            return
+
+        self.crossfade_enabled = not self.crossfade_enabled
+        self.update_ui()
+    # Returns the number of seconds before the end of song that the next song should start crossfading in, or 0 if the next song shouldn't crossfade in
+    def get_crossfade_duration(self, song:Song) -> float:
+        if not (self.crossfade_enabled and self.output.supports_crossfade) or self.exit_later: # Let the last song finish before a delayed exit
+            return 0
+        return min(self.CROSSFADE_DURATION, (song.end_time - song.start_time) / 2) # Short songs spend at most half of their length crossfading
+
     # Uses self.list_actions to edit selected_names using the items in selection_pool
         # Does not directly edit selected_names and selection_pool
     # header_line: custom header line, defaults to the default header line for ListModes.ListCreation in self.listing_info
     # lead_item_name: the string to pass into the listing_item_name parameter of self.list_actions
     # allow_duplicates: whether multiple copies of an item from selection_pool can be added into selected_names
+    # edits: if given, each change to the list is appended to it in the form of (whether the item was added, item name). Items are always added to the end of the list
     # Returns a list of selected strings
-    def create_list(self, selection_pool:"list[str]", selected_names:"list[str]", items_type:ItemType = ItemType.Default, header_line:str = "", lead_item_name:str = None, allow_duplicates:bool = False) -> Union[list, None]:
+    def create_list(self, selection_pool:"list[str]", selected_names:"list[str]", items_type:ItemType = ItemType.Default, header_line:str = "", lead_item_name:str = None, allow_duplicates:bool = False, edits:"list[tuple[bool, str]]" = None) -> Union[list, None]:
         selection_pool = selection_pool.copy()
         selected_names = selected_names.copy()
         if not header_line:
@@ -631,12 +780,16 @@ class spotify:
 
                 elif result in selected_section[1]: # Remove an item from selected_items
                     selected_names.remove(result.name)
+                    if edits != None:
+                        edits.append((False, result.name))
 
                     if not allow_duplicates:
                         selection_pool.append(result.name)
 
                 elif result in selection_pool_section[1]: # Add an item to selected_items
                     selected_names.append(result.name)
+                    if edits != None:
+                        edits.append((True, result.name))
 
                     if not allow_duplicates:
                         selection_pool.remove(result.name)
@@ -686,7 +839,7 @@ class spotify:
 
     def list_playlists(self, *_) -> None:
         if self.playlists: # If there is at least one playlist
-            result:Item = self.list_actions(initial_results(section("Commands: ", ["q", "quit", "new", "clear"], items_type = ItemType.Command), section("Playlists: ", list(self.playlists.keys()), items_type = ItemType.Playlist)), list_type = ListModes.Playlists)
+            result:Item = self.list_actions(initial_results(section("Commands: ", ["q", "quit", "new", "smart", "clear"], items_type = ItemType.Command), section("Playlists: ", list(self.playlists.keys()), items_type = ItemType.Playlist)), list_type = ListModes.Playlists)
             if type(result) == Item:
                 self.view_playlist(result.name)
             # self.list_actions() runs a special command if the user creates a new playlist
@@ -699,12 +852,12 @@ class spotify:
 
     def view_playlist(self, playlist_name:str):
         # self.list_actions is guaranteed to run a command
-        self.list_actions(results_lists = initial_results(section("Commands: ", ["q", "quit", ("stop" if self.active_playlist and self.active_playlist.name == playlist_name else "play"), "edit", "clear"], ItemType.Command)), list_type = ListModes.Playlist, listing_item_name = playlist_name)
+        self.list_actions(results_lists = initial_results(section("Commands: ", ["q", "quit", ("stop" if self.active_playlist and self.active_playlist.name == playlist_name else "play"), "enqueue", "edit", "clear"], ItemType.Command)), list_type = ListModes.Playlist, listing_item_name = playlist_name)
 
     def start_playlist(self, playlist_name:str, silent:bool = False):
         self.active_playlist = self.playlists[playlist_name]
-        self.cooldown_between_repeats = min(len(self.active_playlist.song_names) - 2, self.cooldown_between_repeats)
-        self.songs_on_cooldown = self.songs_on_cooldown[:self.cooldown_between_repeats]
+        self.set_repeat_cooldown(min(len(self.active_playlist.song_names) - 2, self.cooldown_between_repeats))
+        self.rebuild_song_indexes()
 
         if not silent:
             clear_console()
@@ -715,7 +868,8 @@ class spotify:
         deactivated_playlist_name:str = self.active_playlist.name
         self.active_playlist.curr_song_index = None
         self.active_playlist = None
-        self.cooldown_between_repeats = self.DEFAULT_REPEAT_COOLDOWN
+        self.set_repeat_cooldown(min(len(self.song_names) - 2, self.DEFAULT_REPEAT_COOLDOWN))
+        self.rebuild_song_indexes()
 
         if not silent:
             clear_console()
@@ -723,7 +877,8 @@ class spotify:
             block_until_input()
             self.update_ui()
 
-    def create_playlist(self) -> None:
+    # smart: fill the playlist with the songs whose features are in a range, instead of picking the songs one by one
+    def create_playlist(self, smart:bool = False) -> None:
         clear_console()
 
         playlist_name:str = input(f"Enter a name for the new playlist ([{color('q')}], [{color('quit')}], or enter nothing to cancel): ")
@@ -735,12 +890,98 @@ class spotify:
         elif playlist_name in self.playlists.keys(): # IF a playlist with this name already exists
             print(f"\nInvalid name! There is already a playlist named {color(playlist_name, Colors.bold)}")
             block_until_input()
-            self.create_playlist() # Recursively prompt the user for a new name
+            self.create_playlist(smart) # Recursively prompt the user for a new name
 
+        elif smart:
+            self.create_smart_playlist(playlist_name)
         else: # Create a new playlist
             self.playlists[playlist_name] = Playlist(playlist_name)
             self.edit_playlist(playlist_name = playlist_name)
 
+    # Prints the features that songs can be filtered by, then asks the user for a feature and a range of values
+    # Returns a tuple in the form of (feature name, low, high), or None if nothing was entered. Raises ValueError if the input isn't a feature and a range
+    def input_feature_range(self, prompt:str) -> "Union[tuple[str, float, float], None]":
+        print(f"\nFeatures: {color('bpm')} (tempo), {color('energy')} (loudness in dBFS, ex. -30 to 0), {color('spectral_centroid')} (brightness in Hz, ex. 500 for mellow to 4000 for bright or noisy)")
+        feature_filter:list[str] = input(prompt).split()
+        if len(feature_filter) == 0:
+            return None
+        if len(feature_filter) != 3 or feature_filter[0].lower() not in FEATURE_NAMES:
+            raise ValueError
+        low, high = sorted((float(feature_filter[1]), float(feature_filter[2])))
+        return feature_filter[0].lower(), low, high
+    # Returns the names of the songs whose feature is between low and high, in the order of the songs. Call this with self.library_lock held
+    def select_song_names(self, features:FeatureTable, feature_name:str, low:float, high:float) -> "list[str]":
+        song_names_by_file:dict[str, str] = {get_cache_key(self.songs[song_name].file_name) : song_name for song_name in self.song_names if song_name in self.songs} # The table is keyed the same way as the library cache
+        return sorted((song_names_by_file[file_name] for file_name in features.select(feature_name, low, high) if file_name in song_names_by_file), key = lambda song_name : self.songs[song_name].index)
+
+    # Creates a playlist out of every song whose tempo, energy, or spectral centroid is in the range that the user enters
+    # The features come from the feature table that analysis.py builds, so no songs are analyzed here
+    def create_smart_playlist(self, playlist_name:str) -> None:
+        features:FeatureTable = FeatureTable.load() # Loaded each time, since analysis.py might have been run since the last smart playlist was made
+        if len(features) == 0:
+            print(f"\nNo songs have been analyzed yet! Run {color('analysis.py', Colors.bold)} to measure the songs' features")
+            block_until_input()
+            self.list_playlists()
+            return
+
+        try:
+            feature_range:tuple[str, float, float] = self.input_feature_range(f"Enter a feature and the range of values to include (ex. {color('bpm 110 130')}): ")
+            if feature_range == None:
+                raise ValueError
+        except ValueError:
+            print("\nInvalid feature or range! The playlist wasn't created")
+            block_until_input()
+            self.list_playlists()
+            return
+        feature_name, low, high = feature_range
+
+        with self.library_lock: # Don't let a library rescan change the songs while the playlist is being filled
+            matching_song_names:list[str] = self.select_song_names(features, feature_name, low, high)
+            if len(matching_song_names) > 0:
+                self.playlists[playlist_name] = Playlist(playlist_name, [self.songs[song_name] for song_name in matching_song_names])
+        clear_console()
+        if len(matching_song_names) > 0:
+            self.save()
+            print(f"Created {color(playlist_name, Colors.bold)} with {color(len(matching_song_names), Colors.bold)} songs whose {feature_name} is between {low:g} and {high:g}")
+        else:
+            print(f"No songs have a {feature_name} between {low:g} and {high:g}, so the playlist wasn't created")
+        block_until_input()
+        self.update_ui()
+
+    # Makes shuffle mode pick the songs whose tempo, energy, or spectral centroid is in the range that the user enters FOCUS_RATE_CHANGE times as often. Entering nothing clears the focus
+    # Unlike a smart playlist, every other song can still be picked. Songs added by a library rescan aren't in the focus until it's set again
+    def focus_shuffle(self) -> None:
+        clear_console()
+        features:FeatureTable = FeatureTable.load()
+        if len(features) == 0:
+            print(f"No songs have been analyzed yet! Run {color('analysis.py', Colors.bold)} to measure the songs' features")
+            block_until_input()
+            self.update_ui()
+            return
+
+        if len(self.focused_song_names) > 0:
+            print(f"Shuffle is focused on {color(len(self.focused_song_names), Colors.bold)} songs")
+        try:
+            feature_range:Union[tuple[str, float, float], None] = self.input_feature_range(f"Enter a feature and the range of values to focus shuffle on (ex. {color('bpm 110 130')}), or nothing to clear the focus: ")
+        except ValueError:
+            print("\nInvalid feature or range! The focus wasn't changed")
+            block_until_input()
+            self.update_ui()
+            return
+
+        with self.library_lock:
+            self.focused_song_names = set(self.select_song_names(features, *feature_range)) if feature_range else set()
+        self.rebuild_song_indexes()
+
+        clear_console()
+        if feature_range:
+            feature_name, low, high = feature_range
+            print(f"Shuffle picks the {color(len(self.focused_song_names), Colors.bold)} songs whose {feature_name} is between {low:g} and {high:g} {FOCUS_RATE_CHANGE} times as often")
+        else:
+            print("Cleared the shuffle focus")
+        block_until_input()
+        self.update_ui()
+
     def edit_playlist(self, playlist_name:str = None) -> None:
         # A playlist with playlist_name is guaranteed to exist here
         playlist:Playlist = self.playlists[playlist_name]
@@ -753,7 +994,8 @@ class spotify:
             if selection_pool[i] in playlist_song_names_set:
                 del selection_pool[i]
 
-        selected_names:list[str] = self.create_list(selection_pool = selection_pool, selected_names = playlist_song_names, items_type = ItemType.Song, header_line = f"Editing playlist: {color(playlist_name, Colors.bold)}", allow_duplicates = False)
+        edits:list[tuple[bool, str]] = []
+        selected_names:list[str] = self.create_list(selection_pool = selection_pool, selected_names = playlist_song_names, items_type = ItemType.Song, header_line = f"Editing playlist: {color(playlist_name, Colors.bold)}", allow_duplicates = False, edits = edits)
 
         clear_console() # Prep for the print() statements in the following ifs
         if len(selected_names) == 0: # If the playlist was cleared
@@ -762,7 +1004,7 @@ class spotify:
             print(f"{color(playlist_name, Colors.bold)} has been deactivated and cleared")
 
         else: # If the playlist was updated with new songs
-            playlist.update_songs([self.songs[song_name] for song_name in selected_names])
+            self.apply_playlist_edits(playlist, edits)
             print(f"{color(playlist_name, Colors.bold)} has been saved")
 
         self.save()
@@ -770,6 +1012,35 @@ class spotify:
         block_until_input()
         self.update_ui()
 
+    # Applies the songs that were added to and removed from a playlist, one edit at a time. Added songs go to the end of the playlist
+    # If the playlist is active, only the edited songs' shuffle weights and the loop order from each removed song onwards are updated, instead of rebuilding every index
+    def apply_playlist_edits(self, playlist:Playlist, edits:"list[tuple[bool, str]]") -> None:
+        with self.library_lock:
+            for added, song_name in edits:
+                if song_name not in self.songs: # Removed by a library rescan while the playlist was being edited
+                    continue
+                song:Song = self.songs[song_name]
+                if added:
+                    if not playlist.insert(song):
+                        continue
+                    if playlist is self.active_playlist:
+                        self.loop_order.append(0 if song.attributes[SongAttributes.disabled] else 1)
+                else:
+                    position:int = playlist.remove(song_name)
+                    if position is None:
+                        continue
+                    if playlist is self.active_playlist: # Shift the loop order of the songs after the removed song back by one
+                        for i in range(position, len(playlist.songs)):
+                            self.loop_order[i] = 0 if playlist.songs[i].attributes[SongAttributes.disabled] else 1
+                        self.loop_order.pop()
+
+                if playlist is self.active_playlist:
+                    if added:
+                        self.shuffle_pool.add(song_name)
+                    else:
+                        self.shuffle_pool.discard(song_name)
+                    self.update_shuffle_weight(song)
+
     def clear_playlist(self, playlist_name:str, silent:bool = False) -> None:
         # If the cleared playlist is currently active, deactivate it first
         if self.active_playlist and playlist_name == self.active_playlist.name:
@@ -802,26 +1073,88 @@ class spotify:
     # Add a song to the queue and return to the home screens
     def enqueue(self, song_name:str = None) -> None:
         if song_name:
-            self.queue.append(self.songs[song_name])
-            self.queue_song_names.append(song_name)
+            self.queue.append(song_name)
             self.songs[song_name].set_enqueued()
 
             clear_console()
             print(f"{color(song_name, Colors.purple)} added to queue!")
             block_until_input()
         else: # Enqueue a placeholder song
-            self.queue.append(None)
-            self.queue_song_names.append(PLACEHOLDER_SONGNAME)
+            self.queue.append(PLACEHOLDER_SONGNAME)
+
+        self.update_ui()
+
+    # Adds every song in song_names to the back of the queue as a single change, then saves and returns to the home screen once
+    # Names that don't belong to a song are skipped. Returns the number of songs that were enqueued
+    def enqueue_songs(self, song_names:"list[str]", silent:bool = False) -> int:
+        with self.library_lock:
+            song_names = [song_name for song_name in song_names if song_name in self.songs]
+            newly_queued_names:set[str] = {song_name for song_name in song_names if song_name not in self.queue}
+            self.queue.extend(song_names)
+            for song_name in newly_queued_names:
+                self.songs[song_name].set_enqueued()
+        self.save()
+
+        if not silent:
+            clear_console()
+            print(f"Added {color(len(song_names), Colors.bolded_white)} songs to the queue!")
+            block_until_input()
+            self.update_ui()
+        return len(song_names)
+    def enqueue_playlist(self, playlist_name:str, silent:bool = False) -> int:
+        return self.enqueue_songs(self.playlists[playlist_name].song_names, silent = silent)
+    # Lets the user pick any number of songs (including repeats) and enqueues them all at once
+    def enqueue_selection(self) -> None:
+        selected_names:list[str] = self.create_list(selection_pool = self.song_names, selected_names = [], items_type = ItemType.Song, header_line = "Select the songs to add to the queue", allow_duplicates = True)
+        if selected_names:
+            self.enqueue_songs(selected_names)
+        elif selected_names != None: # create_list() returns None if the user ran a command instead
+            self.update_ui()
+    # Enqueues the songs that shuffle mode would pick next, as if none of them were put on cooldown
+    def enqueue_shuffle_picks(self) -> None:
+        user_input:str = input(f"Enter the number of songs to pick ({color('q')}/{color('quit')} or nothing to cancel): ").strip()
+        if not user_input.isnumeric() or int(user_input) == 0:
+            self.update_ui()
+        else:
+            self.enqueue_songs(self.pick_shuffle_songs(int(user_input)))
+    # Returns up to count song names picked the same way as shuffle(), without picking the same song twice
+    def pick_shuffle_songs(self, count:int) -> "list[str]":
+        picked_indices:dict[int, int] = {} # The original shuffle weight of each picked song, keyed by the song's index
+        with self.library_lock:
+            while len(picked_indices) < count and self.shuffle_weights.total() > 0:
+                index:int = self.shuffle_weights.find(randint(1, self.shuffle_weights.total()))
+                picked_indices[index] = self.shuffle_weights[index]
+                self.shuffle_weights[index] = 0 # Temporarily stop the song from being picked again
+            for index, weight in picked_indices.items():
+                self.shuffle_weights[index] = weight
+
+        return [self.song_names[index] for index in picked_indices] # dicts keep the order that the songs were picked in
+    # Removes every repeat of a song from the queue, keeping the first occurrence of each song. Placeholders are kept
+    def dedupe_queue(self) -> None:
+        with self.library_lock:
+            removals:int = self.queue.dedupe(exempt_items = {PLACEHOLDER_SONGNAME})
+        self.save()
 
+        clear_console()
+        print(f"Removed {color(removals, Colors.bolded_white)} repeated songs from the queue")
+        block_until_input()
+        self.update_ui()
+    def shuffle_queue(self) -> None:
+        with self.library_lock:
+            self.queue.shuffle()
+        self.save()
+
+        clear_console()
+        print("Queue shuffled!")
+        block_until_input()
         self.update_ui()
 
     # Clear the queue, print a message, and return to the home screen
     def clear_queue(self) -> None:
-        for item in self.queue:
-            if item: # item will be None if the song is a placeholder
-                item.set_dequeued()
+        for song_name in self.queue.counts:
+            if song_name != PLACEHOLDER_SONGNAME:
+                self.songs[song_name].set_dequeued()
         self.queue.clear()
-        self.queue_song_names.clear()
         print("Queue cleared!")
 
         block_until_input()
@@ -836,21 +1169,14 @@ class spotify:
             song_name = self.remove_queued_item_at_index(remove_at_index)
             removals += 1
         else:
-            occurrences:"list[int]" = [index for index in range(len(self.queue_song_names) - 1, -1, -1) if self.queue_song_names[index] == song_name]
-            
-            if remove_at_occurrence and (remove_at_occurrence <= len(occurrences)):
-                remove_at_occurrence -= 1
-                if remove_at_occurrence < len(occurrences):
-                    occurrences.reverse()
-                    song_name = self.remove_queued_item_at_index(occurrences[remove_at_occurrence])
+            if remove_at_occurrence:
+                occurrence_index:int = self.queue.index_of_occurrence(song_name, remove_at_occurrence)
+                if occurrence_index != None:
+                    song_name = self.remove_queued_item_at_index(occurrence_index)
                     removals += 1
                 # Do nothing here if remove_at_occurrence is an invalid number
-            elif len(occurrences) > 0:
-                song_name = self.queue_song_names[occurrences[0]]
-                for i in occurrences:
-                    self.remove_queued_item_at_index(i)
-
-                removals += len(occurrences)
+            elif song_name in self.queue:
+                removals += self.remove_queued_songs({song_name})
         
         # Print the information about the removals
         if removals == 0:
@@ -870,22 +1196,29 @@ class spotify:
     # Removes an item without printing anything
     # Returns the name of the song that was removed
     def remove_queued_item_at_index(self, index:int) -> str:
-        song_name:str = self.queue_song_names[index]
-        del self.queue_song_names[index]
-        del self.queue[index]
-        if song_name != PLACEHOLDER_SONGNAME and (song_name not in self.queue_song_names): # Only set the queued attribute to False if no more occurrences of this song remain in the queue after this removal
+        song_name:str = self.queue.popleft() if index == 0 else self.queue.pop_at(index)
+        if song_name != PLACEHOLDER_SONGNAME and (song_name not in self.queue): # Only set the queued attribute to False if no more occurrences of this song remain in the queue after this removal
             self.songs[song_name].set_dequeued()
 
         return song_name
+    # Removes every occurrence of the songs from the queue without printing anything
+    # Returns the number of items that were removed
+    def remove_queued_songs(self, song_names:"set[str]") -> int:
+        dequeued_song_names:list[str] = [song_name for song_name in song_names if song_name in self.queue and song_name != PLACEHOLDER_SONGNAME]
+        removals:int = self.queue.remove_all(song_names)
+        for song_name in dequeued_song_names:
+            self.songs[song_name].set_dequeued()
+
+        return removals
     
     def list_queue(self, *_) -> None:
         if len(self.queue) > 0 or len(self.sequence) > 0:
             list_type:ListModes = ListModes.Queue
             # Don't include headers for each section in case they mess up the formatting of the active sequence
-            listing_commands:list[str] = ["q", "quit", "clear"]
-            result:Item = self.list_actions(initial_results(section("", listing_commands, items_type = ItemType.Command), section("", self.queue_song_names, items_type = ItemType.Song)), list_type = list_type)
+            listing_commands:list[str] = ["q", "quit", "clear", "shuffle", "dedupe"]
+            result:Item = self.list_actions(initial_results(section("", listing_commands, items_type = ItemType.Command), section("", list(self.queue), items_type = ItemType.Song)), list_type = list_type)
             
-            if result and (result.name in self.queue_song_names):
+            if result and (result.name in self.queue):
                 self.remove_queued_item(remove_at_index = result.id - len(listing_commands) - 1)
             else:
                 self.handle_invalid_result()
@@ -1107,6 +1440,70 @@ class spotify:
         if not silent:
             print(message)
 
+    # Returns the groups of songs that have the same audio, using the fingerprints that analysis.py cached in the library cache
+    # Each group is in the form of (song names in the order they are listed in, whether the songs are exact copies)
+    def get_duplicates(self) -> "list[tuple[list[str], bool]]":
+        with self.library_lock: # Don't let a library rescan change the songs while they're being grouped
+            song_names_by_file:dict[str, str] = {self.songs[song_name].file_name : song_name for song_name in self.song_names if song_name in self.songs}
+            duplicates:list[tuple[list[str], bool]] = find_duplicates(self.library_cache, list(song_names_by_file.keys()))
+        return [([song_names_by_file[file_name] for file_name in group], exact) for group, exact in duplicates]
+
+    def list_duplicates(self, *_) -> None:
+        duplicates:list[tuple[list[str], bool]] = self.get_duplicates()
+        if len(duplicates) > 0:
+            duplicate_sections:list[tuple[str, list[Item]]] = [section("Exact copies:" if exact else "Similar audio:", group, items_type = ItemType.Song) for group, exact in duplicates]
+            result:Item = self.list_actions(initial_results(section("Commands:", ["q", "quit", "sync", "disable"], items_type = ItemType.Command), *duplicate_sections), list_type = ListModes.Duplicates)
+            if result: # Do nothing if result is None
+                if result.name in self.songs:
+                    self.view_song(result.name)
+                else:
+                    self.handle_invalid_result()
+        else:
+            clear_console()
+            print(f"No duplicate songs were found. Run {color('analysis.py', Colors.bold)} to fingerprint any new songs. The results show up here within {LIBRARY_RESCAN_INTERVAL} seconds of it finishing")
+            block_until_input()
+
+            self.update_ui()
+    # Syncs the songs in each group of exact copies. Songs are synced by their names, so only the groups whose songs have the same name apart from their parenthesized tags can be synced
+    # Groups of similar audio are left alone, since their songs might only share a signature
+    def sync_duplicates(self) -> None:
+        synced_groups_count:int = 0
+        skipped_groups_count:int = 0
+        for group, exact in self.get_duplicates():
+            if not exact:
+                continue
+            pure_names:set[str] = {get_pure_song_name(song_name) for song_name in group}
+            if len(pure_names) > 1:
+                skipped_groups_count += 1
+            elif pure_names.isdisjoint(self.synced_songs.keys()): # Groups that are already synced are left as they are
+                self.sync_songs(group[0], silent = True)
+                synced_groups_count += 1
+
+        clear_console()
+        print(f"{color('Synced', Modifiers.synced.value['color'])} {color(synced_groups_count, Colors.bold)} groups of exact copies")
+        if skipped_groups_count > 0:
+            print(f"{color(skipped_groups_count, Colors.bold)} groups have songs with different names, which can't be synced. Use {color('disable')} for these instead")
+        block_until_input()
+        self.update_ui()
+    # Disables every song but one in each group of exact copies, keeping the first song that isn't disabled already
+    # Groups of similar audio are left alone, since their songs might only share a signature
+    def disable_duplicates(self) -> None:
+        disabled_count:int = 0
+        for group, exact in self.get_duplicates():
+            if not exact:
+                continue
+            kept_song_name:str = next((song_name for song_name in group if song_name not in self.disabled_song_names), group[0])
+            for song_name in group:
+                if song_name != kept_song_name and song_name not in self.disabled_song_names:
+                    self.disable_song(song_name, silent = True)
+                    disabled_count += 1
+        self.save()
+
+        clear_console()
+        print(f"Disabled {color(disabled_count, Colors.bold)} exact copies")
+        block_until_input()
+        self.update_ui()
+
     def disable_song(self, song_name:str, silent:bool = False) -> None:
         self.disabled_song_names.add(song_name)
         self.songs[song_name].disable()
@@ -1126,6 +1523,102 @@ class spotify:
 
             self.update_ui()
 
+    # Merges the changes found by a library rescan into the player without interrupting playback
+    # added_songs: new Song objects keyed by song name, in the order that they should be listed in
+    # updated_metadata: the new metadata of songs whose files were changed, keyed by song name
+    # removed_song_names: the names of songs whose files were deleted
+    def update_library(self, added_songs:"dict[str, Song]", updated_metadata:"dict[str, dict[str, Union[int, bool]]]", removed_song_names:"set[str]") -> None:
+        with self.library_lock:
+            if removed_song_names:
+                self.remove_songs(removed_song_names)
+
+            for song_name, metadata in updated_metadata.items():
+                if song_name in self.songs:
+                    self.songs[song_name].update_metadata(metadata)
+
+            for song_name, song in added_songs.items():
+                song.index = len(self.song_names)
+                self.songs[song_name] = song
+                self.song_names.append(song_name)
+                self.max_song_name_length = max(self.max_song_name_length, len(song_name))
+
+            cooldown_changes:list[str] = []
+            if not self.active_playlist:
+                cooldown_changes = self.set_repeat_cooldown(min(len(self.song_names) - 2, self.DEFAULT_REPEAT_COOLDOWN))
+
+            if removed_song_names: # The indices of the remaining songs have shifted
+                self.rebuild_song_indexes()
+            else:
+                for song in added_songs.values():
+                    if not self.active_playlist:
+                        self.shuffle_pool.add(song.song_name)
+                        self.loop_order.append(0 if song.attributes[SongAttributes.disabled] else 1)
+                    self.shuffle_weights.append(self.get_shuffle_weight(song))
+                for song_name in set(cooldown_changes):
+                    self.update_shuffle_weight(self.songs[song_name])
+
+            self.save()
+    # Helper function for update_library()
+    # Removes every reference to the songs from the player. A removed song that is currently playing will still finish
+    def remove_songs(self, removed_song_names:"set[str]") -> None:
+        # Remember the names of the bookmarked songs, since their indices will shift
+        pause_bookmark_name:str = self.song_names[self.pause_bookmark_index] if self.pause_bookmark_index != None else None
+        bookmark_name:str = self.song_names[self.bookmark_index] if self.bookmark_index != None else None
+        removed_indices:list[int] = [self.songs[song_name].index for song_name in removed_song_names]
+
+        # Remove the songs from the queue before removing them from self.songs, since dequeuing updates the songs
+        self.remove_queued_songs(removed_song_names)
+
+        for song_name in removed_song_names:
+            self.disabled_song_names.discard(song_name)
+            pure_name:str = get_pure_song_name(song_name)
+            if song_name in self.synced_songs.get(pure_name, []):
+                self.synced_songs[pure_name].remove(song_name)
+                if len(self.synced_songs[pure_name]) <= 1: # A song can't be synced with only itself
+                    self.desync_songs(song_name, silent = True)
+                else:
+                    for synced_song_name in self.synced_songs[pure_name]:
+                        self.songs[synced_song_name].add_modifiers(len(self.synced_songs[pure_name]), Modifiers.synced)
+        for modifier_list in self.modifiers.values():
+            modifier_list[:] = [song_name for song_name in modifier_list if song_name not in removed_song_names]
+
+        for lead_song_name in list(self.sequences.keys()):
+            if lead_song_name in removed_song_names:
+                self.songs[lead_song_name].update_sequence([])
+                del self.sequences[lead_song_name]
+            elif not removed_song_names.isdisjoint(self.sequences[lead_song_name]):
+                self.sequences[lead_song_name] = [song_name for song_name in self.sequences[lead_song_name] if song_name not in removed_song_names]
+                self.songs[lead_song_name].update_sequence(self.sequences[lead_song_name])
+                if len(self.sequences[lead_song_name]) == 0:
+                    del self.sequences[lead_song_name]
+        self.sequence = [song_name for song_name in self.sequence if song_name not in removed_song_names]
+        self.songs_on_cooldown.discard(removed_song_names)
+
+        for playlist_name, playlist in list(self.playlists.items()):
+            if not removed_song_names.isdisjoint(playlist.song_names):
+                if removed_song_names.issuperset(playlist.song_names):
+                    self.clear_playlist(playlist_name, silent = True)
+                else:
+                    for song_name in removed_song_names.intersection(playlist.song_names):
+                        playlist.remove(song_name)
+
+        for song_name in removed_song_names:
+            del self.songs[song_name]
+
+        # Only the songs after the first removed song need to be re-indexed
+        first_removed_index:int = min(removed_indices)
+        self.song_names = self.song_names[:first_removed_index] + [song_name for song_name in self.song_names[first_removed_index:] if song_name not in removed_song_names]
+        for index in range(first_removed_index, len(self.song_names)):
+            if self.song_names[index] in self.songs:
+                self.songs[self.song_names[index]].index = index
+
+        self.pause_bookmark_index = self.songs[pause_bookmark_name].index if pause_bookmark_name in self.songs else None
+        self.bookmark_index = self.songs[bookmark_name].index if bookmark_name in self.songs else None
+        if self.curr_song and self.curr_song.song_name in self.songs:
+            self.curr_song_index = self.curr_song.index
+        elif self.curr_song: # Loop mode will continue from the song that took the removed song's place
+            self.curr_song_index = max(0, self.curr_song.index - len([index for index in removed_indices if index < self.curr_song.index]) - 1)
+
     # Only call these playback functions from set_next_song()
     # The playback mode functions will only run if the queue is empty
     # These functions will not add songs to the queue and will only set self.curr_song to the next song without playing it
@@ -1139,78 +1632,53 @@ class spotify:
             else:
                 self.curr_song_index = randint(0, len(self.song_names) - 1)
                 self.curr_song = self.songs[self.song_names[self.curr_song_index]]
+    # Disabled songs are skipped using self.loop_order, so finding the next enabled song doesn't depend on how many disabled songs are in between
     def loop(self) -> None:
-        enabled_song_found:bool = False
-
         if self.active_playlist:
             if self.bookmark_index != None: # If a sequence has been completed
-                if self.song_names[self.bookmark_index] in self.active_playlist.song_names: # If the song at bookmark_index was activated from the playlist, return the playlist's curr_song_index to the index of the song that activated the sequence
-                    self.active_playlist.curr_song_index = self.active_playlist.song_names.index(self.song_names[self.bookmark_index])
+                if self.song_names[self.bookmark_index] in self.active_playlist: # If the song at bookmark_index was activated from the playlist, return the playlist's curr_song_index to the index of the song that activated the sequence
+                    self.active_playlist.curr_song_index = self.active_playlist.positions[self.song_names[self.bookmark_index]]
                 
                 self.bookmark_index = None
 
             if self.active_playlist.curr_song_index == None: # Start the new playlist from the beginning
                 self.active_playlist.curr_song_index = 0
             else: # If the playlist has already been started, increment its index
-
                 self.active_playlist.curr_song_index = (self.active_playlist.curr_song_index + 1) % len(self.active_playlist.song_names)
 
-            # The song index will have already been incremented by 1, if needed
-            for song in self.active_playlist.songs[self.active_playlist.curr_song_index:] + self.active_playlist.songs[:self.active_playlist.curr_song_index]:
-                if not song.attributes[SongAttributes.disabled]:
-                    self.curr_song = song
-                    self.curr_song_index = song.index
-                    self.active_playlist.curr_song_index = self.active_playlist.song_names.index(song.song_name)
-                    enabled_song_found = True
-                    break
-            
-            if not enabled_song_found: # Play the next song in the active playlist, regardless of whether it's enabled
-                self.curr_song = self.active_playlist.songs[self.active_playlist.curr_song_index]
-                self.curr_song_index = self.curr_song.index
+            # The song index will have already been incremented by 1, so start looking from the song at that index
+            # If every song is disabled, play the song at that index anyway
+            next_position:int = self.loop_order.find_next(self.active_playlist.curr_song_index - 1)
+            if next_position != None:
+                self.active_playlist.curr_song_index = next_position
+            self.curr_song = self.active_playlist.songs[self.active_playlist.curr_song_index]
+            self.curr_song_index = self.curr_song.index
 
         else: # If there is no active playlist
             if self.bookmark_index != None:
                 self.curr_song_index = self.bookmark_index
                 self.bookmark_index = None
 
-            # Increment the song index by 1 during splicing
-            for song_name in self.song_names[self.curr_song_index + 1:] + self.song_names[:self.curr_song_index + 1]:
-                if not self.songs[song_name].attributes[SongAttributes.disabled]:
-                    self.curr_song_index = self.song_names.index(song_name)
-                    self.curr_song = self.songs[song_name]
-                    enabled_song_found = True
-                    break
-            
-            if not enabled_song_found: # Play the next song, regardless of whether it's enabled
-                self.curr_song_index = (self.curr_song_index + 1) % len(self.song_names)
-                self.curr_song = self.songs[self.song_names[self.curr_song_index]]
+            # If every song is disabled, play the next song anyway
+            next_position:int = self.loop_order.find_next(self.curr_song_index)
+            self.curr_song_index = next_position if next_position != None else (self.curr_song_index + 1) % len(self.song_names)
+            self.curr_song = self.songs[self.song_names[self.curr_song_index]]
 
     def shuffle(self) -> None:
         available_song_names:list[str] = self.active_playlist.song_names if self.active_playlist else self.song_names
-        # Filter out queued, cooldown, and disabled songs
-        # Queued songs with the "hot" modifier will not be removed from available_song_names
-        # Relative order of songs in filtered_song_names will be scrambled
-        filtered_song_names:set[str] = set(available_song_names) - {song_name for song_name in self.queue_song_names if song_name != PLACEHOLDER_SONGNAME and (Modifiers.hot not in self.songs[song_name].attributes[SongAttributes.modifiers])} - {song_name for cooldown_list in self.songs_on_cooldown for song_name in cooldown_list} - self.disabled_song_names
+        # Queued, cooldown, and disabled songs already have a shuffle weight of 0 in self.shuffle_weights
+        # Queued songs with the "hot" modifier keep their weight
         # No need to recalculate the weight of synced songs here since it was already calculated when the song was synced
+        total_weight:int = self.shuffle_weights.total()
         
-        if len(filtered_song_names) > 0:
-            # Sum up the weights
-            total_weight:int = 0
-            for song_name in filtered_song_names:
-                total_weight += self.songs[song_name].weight
-            
-            # Choose a song
-            target_weight:int = randint(1, total_weight)
-            for song_name in filtered_song_names:
-                target_weight -= self.songs[song_name].weight
-                if target_weight <= 0: # Select this song
-                    self.curr_song = self.songs[song_name]
-                    self.curr_song_index = self.curr_song.index
-
-                    if self.active_playlist:
-                        self.active_playlist.curr_song_index = available_song_names.index(song_name)
-                    
-                    break
+        if total_weight > 0:
+            # Choose a song. Each song's chance of being picked is its weight divided by the total weight
+            song_name:str = self.song_names[self.shuffle_weights.find(randint(1, total_weight))]
+            self.curr_song = self.songs[song_name]
+            self.curr_song_index = self.curr_song.index
+
+            if self.active_playlist:
+                self.active_playlist.curr_song_index = self.active_playlist.positions[song_name]
         
         # If there are no available songs
         else: # The constructor would've caught/corrected the error if self.cooldown_between_repeats was too high
@@ -1226,43 +1694,63 @@ class spotify:
 
     def pause(self) -> None:
         if self.playing: # Check just in case
+            song_started:bool = self.curr_song.attributes[SongAttributes.playing] # Checked before the song is stopped. False during interludes
             self.playing = False
             self.pause_bookmark_index = self.curr_song_index
-            PlaySound("1s_silence", SND_ASYNC)
+            done:Event = self.controls.send(PlayerCommands.Pause) # Send the command before stopping the clock so the song-playing thread sees it once it wakes up
+            self.output.stop()
+            self.clock.stop()
+            # Resume from the frame that the output stopped at, and show that position while paused
+            self.pause_bookmark_frame = self.output.frame_position() if song_started and self.output.file_name == self.curr_song.file_name else 0
+            self.clock.seek(self.pause_bookmark_frame / self.curr_song.frame_rate)
 
             self.remaining_interlude_indicator = None
             hide_cursor()
             print(color("Pausing...", Colors.faint))
-            wait(1 + TIMER_RESOLUTION + 0.25)
+            done.wait(COMMAND_TIMEOUT)
             self.update_ui()
-    # Resuming the player will restart the song that was playing before the pause
+    # Resuming the player will continue the song that was playing before the pause from where it was paused
     def resume(self) -> None:
         if not self.playing: # Check just in case
             if self.remaining_interlude_indicator: # If the player was paused in the middle of an interlude
                 self.remaining_interlude_indicator = ""
             
             self.interlude_flag = False # Temporarily disable the cooldown between songs
-            self.playing = True # Resume the loop in the song-playing thread
+            self.playing = True
+            done:Event = self.controls.send(PlayerCommands.Resume) # Wake up the song-playing thread
+            self.clock.notify_listeners()
             hide_cursor()
-            print(color("Song restarting...", Colors.faint))
-            wait(TICK_DURATION + 0.5) # Wait for the song-playing thread to prepare the next song before self.update_ui() displays it
+            print(color("Resuming...", Colors.faint))
+            done.wait(COMMAND_TIMEOUT) # Wait for the song-playing thread to start the song before self.update_ui() displays it
 
         self.update_ui()
     def skip(self) -> None:
-        self.playing = False
         # Don't bookmark the current song
-        PlaySound("1s_silence.wav", SND_ASYNC)
-
-        print("Picking the next song...")
-        wait(1 + TIMER_RESOLUTION + 0.25) # Wait for the current song's timer to stop before setting self.playing to True. Song timers update every second independent of TICK_DURATION
-
         self.remaining_interlude_indicator = "" # If this function was called during an interlude, clear its indication from the display
-        self.interlude_flag = False # Don't wait before playing the next song
-        self.playing = True # Resume the song-playing thread
+        self.interlude_flag = False # Don't wait before playing the next song. Set before the song is stopped so the song-playing thread can't start an interlude
+        self.playing = True # Resume the song-playing thread if the player was paused
+
+        done:Event = self.controls.send(PlayerCommands.Skip)
+        self.output.stop()
+        self.clock.stop() # Wakes up the song-playing thread if a song is playing
 
-        wait(TICK_DURATION + 0.5) # Wait for the song-playing thread to set the next song (Must be longer than the waiting time in each iteration in the loop in play())
+        print("Picking the next song...")
+        done.wait(COMMAND_TIMEOUT) # Wait for the song-playing thread to start the next song
         self.update_ui()
     
+    # Moves the current song forwards by offset seconds, or backwards if offset is negative
+    # While the player is paused, moves the position that the song will resume from instead
+    def seek(self, offset:float) -> None:
+        if self.remaining_interlude_indicator == None: # There's no song to seek in during interludes
+            position:float = max(self.curr_song.start_time, min(self.clock.position() + offset, self.curr_song.end_time)) # Seeking past the end finishes the song. The silence at the start of the song stays skipped
+            if self.playing:
+                if self.output.seek(int(position * self.curr_song.frame_rate)): # Does nothing if the song has already finished
+                    self.clock.seek(position)
+            elif self.pause_bookmark_index != None:
+                self.pause_bookmark_frame = int(position * self.curr_song.frame_rate)
+                self.clock.seek(position)
+        self.update_ui()
+
     # Repeat the current song an additional time
     # the repeat will not trigger any sequences
     def encore(self) -> None:
@@ -1271,7 +1759,7 @@ class spotify:
         return
 
     def set_next_song(self) -> None:
-        if self.pause_bookmark_index: # Restart the song that was playing before the pause
+        if self.pause_bookmark_index is not None: # Restart the song that was playing before the pause
             self.curr_song_index = self.pause_bookmark_index
             self.curr_song = self.songs[self.song_names[self.curr_song_index]]
 
@@ -1289,8 +1777,8 @@ class spotify:
 
             else:
                 if len(self.queue) > 0:
-                    song:Song = self.queue[0]
-                    if song:
+                    if self.queue[0] != PLACEHOLDER_SONGNAME:
+                        song:Song = self.songs[self.queue[0]]
                         self.curr_song = song
                         self.curr_song_index = song.index
                     else: # If the queued song is a placeholder
@@ -1309,6 +1797,28 @@ class spotify:
 
         self.song_log.append(self.curr_song.song_name)
 
+    # Runs the loop of the song-playing thread until the program is terminated
+    def play_songs(self) -> None:
+        self.interlude_flag = False # Disable the waiting period before the first song
+        while not self.terminated:
+            if self.playing:
+                self.play_next_song()
+                self.handle_commands()
+            else: # Sleep until the user resumes the player or skips to the next song
+                self.handle_command(*self.controls.receive())
+    # Handles every command that the song-playing thread hasn't received yet
+    def handle_commands(self) -> None:
+        command:tuple[PlayerCommands, Event] = self.controls.poll()
+        while command:
+            self.handle_command(*command)
+            command = self.controls.poll()
+    # The console thread has already updated the player's state and stopped the song by the time a command is received, so only the done events are left to handle here
+    def handle_command(self, command:PlayerCommands, done:Event) -> None:
+        if command == PlayerCommands.Pause:
+            done.set()
+        else: # Resuming and skipping take effect once the next song starts
+            self.pending_acknowledgements.append(done)
+
     # Call this function from the song-playing thread
     # If force_song_name is specified, the named song will override all other priorities with NO ERROR CHECKING
     def play_next_song(self) -> None:
@@ -1317,34 +1827,56 @@ class spotify:
             self.stop() # stop() will update the save file and set the next song
             return
 
-        self.set_next_song()
-        # Update the songs on cooldown
-        if len(self.songs_on_cooldown) >= self.cooldown_between_repeats:
-            del self.songs_on_cooldown[0]
-        
-        # Add any synced songs and the next song itself to the cooldown list
-        self.songs_on_cooldown.append([song_name for song_name in self.synced_songs.get(self.curr_song.song_name, [self.curr_song.song_name]) if Modifiers.hot not in self.songs[song_name].attributes[SongAttributes.modifiers]])
-        self.songs_on_cooldown[-1].append(self.curr_song.song_name)
+        with self.library_lock: # Don't let a library rescan change the songs while the next song is being chosen
+            start_frame:int = self.pause_bookmark_frame if self.pause_bookmark_index is not None else 0 # set_next_song() will pick the bookmarked song
+            self.pause_bookmark_frame = 0
+            self.set_next_song()
+            # Add any synced songs and the next song itself to the cooldown ring, which takes the oldest songs off cooldown once it's full
+            cooldown_list:list[str] = [song_name for song_name in self.synced_songs.get(self.curr_song.song_name, [self.curr_song.song_name]) if Modifiers.hot not in self.songs[song_name].attributes[SongAttributes.modifiers]]
+            cooldown_list.append(self.curr_song.song_name)
+            cooldown_changes:list[str] = self.songs_on_cooldown.push(cooldown_list) + cooldown_list
 
-        wait(TICK_DURATION)
-        if self.playing: # If this song has ended naturally and not because the user paused the player
-            if self.interlude_flag: # Interlude flag will be set to false when playing the first song so that everything saves BEFORE waiting and then playing each subsequent song
-                self.remaining_interlude_indicator = "-" * self.interlude_duration
-                
-                wait(ceil(TICK_DURATION) - TICK_DURATION) # A TICK_DURATION of time has already been waited before self.playing was checked, so a TICK_DURATION has to be taken off the first second of wait time here
-                self.remaining_interlude_indicator = self.remaining_interlude_indicator[1:] # Remove a character from the cooldown indicator after the first second
-                for seconds_remaining in range(self.interlude_duration - 1, -1, -1):
-                    wait(1)
-                    if not self.playing: # If the player was paused during the interlude
-                        return # Jump back to the loop in play() in the main thread
-                    self.remaining_interlude_indicator = "-" * seconds_remaining
-            else:
-                self.interlude_flag = True
+            for song_name in set(cooldown_changes):
+                if song_name in self.songs:
+                    self.update_shuffle_weight(self.songs[song_name])
+
+        start_frame = self.curr_song.get_playback_start_frame(start_frame, self.output) # Skip the silence at the start of the song, where the output can
+        try:
+            self.output.prefetch(self.curr_song.file_name, start_frame, self.curr_song.end_frame) # Read the start of the song during the interlude, so it can start as soon as the interlude ends
+        except (OSError, WavFormatError): # The song's file was deleted or is being rewritten since the library was last rescanned. Skip the song until the next rescan catches up with the file
+            command:tuple[PlayerCommands, Event] = self.controls.receive(timeout = TICK_DURATION) # Don't spin through the songs if none of them can be read
+            if command:
+                self.handle_command(*command)
+            return # Jump back to the loop in self.play_songs(), which picks the next song
+
+        if self.interlude_flag and not self.crossfade_enabled: # Interlude flag will be set to false when playing the first song so that everything saves BEFORE waiting and then playing each subsequent song
+            for seconds_remaining in range(self.interlude_duration, 0, -1):
+                self.remaining_interlude_indicator = "-" * seconds_remaining # Remove a character from the cooldown indicator after each second
+                command:tuple[PlayerCommands, Event] = self.controls.receive(timeout = 1)
+                if command: # If the player was paused or skipped during the interlude
+                    self.handle_command(*command)
+                    return # Jump back to the loop in self.play_songs()
+        else:
+            self.interlude_flag = True
+            # The previous song stopped waiting early so this song could crossfade in. If the two songs can't be mixed (ex. they have different frame rates), let the previous song finish instead of cutting off its end
+            if self.crossfade_enabled and not self.output.can_crossfade_into_prefetched():
+                while self.clock.state == ClockStates.Playing and self.clock.remaining() > 0:
+                    self.remaining_interlude_indicator = "-" * ceil(self.clock.remaining())
+                    command:tuple[PlayerCommands, Event] = self.controls.receive(timeout = min(1, self.clock.remaining()))
+                    if command: # If the player was paused or skipped before the previous song finished
+                        self.handle_command(*command)
+                        return
 
         self.remaining_interlude_indicator = None
 
         self.save()
-        self.curr_song.play() # Plays the song in the same thread as this method
+        self.curr_song.play(start_frame) # Plays the song in the same thread as this method. Acknowledges the pending commands once the song has started
+    # Lets the console thread know that the resume and skip commands that were waiting on the next song have taken effect
+    # Called by Song.play() once the song's audio has started, so the console doesn't redraw before the song is playing
+    def acknowledge_commands(self) -> None:
+        for done in self.pending_acknowledgements:
+            done.set()
+        self.pending_acknowledgements.clear()
 
     def list_songs(self, *_) -> None: # Requesting a song while another song is playing will queue the requested song instead
         result:Item = self.list_actions(initial_results(section("Commands:", ["q", "quit", PLACEHOLDER_SONGNAME], items_type = ItemType.Command), section("Songs:", self.song_names, items_type = ItemType.Song)), list_type = ListModes.Songs)
@@ -1402,90 +1934,102 @@ class spotify:
         display_range:int = max(min((display_height - 1) // 2, max_display_range), 0) # How many lines before/after the current line of lyrics to display
         
         # Listen for user input while lyric display updates
-        input_thread:Thread = Thread(target = lambda : block_until_input(message = ""), name = "Karaoke input listener", daemon = True) # Automatically terminates once input is detected
+        # Wakes up the lyric display through self.clock once input is detected
+        input_thread:Thread = Thread(target = lambda : (block_until_input(message = ""), self.clock.notify_listeners()), name = "Karaoke input listener", daemon = True) # Automatically terminates once input is detected
         input_thread.start()
 
-        # If the user started karaoke mode during an interlude period, before the starting time for the next song has been set
-        if not self.curr_song.attributes[SongAttributes.playing]:
+        # If the user started karaoke mode during an interlude period, before the next song has started
+        song_started:function = lambda : self.curr_song.attributes[SongAttributes.playing] and self.clock.state == ClockStates.Playing
+        if not song_started():
             print(color(f"{'Waiting for the song to start...' : ^{display_width}}", Colors.faint))
 
             # Wait for the interlude period to pass
-            while not self.curr_song.attributes[SongAttributes.playing]:
+            clock_version:int = self.clock.version
+            while not song_started():
                 if not input_thread.is_alive():
                     self.update_ui()
                     return
-                wait(TIMER_RESOLUTION)
+                clock_version = self.clock.wait_for_change(clock_version)
 
             clear_console()
             hide_cursor()
-            wait(TICK_DURATION) # Wait a bit longer for the song to set its start time
-
-        for i in range(len(lyrics)):
-            if i == len(lyrics) - 1 or lyrics[i + 1]["time"] >= time() - self.curr_song.start_time - delay:
-                if (display_height != get_terminal_size().lines) or (display_width != get_terminal_size().columns):
-                    clear_console()
-                    hide_cursor()
-                    display_height, display_width = get_terminal_size().lines, get_terminal_size().columns
-                    empty_line = " " * display_width
-                    display_range = max(min((display_height - 1) // 2, max_display_range), 0) # How many lines before/after the current line of lyrics to display
-
-                cursor_up(lines = display_height - 1)
-
-                # Print the lines before the current line
-                print(empty_line * ((display_height - 1) // 2 - min(i, display_range)), end = "") # Vertically center the lyrics by adding padding before printing the lyric lines
-                for prev_line_index in range(max(i - display_range, 0), i):
-                    print(color(f"{lyrics[prev_line_index]['text'] : ^{display_width}}", Colors.faint))
-
-                # Print the current line
-                curr_line:str = lyrics[i]["text"]
-                print(f'{curr_line : ^{display_width}}')
 
-                # If there are more lyrics after the current line
-                if i < len(lyrics) - 1:
-                    for next_line_index in range(i + 1, min(i + 1 + display_range, len(lyrics))):
-                        print(color(f'{lyrics[next_line_index]["text"] : ^{display_width}}', Colors.faint), end = "")
-                    print(empty_line * (i + 1 + display_range - len(lyrics)), end = "")
-
-                    # Animate the quarter note symbols of curr_line is an interlude without lyrics
-                    notes_count:int = curr_line.count(LYRIC_PLACEHOLDER_CHARACTER)
-                    segment_time:float = (lyrics[i + 1]["time"] - lyrics[i]["time"]) / (notes_count + 1) # The time between this lyric and the next one is divided into equal segments, with one note lighting up in between each segment
-                    notes_shown:int = 0
-                    if notes_count:
-                        cursor_up(lines = display_range) # Move the cursor to the beginning of the currently playing lyric line
-                        print(" " * ((display_width - len(curr_line)) // 2), end = "")
-
-                    # Wait until the time of the next line has been reached
-                    # Keeps the offset between the lyrics and the song due to lag to within TIMER_RESOLUTION seconds
-                    while True:
-                        if not input_thread.is_alive(): # If the user has entered something and wants to return to the home screen
-                            self.update_ui()
-                            return
-
-                        time_elapsed:float = time() - self.curr_song.start_time - delay
-
-                        if notes_shown < notes_count and time_elapsed >= lyrics[i]["time"] + ((notes_shown + 1) * segment_time):
-                            notes_shown += 1
-                            print(color(LYRIC_PLACEHOLDER_CHARACTER + ' ', Colors.bold), end = "")
-
-                        elif time_elapsed >= lyrics[i + 1]["time"] or time_elapsed < 0: # time_elapsed will be negative if karaoke mode was somehow activated before the song updates its start time when song.play() is called
-                            break
-
-                        wait(TIMER_RESOLUTION)
+        # The line to show is found with a binary search through the lines' start times, so karaoke mode can start, or follow a seek, anywhere in the song
+        lyric_times:array = self.curr_song.lyric_times
+        karaoke_song:Song = self.curr_song
+        while True:
+            i:int = find_lyric_line(lyric_times, self.clock.position() - delay)
+            if (display_height != get_terminal_size().lines) or (display_width != get_terminal_size().columns):
+                clear_console()
+                hide_cursor()
+                display_height, display_width = get_terminal_size().lines, get_terminal_size().columns
+                empty_line = " " * display_width
+                display_range = max(min((display_height - 1) // 2, max_display_range), 0) # How many lines before/after the current line of lyrics to display
+
+            cursor_up(lines = display_height - 1)
+
+            # Print the lines before the current line
+            print(empty_line * ((display_height - 1) // 2 - min(i, display_range)), end = "") # Vertically center the lyrics by adding padding before printing the lyric lines
+            for prev_line_index in range(max(i - display_range, 0), i):
+                print(color(f"{lyrics[prev_line_index]['text'] : ^{display_width}}", Colors.faint))
+
+            # Print the current line
+            curr_line:str = lyrics[i]["text"]
+            print(f'{curr_line : ^{display_width}}')
+
+            notes_count:int = 0
+            # If there are more lyrics after the current line
+            if i < len(lyrics) - 1:
+                for next_line_index in range(i + 1, min(i + 1 + display_range, len(lyrics))):
+                    print(color(f'{lyrics[next_line_index]["text"] : ^{display_width}}', Colors.faint), end = "")
+                print(empty_line * (i + 1 + display_range - len(lyrics)), end = "")
+
+                # Animate the quarter note symbols of curr_line is an interlude without lyrics
+                notes_count = curr_line.count(LYRIC_PLACEHOLDER_CHARACTER)
+                segment_time:float = (lyrics[i + 1]["time"] - lyrics[i]["time"]) / (notes_count + 1) # The time between this lyric and the next one is divided into equal segments, with one note lighting up in between each segment
+                if notes_count:
+                    cursor_up(lines = display_range) # Move the cursor to the beginning of the currently playing lyric line
+                    print(" " * ((display_width - len(curr_line)) // 2), end = "")
+            else: # If there are no more lyrics
+                print(empty_line) # Clear the last line from the previously shown group of lyrics
+            notes_shown:int = 0
+
+            # Wait until the song reaches another line, whether by playing on or by seeking
+            # The clock wakes this thread up exactly when the next note or line is due, when the song is paused, resumed, stopped, or seeked, or when the user enters something
+            while True:
+                clock_version:int = self.clock.version # Read before checking the clock so that a change in between isn't missed
+                if not input_thread.is_alive(): # If the user has entered something and wants to return to the home screen
+                    self.update_ui()
+                    return
 
-                else: # If there are no more lyrics
-                    print(empty_line) # Clear the last line from the previously shown group of lyrics
-                    wait(self.curr_song.duration - (time() - self.curr_song.start_time)) # Wait until the current song ends
-                    
+                # The lyrics stay on the current line while the song is paused, and only finish once the song does
+                if self.clock.state == ClockStates.Ended or self.curr_song is not karaoke_song:
                     if not self.exit_later: # Give way for the "program terminated" message
                         # Prompt the user to clear the current input() call by input_thread before the next input() call from update_ui()
                         clear_console()
                         hide_cursor()
                         # Format the prompt and horizontally center it
                         print(f"{' ' * ((display_width - len('Song finished - press any key to return')) // 2)}{color('Song finished - press any key to return', Colors.faint)}", end = "")
-                        while input_thread.is_alive():
-                            wait(TIMER_RESOLUTION)
+                        input_thread.join()
 
                         self.update_ui()
+                    return
+
+                time_elapsed:float = self.clock.position() - delay
+                if find_lyric_line(lyric_times, time_elapsed) != i:
+                    break
+
+                if i < len(lyrics) - 1:
+                    next_note_time:float = lyrics[i]["time"] + ((notes_shown + 1) * segment_time)
+                    if notes_shown < notes_count and time_elapsed >= next_note_time:
+                        notes_shown += 1
+                        print(color(LYRIC_PLACEHOLDER_CHARACTER + ' ', Colors.bold), end = "")
+                        continue
+
+                if self.clock.state == ClockStates.Playing and i < len(lyrics) - 1:
+                    self.clock.wait_until((min(next_note_time, lyrics[i + 1]["time"]) if notes_shown < notes_count else lyrics[i + 1]["time"]) + delay)
+                else: # Nothing is due until the clock changes
+                    self.clock.wait_for_change(clock_version)
 
     def update_ui(self, command:str = "") -> None: # The command parameter is used when update_ui() is called via self.listing_info
         # Divert to autoupdate mode if it has already been activated
@@ -1554,10 +2098,11 @@ class spotify:
                     print(f"{self.remaining_interlude_indicator : ^{max(len('Currently playing: ') + self.max_song_name_length + 13, self.interlude_duration)}}", end = "") # +13 for the spaces reserved for the song duration display and the spaces between each segment
                     cursor_up(lines = 0)
 
+                    clock_version:int = self.clock.version # Read before the indicator so that a change in between isn't missed
                     curr_interlude_indicator:str = self.remaining_interlude_indicator
                     # Wait for curr_interlude_indicator to update
                     while curr_interlude_indicator == self.remaining_interlude_indicator:
-                        wait(TIMER_RESOLUTION)
+                        clock_version = self.clock.wait_for_change(clock_version)
 
                         if not input_thread.is_alive():
                             if not self.run_key_command():
@@ -1568,8 +2113,9 @@ class spotify:
             
             # If the player is currently paused when entering autoupdate mode
             elif not self.playing:
+                clock_version:int = self.clock.version
                 while not self.playing:
-                    wait(TICK_DURATION)
+                    clock_version = self.clock.wait_for_change(clock_version)
 
                     # Call self.update_ui() once a key (including the "pause/resume" key command) is entered
                     if not input_thread.is_alive():
@@ -1584,29 +2130,45 @@ class spotify:
                 total_duration_string_length:int = len(to_minutes_str(self.curr_song.duration)) # Number of spaces to reserve for the current duration display
                 # Prepare the cursor position for updating the song duration display
                 # The cursor would've already been moved to the first line
-                cursor_right(spaces = len("Currently playing: ") + self.max_song_name_length + 3)# + count_wide_characters(self.curr_song.song_name)) # Move the cursor past fewer characters if some of the characters are extra wide
-                wait(TICK_DURATION) # Wait for the next song to start playing
+                duration_display_offset:int = len("Currently playing: ") + self.max_song_name_length + 3
+                cursor_right(spaces = duration_display_offset)# + count_wide_characters(self.curr_song.song_name)) # Move the cursor past fewer characters if some of the characters are extra wide
+                displayed_song:Song = self.curr_song
+                waveform_shown:bool = bool(self.curr_song.overview) # The waveform is on the line below the duration display if print_ui_header() showed it
 
                 # While the current song hasn't ended
-                while (self.curr_song.attributes[SongAttributes.playing]) and (self.remaining_interlude_indicator == None):
-                    curr_duration_seconds:int = self.curr_song.curr_duration
+                while True:
+                    clock_version:int = self.clock.version # Read before checking the song so that a change in between isn't missed
+                    if not (displayed_song is self.curr_song and self.curr_song.attributes[SongAttributes.playing] and self.remaining_interlude_indicator == None):
+                        break
+
+                    curr_duration_seconds:int = self.clock.whole_seconds()
                     curr_duration_string:str = to_minutes_str(curr_duration_seconds)
                     # Move the cursor back and forth to update the duration display
                     print(color(f"{curr_duration_string : >{total_duration_string_length}}", Colors.light_blue), end = "")
                     cursor_left(total_duration_string_length)
+                    if waveform_shown:
+                        cursor_down()
+                        print(self.get_waveform() or "", end = "")
+                        cursor_up()
+                        cursor_right(spaces = duration_display_offset)
                     
-                    # Wait ~1 second before updating the duration display
-                    while curr_duration_seconds == self.curr_song.curr_duration:
-                        wait(TIMER_RESOLUTION)
+                    # Wait for the next second (or for the song to be stopped, or a key to be pressed) before updating the duration display
+                    self.clock.wait_for_second(curr_duration_seconds)
 
-                        if not input_thread.is_alive():
-                            if not self.run_key_command():
-                                # If a valid key input has not been entered
-                                self.autoupdating = False # Only disable autoupdate mode if the key input wasn't a valid key command
-                                self.update_ui()
-                            return
+                    if not input_thread.is_alive():
+                        if not self.run_key_command():
+                            # If a valid key input has not been entered
+                            self.autoupdating = False # Only disable autoupdate mode if the key input wasn't a valid key command
+                            self.update_ui()
+                        return
 
-                wait(1 + TICK_DURATION * 2) # Wait for self.remaining_interlude_indicator to update
+                # Wait for the next song to start or for self.remaining_interlude_indicator to update
+                self.clock.wait_for_change(clock_version)
+                if not input_thread.is_alive():
+                    if not self.run_key_command():
+                        self.autoupdating = False
+                        self.update_ui()
+                    return
     # Helper functions for self.update_ui() and self.autoupdate_ui()
     # Both self.print_ui_header() and self.print_next_songs() return the number of lines they printed
     def print_ui_header(self) -> int:
@@ -1620,7 +2182,7 @@ class spotify:
         # indicators will become a string either way
         indicators:str = "| " + " ".join(indicators) if indicators else ""
         total_duration_string:str = to_minutes_str(self.curr_song.duration)
-        duration_display:str = color(f"{to_minutes_str(self.curr_song.curr_duration) : >{len(total_duration_string)}}/{total_duration_string}", Colors.light_blue)
+        duration_display:str = color(f"{to_minutes_str(self.clock.whole_seconds()) : >{len(total_duration_string)}}/{total_duration_string}", Colors.light_blue)
 
         currently_playing_line:str = f"Currently playing: {color(f'{self.curr_song.song_name : <{self.max_song_name_length - count_wide_characters(self.curr_song.song_name)}}', Colors.green)}   {duration_display} {indicators}"
         if self.remaining_interlude_indicator: # If the cooldown is active, ensure that there is enough sapce for the maximum size of the indicator while also adding spaces to match the length of the line with its length when a song is playing
@@ -1628,6 +2190,11 @@ class spotify:
         print(f"{currently_playing_line} | Playback mode: {color(f'{self.mode.name : <10}', Colors.orange)}")
         lines_printed += 1
         
+        waveform:str = self.get_waveform()
+        if waveform:
+            print(waveform)
+            lines_printed += 1
+
         if self.active_playlist:
             print(color(f"Current playlist: {self.active_playlist.name}", Colors.faint))
             lines_printed += 1
@@ -1641,6 +2208,14 @@ class spotify:
             lines_printed += 1
         
         return lines_printed
+    # Returns the current song's waveform progress bar, or None during interludes or if the song doesn't have a waveform overview
+    # Only reads the song's small overview file, never the song's audio
+    def get_waveform(self) -> "Union[str, None]":
+        overview:bytes = self.curr_song.overview
+        if self.remaining_interlude_indicator or not overview:
+            return None
+        length:float = self.curr_song.end_time - self.curr_song.start_time
+        return draw_waveform(overview, (self.clock.position() - self.curr_song.start_time) / length if length > 0 else 1)
     def print_next_songs(self, max_lines:int = 99) -> int:
         """Print the "Up next" section of the home screen.\n
         Does nothing if both the active sequence and queue are empty.\n
@@ -1651,18 +2226,18 @@ class spotify:
         Returns the total number of lines printed."""
         
         lines:list[str] = []
-        max_index_len:int = len(str(len(self.queue_song_names) + 1))
+        max_index_len:int = len(str(len(self.queue) + 1))
 
         # Add the sequence to lines
         for sequence_song_name in self.sequence:
             lines.append(f"{'-  ' : <{max_index_len + 2}}{color(sequence_song_name, SongAttributes.sequenced.value)}")
         
         # Add the queue to lines
-        for queue_index in range(len(self.queue_song_names)):
-            lines.append(f"{f'{queue_index + 1}. ' : <{max_index_len + 2}}{color(self.queue_song_names[queue_index], SongAttributes.queued.value)}")                    
+        for queue_index, queued_song_name in enumerate(self.queue):
+            lines.append(f"{f'{queue_index + 1}. ' : <{max_index_len + 2}}{color(queued_song_name, SongAttributes.queued.value)}")                    
             # Add the sequence of this queued song, if there is one
             # get() returns an empty list if no sequence is found
-            lines.extend([f"    {color('|', Colors.faint)}{color(sequence_song_name, SongAttributes.sequenced.value)}" for sequence_song_name in self.sequences.get(self.queue_song_names[queue_index], [])])
+            lines.extend([f"    {color('|', Colors.faint)}{color(sequence_song_name, SongAttributes.sequenced.value)}" for sequence_song_name in self.sequences.get(queued_song_name, [])])
 
         if len(lines) > 0:
             print("Up next: ") # Print the header, regardless of max_lines
@@ -1690,6 +2265,8 @@ Commands listed in [brackets] must be spelled exactly""", Colors.red))
         # Low-priority warnings
         print(color(f"""Songs in the active sequence always take priority over songs in the queue when playing
 Songs played as part of a sequence can't initiate sequences themselves""", Colors.orange))
+        if not self.output.supports_gain:
+            print(color("Songs are played as they are through winsound, so their loudness isn't normalized", Colors.orange))
         # Tips
         print(color(f"""Inputs are not case sensitive
 Enter the index of a queued song from the menu to remove that song from the queue
@@ -1702,8 +2279,14 @@ Home screen indicators for some toggle-able commands will be listed in (parenthe
         print(f"""{color('list')}: list all of the songs in the playlist and optionally select one to queue
 {color('queue')}: list the queue and the active sequence (if any), and optionally remove a song from the queue
     {color('*')}: enqueue a placeholder song based on the current playback mode
+    {color('shuffle')} or {color('dedupe')}: shuffle the queue, or remove repeated songs from it   [{color('Only available when listing the queue', Colors.orange)}]
+{color('enqueue songs')}: select any number of songs and add them all to the queue at once
+{color('enqueue picks')}: add the next few songs that shuffle mode would pick to the queue
+{color('enqueue')}: add every song in a playlist to the queue   [{color('Only available when displaying playlist options', Colors.orange)}]
 {color('modifiers')}: list the active modifiers and optionally remove one more more modifiers
 {color('sequence')}: add a new sequence to a song or edit an existing one
+{color('focus')}: make shuffle pick the songs whose tempo, energy, or spectral centroid (found by analysis.py) is in a range more often
+{color('duplicates')}: list the songs that have the same or similar audio (found by analysis.py), and optionally sync or disable all of the exact copies at once
 {color('q')} or {color('quit')}: return to {color('and update', Colors.bold)} the menu
 {color('autoupdate')} or {color('standby')}: enables automatic updating of song info in the menu
 Playback modes:
@@ -1763,6 +2346,7 @@ Playback modes:
     def get_key_command(self) -> None:
         key:str = str(getch(), encoding = "utf-8")
         self.key_command_buffer = key
+        self.clock.notify_listeners() # Wake up the standby mode display so it can run the key command
         # Since self.get_key_command() is intended to be called in a listener thread, don't run the binded function from here
     # Intended to be called from the console thread
     # Clears self.key_command_buffer and runs the function that was binded to the key
@@ -1929,7 +2513,7 @@ Playback modes:
                 print(SearchResultType.Fuzzy.value)
 
             # Print all the results
-            commands_count:int = 0 # Used for determining the index of the removing song in self.queue_song_names when list_mode is Queue and the user input is a valid index
+            commands_count:int = 0 # Used for determining the index of the removing song in self.queue when list_mode is Queue and the user input is a valid index
             for index in range(len(results)):
                 # Print the separator (if there is one at this index)
                 if index in separators_directory:
@@ -2039,7 +2623,7 @@ Playback modes:
     global mode_actions
     mode_actions = {Modes.Repeat : repeat, Modes.Loop : loop, Modes.Shuffle : shuffle}
     global listmode_actions
-    listmode_actions = {ListModes.Songs : list_songs, ListModes.Queue : list_queue, ListModes.Modifiers : list_active_modifiers}
+    listmode_actions = {ListModes.Songs : list_songs, ListModes.Queue : list_queue, ListModes.Modifiers : list_active_modifiers, ListModes.Duplicates : list_duplicates}
 
     # Used in the dictionary of valid commands to set the mode and then calls update_ui
     def set_mode_repeat(self):
@@ -2063,8 +2647,12 @@ Playback modes:
                         "list" : list_songs,
                         "encore" : encore,
                         "queue" : list_queue,
+                        "enqueue songs" : enqueue_selection,
+                        "enqueue picks" : enqueue_shuffle_picks,
                         "modifiers" : list_active_modifiers,
                         "sequences" : list_sequences,
+                        "duplicates" : list_duplicates,
+                        "focus" : focus_shuffle,
                         "q" : update_ui,
                         "quit" : update_ui,
                         "repeat" : set_mode_repeat,
@@ -2083,78 +2671,134 @@ Playback modes:
     exact_commands = {"stop", "exit", "exit later", ">>"} # Can only contain commands in valid_commands
 
 
-clear_console() # Clears any "hide cursor" characters in the console
-hide_cursor()
-
-# For the funnies
-intro_enabled:bool = False # Enable or disable the intro bit
-if intro_enabled:
-    wait(0.9)
-    print("\"Mom can we have Spotify?\"")
-    wait(1)
-    print("Mom: no, we have Spotify at home")
-    wait(2)
-
-    clear_console()
-    # Will all be cleared once spotify initializes and the console clears when the first song plays
-    wait(0.3)
-    print(f"spotify at home {color('Sqotify Inc., At home, ©2023 No Rights Reserved', Colors.faint)}")
-    wait(1.9)
-
 # Every file in this directory must be a playable wav file except the file with song_instructions_file_name
 DIRECTORY:str = "C:/Users/lhy09/Songs" # Use "songs" for all commits
-songs:"dict[str, Song]" = {}
-song_names:"list[str]" = []
-alert:bool = False
-file_names:"list[str]" = listdir(DIRECTORY)
-SONGS_INSTRUCTIONS_FILE_NAME:str = "read_this.txt" # This text file must be in the "songs" directory
-try:
-    file_names.remove(SONGS_INSTRUCTIONS_FILE_NAME)
-except:
-    print(color("Instructions file not found in songs!", Colors.red))
-    alert = True
 
-for file_name in file_names:
-    if file_name[len(file_name) - 4 : ] != ".wav":
-        alert = True
-        print(color(f"The file \"{file_name}\"\'s name doesn't end with \".wav\", but it was added to the playlist anyway", Colors.yellow))
-    
-    song_name:str = file_name.replace(".wav", "")
-    try: # Will error if the song name can't be casted to an int
-        if int(song_name) <= len(valid_commands.keys()) + len(song_names) + 1: # Additionally, only raise an alert if the casted index is valid
-            alert = True
-            print(color(f"{song_name} dropped due to name overlap with existing index!", Colors.red))
-            continue # Avoid the "finally" block of code
-        # If the number converted from the song name is not a valid index, the song will be added in the "finally" block
+if __name__ == "__main__": # Only run the player when this file is run directly, so its classes can be imported without starting it (ex. by benchmark.py)
+    clear_console() # Clears any "hide cursor" characters in the console
+    hide_cursor()
+
+    # For the funnies
+    intro_enabled:bool = False # Enable or disable the intro bit
+    if intro_enabled:
+        wait(0.9)
+        print("\"Mom can we have Spotify?\"")
+        wait(1)
+        print("Mom: no, we have Spotify at home")
+        wait(2)
+
+        clear_console()
+        # Will all be cleared once spotify initializes and the console clears when the first song plays
+        wait(0.3)
+        print(f"spotify at home {color('Sqotify Inc., At home, ©2023 No Rights Reserved', Colors.faint)}")
+        wait(1.9)
+
+    song_names:"list[str]" = []
+    scan_jobs:"list[tuple[str, str, int, stat_result]]" = [] # The songs are created in parallel after every file name has been checked
+    alert:bool = False
+    # scandir() gets the size and modification time of each file along with the file names on Windows, so unchanged files can be loaded from the library cache without touching them
+    directory_entries:"dict[str, DirEntry]" = {entry.name : entry for entry in scandir(DIRECTORY)}
+    library_cache:LibraryCache = LibraryCache()
+    file_names:"list[str]" = list(directory_entries.keys())
+    SONGS_INSTRUCTIONS_FILE_NAME:str = "read_this.txt" # This text file must be in the "songs" directory
+    try:
+        file_names.remove(SONGS_INSTRUCTIONS_FILE_NAME)
     except:
-        if (song_name in valid_commands.keys()) or song_name == "clear" or song_name == PLACEHOLDER_SONGNAME or song_name == "": # Filter out any songs with the same name as a command
+        print(color("Instructions file not found in songs!", Colors.red))
+        alert = True
+
+    for file_name in file_names:
+        if file_name[len(file_name) - 4 : ] != ".wav":
             alert = True
-            print(color(f"{file_name} dropped due to name overlap with existing command!", Colors.red))
-        else:
-            songs[song_name] = Song(song_name, f"{DIRECTORY}/{file_name}", len(song_names))
-    finally:
-        song_names.append(song_name)    
+            print(color(f"The file \"{file_name}\"\'s name doesn't end with \".wav\", but it was added to the playlist anyway", Colors.yellow))
+    
+        song_name:str = file_name.replace(".wav", "")
+        try: # Will error if the song name can't be casted to an int
+            if int(song_name) <= len(valid_commands.keys()) + len(song_names) + 1: # Additionally, only raise an alert if the casted index is valid
+                alert = True
+                print(color(f"{song_name} dropped due to name overlap with existing index!", Colors.red))
+                continue # Avoid the "finally" block of code
+            # If the number converted from the song name is not a valid index, the song will be added in the "finally" block
+        except:
+            if (song_name in valid_commands.keys()) or song_name == "clear" or song_name == PLACEHOLDER_SONGNAME or song_name == "": # Filter out any songs with the same name as a command
+                alert = True
+                print(color(f"{file_name} dropped due to name overlap with existing command!", Colors.red))
+            else:
+                scan_jobs.append((song_name, f"{DIRECTORY}/{file_name}", len(song_names), directory_entries[file_name].stat()))
+        finally:
+            song_names.append(song_name)    
 
-if alert: # Prevent the "song dropped" messages from being instantly cleared from the console
-    print()
-    block_until_input()
+    songs:"dict[str, Song]" = scan_songs(scan_jobs, library_cache) # Keeps the order of scan_jobs
+    library_watcher:LibraryWatcher = LibraryWatcher(DIRECTORY, {file_name : entry.stat() for file_name, entry in directory_entries.items() if entry.is_file()})
 
+    if alert: # Prevent the "song dropped" messages from being instantly cleared from the console
+        print()
+        block_until_input()
 
-player = spotify(songs, song_names)
 
-def play():
-    player_thread:Thread = Thread(target = player.start, name = "Console", daemon = True)
-    player_thread.start()
+    player = spotify(songs, song_names, library_cache)
 
-    player.interlude_flag = False # Disable the waiting period before the first song
-    while True:
-        if player.playing:
-            player.play_next_song()
-        else:
-            wait(TICK_DURATION) # Wait and check whether the user has resumed the player
+    def play():
+        player_thread:Thread = Thread(target = player.start, name = "Console", daemon = True)
+        player_thread.start()
+
+        player.play_songs()
 
-music_thread:Thread = Thread(target = play, name = "Audio player", daemon = True)
-music_thread.start()
+    music_thread:Thread = Thread(target = play, name = "Audio player", daemon = True)
+    music_thread.start()
 
-while not player.terminated: # Yields once the user exits the music player, killing every thread
-    wait(TICK_DURATION)
+    # Returns True if a song with this name can be added while the player is running
+    def is_valid_song_name(song_name:str) -> bool:
+        if song_name.isnumeric() and int(song_name) <= len(valid_commands.keys()) + len(player.song_names) + 1: # Would overlap with an index
+            return False
+        return not ((song_name in valid_commands.keys()) or song_name == "clear" or song_name == PLACEHOLDER_SONGNAME or song_name == "")
+
+    # Periodically rescans DIRECTORY and merges any added, changed, or removed songs into the player
+    # Only the files that changed since the last rescan are probed, so each rescan costs a directory listing plus the work for the changes
+    # Songs whose cache entries were updated by analysis.py are reloaded too, so their loudness, silence, and overview are used without restarting the player
+    def watch_library() -> None:
+        while not player.terminated:
+            wait(LIBRARY_RESCAN_INTERVAL)
+
+            added_files, modified_files, removed_file_names = library_watcher.poll()
+            analyzed_keys:set[str] = library_cache.reload()
+            if analyzed_keys:
+                for file_name in library_watcher.known_files.keys():
+                    if file_name not in added_files and file_name not in modified_files and get_cache_key(f"{DIRECTORY}/{file_name}") in analyzed_keys:
+                        try:
+                            modified_files[file_name] = get_stat(f"{DIRECTORY}/{file_name}")
+                        except OSError: # If the file was removed since the folder was listed, it's removed at the next rescan
+                            pass
+            if not (added_files or modified_files or removed_file_names):
+                continue
+
+            lyrics_song_names:set[str] = list_lyrics_song_names()
+            added_songs:dict[str, Song] = {}
+            updated_metadata:dict[str, dict[str, Union[int, bool]]] = {}
+            for file_name, stat in chain(added_files.items(), modified_files.items()):
+                song_name:str = file_name.replace(".wav", "")
+                if not (song_name in player.songs or is_valid_song_name(song_name)):
+                    continue
+
+                try:
+                    metadata:dict[str, Union[int, bool]] = load_metadata(song_name, f"{DIRECTORY}/{file_name}", stat, library_cache, lyrics_song_names)
+                except: # If the file isn't a readable wav file (or is still being copied over), skip it until it changes again
+                    continue
+
+                if song_name in player.songs:
+                    updated_metadata[song_name] = metadata
+                else:
+                    added_songs[song_name] = Song(song_name, f"{DIRECTORY}/{file_name}", len(player.song_names) + len(added_songs), metadata)
+
+            removed_song_names:set[str] = {song_name for song_name in (file_name.replace(".wav", "") for file_name in removed_file_names) if song_name in player.songs}
+
+            player.update_library(added_songs, updated_metadata, removed_song_names)
+            if removed_file_names:
+                library_cache.prune({f"{DIRECTORY}/{file_name}" for file_name in library_watcher.known_files})
+            library_cache.save()
+
+    library_thread:Thread = Thread(target = watch_library, name = "Library watcher", daemon = True)
+    library_thread.start()
+
+    while not player.terminated: # Yields once the user exits the music player, killing every thread
+        wait(TICK_DURATION)
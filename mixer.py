@@ -0,0 +1,142 @@
+from math import cos, sin, pi
+from typing import Iterator, Union
+import warnings
+
+from wav import WavInfo, WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT
+
+try:
+    import numpy
+except ImportError: # NumPy is optional. Without it, only PCM audio can be scaled or mixed, through audioop
+    numpy = None
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning) # audioop is deprecated, but it's the only part of the standard library that does math on whole fragments of samples at once
+    try:
+        import audioop
+    except ImportError: # Removed in Python 3.13. The audioop-lts package brings it back
+        audioop = None
+MIXING_AVAILABLE:bool = numpy != None or audioop != None
+
+# The NumPy types of the samples in each format, keyed by (format tag, sample width). 24-bit samples don't have a NumPy type, so they're unpacked by hand
+SAMPLE_TYPES:"dict[tuple[int, int], str]" = {(WAVE_FORMAT_PCM, 1) : "u1", (WAVE_FORMAT_PCM, 2) : "<i2", (WAVE_FORMAT_PCM, 4) : "<i4", (WAVE_FORMAT_IEEE_FLOAT, 4) : "<f4", (WAVE_FORMAT_IEEE_FLOAT, 8) : "<f8"}
+
+# Returns True if NumPy is available and can do math on audio in this format
+def can_use_numpy(info:WavInfo) -> bool:
+    return numpy != None and ((info.format_tag, info.sample_width) in SAMPLE_TYPES or (info.format_tag == WAVE_FORMAT_PCM and info.sample_width == 3))
+
+# Returns the samples of a fragment of audio as a NumPy array of floats, in the same units as the samples (8-bit samples are made signed)
+# The array is always a copy, so the fragment can be released as soon as this returns. Only call this if can_use_numpy() is True
+def to_samples(fragment:"Union[bytes, memoryview]", info:WavInfo) -> "numpy.ndarray":
+    if info.format_tag == WAVE_FORMAT_PCM and info.sample_width == 3:
+        packed_samples:numpy.ndarray = numpy.frombuffer(fragment, numpy.uint8).reshape(-1, 3).astype(numpy.int32)
+        samples:numpy.ndarray = packed_samples[:, 0] | (packed_samples[:, 1] << 8) | (packed_samples[:, 2] << 16)
+        return ((samples ^ 0x800000) - 0x800000).astype(numpy.float64) # Sign-extends the samples from 24 bits
+    samples = numpy.frombuffer(fragment, SAMPLE_TYPES[(info.format_tag, info.sample_width)]).astype(numpy.float64)
+    if info.format_tag == WAVE_FORMAT_PCM and info.sample_width == 1: # 8-bit WAV samples are unsigned
+        samples -= 128
+    return samples
+
+# Converts samples returned by to_samples() back into audio in the format described by info. PCM samples are rounded and clipped to the range of the format
+def from_samples(samples:"numpy.ndarray", info:WavInfo) -> bytes:
+    if info.format_tag != WAVE_FORMAT_PCM:
+        return samples.astype(SAMPLE_TYPES[(info.format_tag, info.sample_width)]).tobytes()
+
+    full_scale:int = 1 << (8 * info.sample_width - 1)
+    samples = numpy.clip(numpy.rint(samples), -full_scale, full_scale - 1)
+    if info.sample_width == 3:
+        return samples.astype("<i4").view(numpy.uint8).reshape(-1, 4)[:, :3].tobytes() # Drops the highest byte of each sample
+    if info.sample_width == 1:
+        samples += 128
+    return samples.astype(SAMPLE_TYPES[(WAVE_FORMAT_PCM, info.sample_width)]).tobytes()
+
+GAIN_STEP_FRAMES:int = 64 # Without NumPy, the number of frames that share the same gain in a crossfade. Small enough that the steps can't be heard (1.3 ms at 48 kHz)
+
+# Returns True if songs in these formats can be crossfaded into each other
+def can_crossfade(outgoing_info:WavInfo, incoming_info:WavInfo) -> bool:
+    if outgoing_info[:4] != incoming_info[:4]: # Same format, channels, frame rate, and sample width
+        return False
+    return can_use_numpy(incoming_info) or (audioop != None and incoming_info.format_tag == WAVE_FORMAT_PCM) # audioop can't do math on floats
+
+# Mixes 2 fragments of the same length that start first_frame frames into a crossfade that's overlap_frames long
+# The gain curves are equal-power, so the crossfade doesn't dip in loudness halfway through
+# With NumPy, each frame gets its own gain. audioop can only scale a whole fragment at a time, so the fragment gets the gain of its middle frame. Keep fragments within GAIN_STEP_FRAMES frames for audioop
+def mix_fragments(outgoing_fragment:"Union[bytes, memoryview]", incoming_fragment:"Union[bytes, memoryview]", info:WavInfo, first_frame:int, overlap_frames:int) -> bytes:
+    frames_count:int = len(incoming_fragment) // info.frame_size
+    if can_use_numpy(info):
+        progress:numpy.ndarray = (numpy.arange(first_frame, first_frame + frames_count) + 0.5) * (pi / 2 / overlap_frames)
+        mixed_samples:numpy.ndarray = (to_samples(outgoing_fragment, info).reshape(-1, info.channels) * numpy.cos(progress)[:, None]
+                                       + to_samples(incoming_fragment, info).reshape(-1, info.channels) * numpy.sin(progress)[:, None])
+        return from_samples(mixed_samples, info)
+
+    progress:float = (first_frame + frames_count / 2) * (pi / 2 / overlap_frames)
+    return mix(apply_gain(outgoing_fragment, info.sample_width, cos(progress)), apply_gain(incoming_fragment, info.sample_width, sin(progress)), info.sample_width)
+
+# Multiplies every sample in fragment by gain
+def apply_gain(fragment:"Union[bytes, memoryview]", sample_width:int, gain:float) -> bytes:
+    if sample_width == 1: # 8-bit WAV samples are unsigned, but audioop treats them as signed
+        return audioop.bias(audioop.mul(audioop.bias(fragment, 1, -128), 1, gain), 1, 128)
+    return audioop.mul(fragment, sample_width, gain)
+# Adds 2 fragments together sample by sample, clipping instead of overflowing
+def mix(fragment_1:bytes, fragment_2:bytes, sample_width:int) -> bytes:
+    if sample_width == 1:
+        return audioop.bias(audioop.add(audioop.bias(fragment_1, 1, -128), audioop.bias(fragment_2, 1, -128), 1), 1, 128)
+    return audioop.add(fragment_1, fragment_2, sample_width)
+
+# Yields the incoming song's blocks with the last overlap_frames frames of the outgoing song mixed into its start
+# The outgoing song fades out while the incoming song fades in (see mix_fragments()). Whole fragments of samples are mixed at once
+# Both songs must be in the same format (see can_crossfade()). Closing the returned generator also closes both streams
+def crossfade_blocks(outgoing_blocks:"Iterator[memoryview]", incoming_blocks:"Iterator[memoryview]", info:WavInfo, overlap_frames:int, block_size:int) -> "Iterator[Union[bytes, memoryview]]":
+    frame_size:int = info.frame_size
+    overlap_size:int = max(0, overlap_frames) * frame_size
+    step_size:int = overlap_size if can_use_numpy(info) else GAIN_STEP_FRAMES * frame_size # NumPy can mix any length of fragment with a gain for each frame
+
+    try:
+        outgoing_block:memoryview = next(outgoing_blocks, None)
+        incoming_block:memoryview = next(incoming_blocks, None)
+        outgoing_offset:int = 0
+        incoming_offset:int = 0
+        mixed_size:int = 0 # The number of bytes of the overlap that have been mixed
+        mixed_block:bytearray = bytearray()
+
+        while mixed_size < overlap_size and outgoing_block != None and incoming_block != None:
+            # Mix up to the end of the current gain step, or the end of either block, whichever comes first
+            size:int = min(step_size - mixed_size % step_size, overlap_size - mixed_size, len(outgoing_block) - outgoing_offset, len(incoming_block) - incoming_offset)
+
+            mixed_block += mix_fragments(outgoing_block[outgoing_offset : outgoing_offset + size], incoming_block[incoming_offset : incoming_offset + size], info, mixed_size // frame_size, overlap_frames)
+            mixed_size += size
+            outgoing_offset += size
+            incoming_offset += size
+
+            if outgoing_offset == len(outgoing_block):
+                outgoing_block, outgoing_offset = next(outgoing_blocks, None), 0
+            if incoming_offset == len(incoming_block):
+                incoming_block, incoming_offset = next(incoming_blocks, None), 0
+            if len(mixed_block) >= block_size:
+                yield mixed_block
+                mixed_block = bytearray()
+
+        # Play the rest of the incoming song as it is
+        if mixed_block:
+            yield mixed_block
+        if incoming_block != None and incoming_offset < len(incoming_block):
+            yield incoming_block[incoming_offset:]
+        yield from incoming_blocks
+    finally:
+        outgoing_blocks.close()
+        incoming_blocks.close()
+
+# Yields the blocks with every sample multiplied by gain. Closing the returned generator also closes blocks
+# Audio is scaled with NumPy if it's available, otherwise with audioop. audioop can't scale floats, so without NumPy, float blocks are yielded as they are
+def scale_blocks(blocks:"Iterator[memoryview]", info:WavInfo, gain:float) -> "Iterator[Union[bytes, memoryview]]":
+    try:
+        if gain == 1:
+            yield from blocks
+        elif can_use_numpy(info):
+            for block in blocks:
+                yield from_samples(to_samples(block, info) * gain, info)
+        elif audioop != None and info.format_tag == WAVE_FORMAT_PCM:
+            for block in blocks:
+                yield apply_gain(block, info.sample_width, gain)
+        else:
+            yield from blocks
+    finally:
+        blocks.close()
@@ -1,10 +1,15 @@
-from winsound import PlaySound, SND_ASYNC
 from math import ceil
-from time import sleep as wait, time
-from wave import open as open_wav
+from time import sleep as wait
+from os.path import exists
+from functools import lru_cache
+from bisect import bisect_right
+from array import array
 from typing import Union
 
 from info import *
+from wav import read_wav_info, WavInfo, WavFormatError
+from clock import PlaybackClock
+from audio import AudioOutput
 
 # time: a string representing a time in mm:ss.ss format
 # converts and returns the time in seconds w/ decimals
@@ -12,11 +17,117 @@ def to_seconds(time:str) -> float:
     time:list[str] = time.split(":")
     return (int(time[0]) * 60) + float(time[1])
 
+# Reads the song's audio properties from the headers of its file, and checks whether the song has a lyrics file
+# Returns a dict in the form of {"format" : int, "frames" : int, "frame_rate" : int, "channels" : int, "sample_width" : int, "data_offset" : int, "lyrics" : bool}
+def probe_song(song_name:str, file_name:str) -> "dict[str, Union[int, bool]]":
+    info:WavInfo = read_wav_info(file_name) # Only reads the RIFF headers, not the audio
+    metadata:dict[str, Union[int, bool]] = {"format" : info.format_tag, "frames" : info.frames, "frame_rate" : info.frame_rate, "channels" : info.channels, "sample_width" : info.sample_width, "data_offset" : info.data_offset}
+    metadata["lyrics"] = exists(f"lyrics/{song_name}.txt")
+
+    return metadata
+
+# Returns the factor to multiply a song's samples by so that it plays at TARGET_LOUDNESS
+# loudness: the song's results from the loudness analyzer in analysis.py, in the form of {"rms" : dBFS, "peak" : dBFS}. Songs that haven't been analyzed yet play as they are
+def get_normalization_gain(loudness:"Union[dict[str, float], None]") -> float:
+    if not loudness:
+        return 1
+    gain:float = min(TARGET_LOUDNESS - loudness["rms"], MAX_NORMALIZATION_GAIN, -PEAK_HEADROOM - loudness["peak"]) # In dB
+    return 10 ** (gain / 20)
+
+# Reads and parses the lyrics file of a song
+# Each item in the returned list is a dictionary representing a line in the form of {"time" : start time of this line, "text" : the line's text}
+# Returns None if the song doesn't have a lyrics file or if the lyrics are formatted incorrectly
+# Only the lyrics of the most recently used songs are kept in memory
+@lru_cache(maxsize = LYRICS_CACHE_SIZE)
+def load_lyrics(song_name:str) -> "Union[list[dict[str, Union[float, str]]], None]":
+    lyrics:list[dict[str, Union[float, str]]] = None # Each lyric line will not have a newline character at the end
+    try:
+        with open(f"lyrics/{song_name}.txt", "r") as file: # Will error if no lyrics file with the same name as the song is found
+            lines:list[str] = file.readlines()
+
+        for i in range(len(lines)):
+            if len(lines[i]) > 1: # If the line is not empty
+                line:str = lines[i]
+
+                line = line.replace("/u2669", LYRIC_PLACEHOLDER_CHARACTER) # Add in any quarter note symbols
+                if i != len(lines) - 1: # The last line of each lyrics file won't have a newline after it
+                    line = line[:len(line) - 1] # Remove the newline character at the end of this line
+
+                if not lyrics:
+                    lyrics = []
+
+                lyrics.append({"time" : to_seconds(line[:line.index(" ")]), "text" : line[line.index(" ") + 1:]})
+    except:
+        lyrics = None # In case something is wrong with the lyrics' formatting and only some of the lyrics were added
+
+    if lyrics:
+        lyrics.sort(key = lambda line : line["time"]) # Stable, so lines with the same time keep their order. Keeps the times in order for find_lyric_line()
+    return lyrics
+
+# Returns the start time of each line in a song's lyrics, in order, or an empty array if the song doesn't have lyrics
+@lru_cache(maxsize = LYRICS_CACHE_SIZE)
+def load_lyric_times(song_name:str) -> array:
+    return array("d", (line["time"] for line in load_lyrics(song_name) or []))
+
+# Returns the index of the lyric line being sung at time (in seconds), which is the last line that starts at or before time. Returns 0 before the first line
+# lyric_times: the array returned by load_lyric_times(). Found with a binary search, so any point in the song takes O(log n) to find
+def find_lyric_line(lyric_times:array, time:float) -> int:
+    return max(0, bisect_right(lyric_times, time) - 1)
+
+# Reads the waveform overview that analysis.py saved for a song, in the form of a (lowest sample, highest sample) pair of signed bytes for each of OVERVIEW_BUCKETS parts of the song
+# Returns None if the overview is missing or was made with a different number of parts
+# Only the overviews of the most recently shown songs are kept in memory
+@lru_cache(maxsize = OVERVIEW_CACHE_SIZE)
+def load_overview(overview_name:str) -> "Union[bytes, None]":
+    try:
+        with open(f"{OVERVIEWS_DIRECTORY}/{overview_name}.bin", "rb") as file:
+            overview:bytes = file.read()
+    except OSError:
+        return None
+    return overview if len(overview) == 2 * OVERVIEW_BUCKETS else None
+
+# Returns the set of modifiers represented by the modifier flags of a song
+@lru_cache(maxsize = None) # There are only 2^len(Modifiers) possible sets
+def get_modifiers(modifier_flags:int) -> "frozenset[Modifiers]":
+    return frozenset(modifier for modifier, flag in MODIFIER_FLAGS.items() if modifier_flags & flag)
+
+# The listing colors of every combination of attributes and modifiers that has been listed so far
+# Keys are in the form of (attribute flags, modifier flags), so songs with the same attributes share the same list
+listing_colors_cache:"dict[tuple[int, int], list[tuple[SongAttributes, list[Colors]]]]" = {}
+
+# Lets the packed attributes of a song be read and written like the dict that they used to be stored in
+# attributes[SongAttributes.modifiers] is a frozenset, so assign a new set to it (ex. attributes[SongAttributes.modifiers] |= {modifier}) to change a song's modifiers
+class SongAttributesView:
+    __slots__ = ("song",)
+
+    def __init__(self, song:"Song"):
+        self.song:Song = song
+
+    def __getitem__(self, attribute:SongAttributes) -> "Union[bool, frozenset[Modifiers]]":
+        if attribute == SongAttributes.modifiers:
+            return get_modifiers(self.song.modifier_flags)
+        return bool(self.song.flags & ATTRIBUTE_FLAGS[attribute])
+
+    def __setitem__(self, attribute:SongAttributes, value:"Union[bool, set[Modifiers]]") -> None:
+        if attribute == SongAttributes.modifiers:
+            modifier_flags:int = 0
+            for modifier in value:
+                modifier_flags |= MODIFIER_FLAGS[modifier]
+            self.song.modifier_flags = modifier_flags
+        elif value:
+            self.song.flags |= ATTRIBUTE_FLAGS[attribute]
+        else:
+            self.song.flags &= ~ATTRIBUTE_FLAGS[attribute]
+
 class Song:
     parent_player = None
 
+    # Slotted so that each song doesn't need its own __dict__, which adds up in large libraries
+    __slots__ = ("file_name", "song_name", "index", "duration", "start_frame", "end_frame", "frame_rate", "gain", "overview_name", "has_lyrics", "BASE_WEIGHT", "weight", "flags", "modifier_flags", "sequence")
+
     # File name includes the path to the file
-    def __init__(self, song_name:str, file_name:str, index:int):        
+    # metadata: the dict returned by probe_song() for this file. The file will be probed if it isn't provided
+    def __init__(self, song_name:str, file_name:str, index:int, metadata:"dict[str, Union[int, bool]]" = None):        
         self.file_name:str = file_name
         if file_name[len(file_name) - 4:] != ".wav": # Just in case
             self.file_name += ".wav"
@@ -24,44 +135,24 @@ class Song:
         self.song_name:str = song_name
         self.index:int = index
 
-        with open_wav(file_name, "r") as file:
-            self.duration:int = ceil(file.getnframes() / file.getframerate())
-        self.curr_duration:int = 1
-        self.start_time = None
-
-        # KEYS IN self.attributes MUST MATCH KEYS IN enabled_colors IN spotify.list_actions
-        self.attributes:dict[SongAttributes, Union[bool, set]] = {SongAttributes.playing : False, # This attribute is updated from the play function, not from Spotify
-                                                        SongAttributes.disabled : False,
-                                                        SongAttributes.queued : False,
-                                                        SongAttributes.has_sequence : False,
-                                                        SongAttributes.sequenced : False,
-                                                        SongAttributes.modifiers : set()}
-        self.attributes_changed:bool = True
-        self.listing_colors:list[tuple[SongAttributes, list[Colors]]] = []
-        self.sequence:list[str] = []
-
-        # Each item in lyrics is a dictionary representing a line in the form of {"time" : start time of this line, "text" : the line's text}
-        # lyrics will be None if no lyrics text file 
-        self.lyrics:list["dict[str, Union[int, str]]"] = None # Each lyric line will not have a newline character at the end
-        try:
-            lines:list[str] = open(f"lyrics/{self.song_name}.txt", "r").readlines() # Will error if no lyrics file with the same name as the song is found
-
-            for i in range(len(lines)):
-                if len(lines[i]) > 1: # If the line is not empty
-                    line:str = lines[i]
-
-                    line = line.replace("/u2669", LYRIC_PLACEHOLDER_CHARACTER) # Add in any quarter note symbols
-                    if i != len(lines) - 1: # The last line of each lyrics file won't have a newline after it
-                        line = line[:len(line) - 1] # Remove the newline character at the end of this line
+        if not metadata:
+            metadata = probe_song(song_name, file_name)
+        self.duration:int # The length of the song without the silence at its start and end, rounded up to a whole second for display
+        self.start_frame:int # The frame that the silence at the start of the song ends at. Playback starts here
+        self.end_frame:int # The frame that the silence at the end of the song starts at. Playback stops here
+        self.frame_rate:int # Used to convert between positions in seconds and positions in frames
+        self.gain:float # Multiplies the song's samples during playback to even out the loudness of the library
+        self.overview_name:str # The name of the song's waveform overview, or None if the song hasn't been analyzed yet. The overview itself is only loaded when it's first shown (see self.overview)
+        self.has_lyrics:bool # Whether a lyrics file was found for this song. The lyrics themselves are only loaded when they are first needed (see self.lyrics)
+        self.BASE_WEIGHT:int
+        self.set_metadata(metadata)
+
+        # The boolean attributes of the song, packed using ATTRIBUTE_FLAGS. Read and write them through self.attributes
+        # The playing attribute is updated from the play function, not from Spotify
+        self.flags:int = 0
+        self.modifier_flags:int = 0 # Packed using MODIFIER_FLAGS
+        self.sequence:Union[list[str], tuple] = () # Shared empty tuple until the song gets a sequence
 
-                    if not self.lyrics:
-                        self.lyrics = []
-
-                    self.lyrics.append({"time" : to_seconds(line[:line.index(" ")]), "text" : line[line.index(" ") + 1:]})
-        except:
-            self.lyrics = None # In case something is wrong with the lyrics' formatting and only some of the lyrics were added
-        
-        self.BASE_WEIGHT:int = BASE_SONG_WEIGHT + max(-BASE_SONG_WEIGHT//4, min(BASE_SONG_WEIGHT//4, (STANDARD_SONG_LENGTH - self.duration)//5)) # Slightly increase/decrease the weight of shorter/longer songs up to ±25% of the base song weight
         self.weight:int = self.BASE_WEIGHT
 
     def __str__(self) -> str:
@@ -73,73 +164,132 @@ class Song:
     def __repr__(self) -> str:
         return f"{self.song_name}(Song)"
 
+    # KEYS IN self.attributes MUST MATCH KEYS IN enabled_colors IN spotify.list_actions
+    @property
+    def attributes(self) -> SongAttributesView:
+        return SongAttributesView(self)
+
+    # Each item in lyrics is a dictionary representing a line in the form of {"time" : start time of this line, "text" : the line's text}
+    # lyrics will be None if no lyrics text file was found
+    @property
+    def lyrics(self) -> "Union[list[dict[str, Union[float, str]]], None]":
+        return load_lyrics(self.song_name) if self.has_lyrics else None
+
+    # The start times of the lines in lyrics, for finding the current line with find_lyric_line()
+    @property
+    def lyric_times(self) -> array:
+        return load_lyric_times(self.song_name) if self.has_lyrics else array("d")
+
+    # The song's waveform overview (see load_overview()), or None if there isn't one
+    @property
+    def overview(self) -> "Union[bytes, None]":
+        return load_overview(self.overview_name) if self.overview_name else None
+
+    # The number of seconds into the song's file that the song starts at once the silence at its start is skipped
+    @property
+    def start_time(self) -> float:
+        return self.start_frame / self.frame_rate
+    # The number of seconds into the song's file that the song ends at
+    @property
+    def end_time(self) -> float:
+        return self.end_frame / self.frame_rate
+
+    # Sets the properties that are derived from the song's file
+    # Songs that haven't been analyzed yet play from the start of their file to its end
+    def set_metadata(self, metadata:"dict[str, Union[int, bool]]") -> None:
+        silence:dict[str, int] = metadata.get("silence") or {"start" : 0, "end" : metadata["frames"]}
+        self.end_frame = max(0, min(silence["end"], metadata["frames"]))
+        self.start_frame = max(0, min(silence["start"], self.end_frame))
+        self.frame_rate = metadata["frame_rate"]
+        self.duration = ceil((self.end_frame - self.start_frame) / self.frame_rate)
+        self.gain = get_normalization_gain(metadata.get("loudness"))
+        self.overview_name = metadata.get("overview")
+        self.has_lyrics = metadata["lyrics"]
+        self.BASE_WEIGHT = BASE_SONG_WEIGHT + max(-BASE_SONG_WEIGHT//4, min(BASE_SONG_WEIGHT//4, (STANDARD_SONG_LENGTH - self.duration)//5)) # Slightly increase/decrease the weight of shorter/longer songs up to ±25% of the base song weight
+
+    # Called when the song's file has been changed while the player is running
+    def update_metadata(self, metadata:"dict[str, Union[int, bool]]") -> None:
+        self.set_metadata(metadata)
+        self.recalculate_weight(synced_songs_count = Song.parent_player.get_synced_count(self.song_name))
+
+    # Don't edit the returned list, since it is shared with every song that has the same attributes and modifiers
     def get_listing_colors(self) -> "list[tuple[SongAttributes, list[Colors]]]":
-        if self.attributes_changed: # Return the colors that were last used for this song if none of the song's attributes have been changed since then
-            self.listing_colors.clear()
+        key:tuple[int, int] = (self.flags, self.modifier_flags)
+        if key not in listing_colors_cache: # Return the colors that were last used for these attributes if they have been listed before
+            listing_colors:list[tuple[SongAttributes, list[Colors]]] = []
 
             for attribute in ATTRIBUTES_COLORING_ORDER:
                 if self.attributes[attribute] and attribute.value: # attribute.value == None  when attribute is Modifiers
-                    self.listing_colors.append((attribute, [attribute.value]))
+                    listing_colors.append((attribute, [attribute.value]))
             
             modifier_colors:list[Colors] = []
             for modifier in MODIFIERS_COLORING_ORDER:
                 if modifier in self.attributes[SongAttributes.modifiers]:
                     modifier_colors.append(modifier.value["color"])
-            self.listing_colors.append((SongAttributes.modifiers, modifier_colors))
+            listing_colors.append((SongAttributes.modifiers, modifier_colors))
+
+            listing_colors_cache[key] = listing_colors
 
-            self.attributes_changed = False
+        return listing_colors_cache[key]
 
-        return self.listing_colors
+    # Returns the frame that playing the song from start_frame actually starts at. The silence at the start of the song is skipped,
+    # unless the song is played from its beginning through an output that would have to copy the rest of the song to skip it (see AudioOutput.supports_seeking)
+    def get_playback_start_frame(self, start_frame:int, output:AudioOutput) -> int:
+        if start_frame == 0 and not output.supports_seeking:
+            return 0
+        return max(start_frame, self.start_frame)
 
-    def play(self):
+    # start_frame: the frame to start playing from, such as where the song was paused. The silence at the start of the song is skipped
+    def play(self, start_frame:int = 0):
         if not Song.parent_player:
             print("No parent player found!")
             wait(5)
             return
             
+        clock:PlaybackClock = Song.parent_player.clock
+        output:AudioOutput = Song.parent_player.output
         self.attributes[SongAttributes.playing] = True
-        self.attributes_changed = True
 
-        PlaySound(self.file_name, SND_ASYNC)
-        self.start_timer() # Blocks the song-playing thread until the song is finished or interrupted
+        start_frame = self.get_playback_start_frame(start_frame, output)
+        length:float = self.end_time # The clock counts from the start of the file, so it matches the lyrics' timestamps
+        crossfade_duration:float = Song.parent_player.get_crossfade_duration(self) # How long before the end of this song the next song starts
 
-        self.attributes[SongAttributes.playing] = False
-        self.attributes_changed = True
-
-    # Don't call this function from the main thread
-    def start_timer(self) -> None:
-        self.curr_duration = 1
-        self.start_time = time()
-
-        while self.curr_duration < self.duration: # Outer loop iterates roughly once per second
-            if Song.parent_player.playing == True:
-                while time() - self.start_time <= self.curr_duration: # curr_duration will be ahead of the actual duration by between 0-1 seconds
-                    wait(TIMER_RESOLUTION)
-                self.curr_duration += 1
+        try:
+            output.play_file(self.file_name, start_frame, crossfade = Song.parent_player.crossfade_enabled, gain = self.gain, end_frame = self.end_frame) # Mixed into the end of the previous song if it's still playing
+        except (OSError, WavFormatError): # The file was deleted or changed since it was prefetched. Move on to the next song
+            self.attributes[SongAttributes.playing] = False
+            return
+        output.wait_for_start(COMMAND_TIMEOUT) # winsound might have to copy part of the song before it can start it, so only start the clock once the audio has started
+        Song.parent_player.clock_song = self
+        clock.start(length, start_frame / self.frame_rate, origin = self.start_time) # Ends exactly when the audio does, so the next song can start without a gap
+        Song.parent_player.acknowledge_commands()
+        # Commands are sent before the clock is stopped, so a command that was sent before the clock started is always caught here
+        if Song.parent_player.playing and not Song.parent_player.controls.pending():
+            clock.wait_until_ended(length - crossfade_duration) # Blocks the song-playing thread until the song is finished or interrupted, or until the next song should start crossfading in. The player lets the song finish if the next song turns out not to be mixable with it
+        else: # If the player was paused or skipped before the song started
+            output.stop()
+            clock.stop()
 
-            else: # If the player has been paused
-                self.curr_duration -= 1
-                break
+        self.attributes[SongAttributes.playing] = False
+        clock.notify_listeners()
 
     def set_enqueued(self) -> None:
-        if self.attributes[SongAttributes.queued] == False:
-            self.attributes[SongAttributes.queued] = True
-            self.attributes_changed = True
+        self.flags |= ATTRIBUTE_FLAGS[SongAttributes.queued]
+        self.notify_weight_changed()
     def set_dequeued(self) -> None:
-        if self.attributes[SongAttributes.queued] == True:
-            self.attributes[SongAttributes.queued] = False
-            self.attributes_changed = True
+        self.flags &= ~ATTRIBUTE_FLAGS[SongAttributes.queued]
+        self.notify_weight_changed()
 
     def disable(self) -> None:
         self.attributes[SongAttributes.disabled] = True
         self.recalculate_weight(synced_songs_count = None) # synced_songs_count won't be used if the song is disabled
+        self.notify_enabled_changed()
     def enable(self) -> None:
         self.attributes[SongAttributes.disabled] = False
         self.recalculate_weight(synced_songs_count = Song.parent_player.get_synced_count(self.song_name))
+        self.notify_enabled_changed()
 
     def update_sequence(self, new_sequence:"list[str]"):
-        self.attributes_changed = (self.attributes[SongAttributes.has_sequence] != bool(new_sequence))
-
         if new_sequence: # If there is at least 1 element in new_sequence
             # Update the sequenced statuses of songs in both the old and new lists
             for song_name in set(new_sequence) - set(self.sequence):
@@ -160,25 +310,36 @@ class Song:
     # Adding a modifier that has already been added won't do anything
     # synced_songs_count is always at least 1 because each song is technically always synced with itself
     def add_modifiers(self, synced_songs_count:int = None, *modifiers:"tuple[Modifiers]") -> None:
-        self.attributes[SongAttributes.modifiers] = self.attributes[SongAttributes.modifiers] | set(modifiers)
+        for modifier in modifiers:
+            self.modifier_flags |= MODIFIER_FLAGS[modifier]
         self.recalculate_weight(synced_songs_count if synced_songs_count != None else 1)
 
     def remove_modifiers(self, synced_songs_count:int = None, *modifiers:"tuple[Modifiers]") -> None:
-        self.attributes[SongAttributes.modifiers] = self.attributes[SongAttributes.modifiers] - set(modifiers)
+        for modifier in modifiers:
+            self.modifier_flags &= ~MODIFIER_FLAGS[modifier]
         self.recalculate_weight(synced_songs_count if synced_songs_count != None else 1)
 
     def clear_modifiers(self) -> None:
-        self.attributes[SongAttributes.modifiers].clear()
+        self.modifier_flags = 0
         self.recalculate_weight(synced_songs_count = 1)
 
     # Only called from within this object
     def recalculate_weight(self, synced_songs_count:int = 1) -> None:
-        if self.attributes[SongAttributes.disabled]:
+        if self.flags & ATTRIBUTE_FLAGS[SongAttributes.disabled]:
             self.weight = 0
         else:
             self.weight = self.BASE_WEIGHT
             for modifier in MODIFIERS_COLORING_ORDER:
-                if modifier in self.attributes[SongAttributes.modifiers]:
+                if self.modifier_flags & MODIFIER_FLAGS[modifier]:
                     self.weight = modifier.value["weight update"](self.weight, synced_songs_count)
-        
-        self.attributes_changed = True
+
+        self.notify_weight_changed()
+
+    # Lets the parent player update this song's chance of being picked in shuffle mode
+    def notify_weight_changed(self) -> None:
+        if Song.parent_player:
+            Song.parent_player.update_shuffle_weight(self)
+    # Lets the parent player update whether loop mode can stop on this song
+    def notify_enabled_changed(self) -> None:
+        if Song.parent_player:
+            Song.parent_player.update_loop_order(self)
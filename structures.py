@@ -0,0 +1,248 @@
+# Data structures that keep the player's per-song bookkeeping cheap in large libraries
+from collections import deque, Counter
+from random import shuffle as random_shuffle
+from typing import Union
+
+# A Fenwick (binary indexed) tree over a list of non-negative ints
+# Updating a value, summing a prefix of the values, and finding the index that a running total lands on all take O(log n) time
+class FenwickTree:
+    def __init__(self, values:"list[int]" = []):
+        self.values:list[int] = list(values)
+        self.tree:list[int] = [0] + self.values # 1-indexed. tree[i] stores the sum of values[i - lowbit(i) : i]
+        # Build the tree in O(n) by pushing each node's sum up to its parent
+        for i in range(1, len(self.tree)):
+            parent:int = i + (i & -i)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[i]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, index:int) -> int:
+        return self.values[index]
+
+    def __setitem__(self, index:int, value:int) -> None:
+        delta:int = value - self.values[index]
+        if delta == 0:
+            return
+
+        self.values[index] = value
+        i:int = index + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    # Returns the sum of the first count values
+    def prefix_sum(self, count:int) -> int:
+        total:int = 0
+        while count > 0:
+            total += self.tree[count]
+            count -= count & -count
+        return total
+
+    def total(self) -> int:
+        return self.prefix_sum(len(self.values))
+
+    def append(self, value:int) -> None:
+        self.values.append(value)
+        i:int = len(self.values)
+        # The new node covers values[i - lowbit(i) : i], which includes the new value
+        self.tree.append(self.prefix_sum(i - 1) - self.prefix_sum(i - (i & -i)) + value)
+    # Removes and returns the last value. No other node covers the last value, so the rest of the tree stays the same
+    def pop(self) -> int:
+        self.tree.pop()
+        return self.values.pop()
+
+    # Returns the index of the value that the running total of the values first reaches target at
+    # target must be between 1 and self.total() (inclusive)
+    def find(self, target:int) -> int:
+        position:int = 0
+        step:int = 1 << (len(self.values).bit_length() - 1) if self.values else 0
+        while step > 0:
+            if position + step < len(self.tree) and self.tree[position + step] < target:
+                position += step
+                target -= self.tree[position]
+            step >>= 1
+
+        return position # The values before this index sum up to less than target
+
+    # Returns the index of the first non-zero value after index, wrapping around to the start (so index itself is checked last)
+    # Returns None if every value is 0
+    def find_next(self, index:int) -> "Union[int, None]":
+        total:int = self.total()
+        if total == 0:
+            return None
+
+        values_before:int = self.prefix_sum(index + 1) # The sum of the values up to and including index
+        return self.find(values_before + 1 if values_before < total else 1)
+
+# A fixed-capacity ring buffer of lists of names, with a count of how many times each name appears across the lists
+# Checking whether a name is in any of the lists takes O(1) time, and adding a list only touches the list that it replaces
+class CooldownRing:
+    def __init__(self, capacity:int):
+        self.capacity:int = max(0, capacity)
+        self.slots:list[list[str]] = [[] for _ in range(self.capacity)]
+        self.start:int = 0 # The slot that holds the oldest list
+        self.size:int = 0 # The number of slots in use
+        self.counts:dict[str, int] = {} # Only contains names that are in at least one of the lists
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, name:str) -> bool:
+        return name in self.counts
+
+    # Iterates over the lists from the oldest to the newest
+    def __iter__(self):
+        for i in range(self.size):
+            yield self.slots[(self.start + i) % self.capacity]
+
+    def add_names(self, names:"list[str]") -> None:
+        for name in names:
+            self.counts[name] = self.counts.get(name, 0) + 1
+    def remove_names(self, names:"list[str]") -> None:
+        for name in names:
+            if self.counts[name] <= 1:
+                del self.counts[name]
+            else:
+                self.counts[name] -= 1
+
+    # Adds names as the newest list, replacing the oldest list if the ring is full
+    # Returns the names in the list that was replaced (names is returned as-is if the capacity is 0)
+    def push(self, names:"list[str]") -> "list[str]":
+        if self.capacity == 0:
+            return names
+
+        evicted_names:list[str] = []
+        if self.size == self.capacity:
+            evicted_names = self.slots[self.start]
+            self.remove_names(evicted_names)
+            self.slots[self.start] = names
+            self.start = (self.start + 1) % self.capacity
+        else:
+            self.slots[(self.start + self.size) % self.capacity] = names
+            self.size += 1
+
+        self.add_names(names)
+        return evicted_names
+
+    # Changes the capacity of the ring, keeping the newest lists that still fit
+    # Returns the names in the lists that no longer fit
+    def resize(self, capacity:int) -> "list[str]":
+        capacity = max(0, capacity)
+        if capacity == self.capacity:
+            return []
+
+        lists:list[list[str]] = list(self)
+        evicted_names:list[str] = []
+        for names in lists[:max(0, len(lists) - capacity)]:
+            self.remove_names(names)
+            evicted_names.extend(names)
+
+        kept_lists:list[list[str]] = lists[len(lists) - min(len(lists), capacity):]
+        self.capacity = capacity
+        self.slots = kept_lists + [[] for _ in range(capacity - len(kept_lists))]
+        self.start = 0
+        self.size = len(kept_lists)
+        return evicted_names
+
+    # Removes every occurrence of the names from the lists
+    def discard(self, names:"set[str]") -> None:
+        for names_list in self:
+            removed_names:list[str] = [name for name in names_list if name in names]
+            if removed_names:
+                self.remove_names(removed_names)
+                names_list[:] = [name for name in names_list if name not in names]
+
+# A first-in first-out queue that counts how many times each item is in it
+# Adding to the back, removing from the front, and checking whether or how many times an item is queued all take O(1) time
+class CountedQueue:
+    def __init__(self, items:list = []):
+        self.items:deque = deque(items)
+        self.counts:Counter = Counter(self.items) # Items are deleted from counts once none of them are left in the queue
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __contains__(self, item) -> bool:
+        return item in self.counts
+
+    # Indexing the front or back is O(1). Indexing towards the middle is O(n)
+    def __getitem__(self, index:int):
+        return self.items[index]
+
+    def count(self, item) -> int:
+        return self.counts.get(item, 0)
+
+    def uncount(self, item) -> None:
+        if self.counts[item] <= 1:
+            del self.counts[item]
+        else:
+            self.counts[item] -= 1
+
+    def append(self, item) -> None:
+        self.items.append(item)
+        self.counts[item] += 1
+
+    def extend(self, items:list) -> None:
+        self.items.extend(items)
+        self.counts.update(items)
+
+    def popleft(self):
+        item = self.items.popleft()
+        self.uncount(item)
+        return item
+
+    # Removes and returns the item at index
+    def pop_at(self, index:int):
+        item = self.items[index]
+        del self.items[index]
+        self.uncount(item)
+        return item
+
+    # Returns the index of the nth occurrence of item (1 is the first), or None if there aren't that many occurrences
+    # Stops scanning as soon as the occurrence is found, and doesn't scan at all if there aren't enough occurrences
+    def index_of_occurrence(self, item, occurrence:int) -> "Union[int, None]":
+        if occurrence < 1 or occurrence > self.count(item):
+            return None
+
+        for index, queued_item in enumerate(self.items):
+            if queued_item == item:
+                occurrence -= 1
+                if occurrence == 0:
+                    return index
+
+    # Removes every occurrence of the items in a single pass over the queue. Returns the number of items that were removed
+    def remove_all(self, items:set) -> int:
+        removals:int = sum(self.counts.pop(item, 0) for item in items)
+        if removals > 0:
+            self.items = deque(queued_item for queued_item in self.items if queued_item not in items)
+        return removals
+
+    # Removes every occurrence of each item after its first one, except for the items in exempt_items. Returns the number of items that were removed
+    def dedupe(self, exempt_items:set = set()) -> int:
+        encountered_items:set = set()
+        unique_items:list = []
+        for item in self.items:
+            if item in exempt_items or item not in encountered_items:
+                encountered_items.add(item)
+                unique_items.append(item)
+
+        removals:int = len(self.items) - len(unique_items)
+        if removals > 0:
+            self.items = deque(unique_items)
+            self.counts = Counter(unique_items)
+        return removals
+
+    # Shuffles the items in place. Shuffling a deque directly would index into its middle O(n) times
+    def shuffle(self) -> None:
+        items:list = list(self.items)
+        random_shuffle(items)
+        self.items = deque(items)
+
+    def clear(self) -> None:
+        self.items.clear()
+        self.counts.clear()
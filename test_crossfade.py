@@ -0,0 +1,66 @@
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import sleep as wait, monotonic
+from os import listdir
+import unittest
+import wave
+
+from song import Song
+from main import spotify, Modes
+from audio import WavFileOutput
+from mixer import can_crossfade
+from wav import read_wav_info
+
+# Writes a WAV file of a constant tone that's seconds long, so every frame of the song is sound that would be heard if it was cut off
+def write_song(file_name:str, seconds:float, frame_rate:int) -> None:
+    with wave.open(file_name, "wb") as file:
+        file.setnchannels(2)
+        file.setsampwidth(2)
+        file.setframerate(frame_rate)
+        file.writeframes(b"\x00\x10" * 2 * int(seconds * frame_rate))
+
+# Runs the player without drawing its UI
+class HeadlessPlayer(spotify):
+    def update_ui(self, command:str = "") -> None:
+        pass
+
+class CrossfadeTests(unittest.TestCase):
+    def test_formats_with_different_frame_rates_cant_be_mixed(self):
+        with TemporaryDirectory() as directory:
+            write_song(f"{directory}/44.1 kHz.wav", 0.1, 44100)
+            write_song(f"{directory}/48 kHz.wav", 0.1, 48000)
+            self.assertFalse(can_crossfade(read_wav_info(f"{directory}/44.1 kHz.wav"), read_wav_info(f"{directory}/48 kHz.wav")))
+
+    # With crossfade on, a song that can't be mixed into the next one has to play until its end instead of being cut off where the crossfade would have started
+    def test_song_plays_to_its_end_before_a_song_that_cant_be_mixed_into_it(self):
+        with TemporaryDirectory() as directory:
+            songs:dict[str, Song] = {}
+            for song_name, frame_rate in (("44.1 kHz", 44100), ("48 kHz", 48000)):
+                write_song(f"{directory}/{song_name}.wav", 1, frame_rate)
+                songs[song_name] = Song(song_name, f"{directory}/{song_name}.wav", len(songs))
+
+            HeadlessPlayer.SAVE_FILE_PATH = f"{directory}/save_file.json"
+            player:HeadlessPlayer = HeadlessPlayer(songs, list(songs.keys()))
+            player.mode = Modes.Loop
+            player.crossfade_enabled = True
+            player.output = WavFileOutput(f"{directory}/recordings")
+            self.assertGreater(player.get_crossfade_duration(songs["44.1 kHz"]), 0)
+
+            player_thread:Thread = Thread(target = player.play_songs, name = "Audio player", daemon = True)
+            player_thread.start()
+            deadline:float = monotonic() + 10
+            while player.output.recordings_count < 3 and monotonic() < deadline: # Wait until both songs have finished
+                wait(0.05)
+            player.terminated = True
+            player.output.stop()
+            player.clock.stop()
+            player_thread.join()
+
+            recordings:list[str] = sorted(listdir(f"{directory}/recordings"))
+            self.assertGreaterEqual(len(recordings), 3)
+            for recording in recordings[:2]: # The first 2 songs are recorded separately, since they couldn't be mixed together
+                song:Song = songs[recording[5:-4]] # Recordings are named "<number> <file name>"
+                self.assertEqual(read_wav_info(f"{directory}/recordings/{recording}").frames, song.end_frame - song.start_frame)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+from tempfile import TemporaryDirectory
+from os import chdir, getcwd, makedirs, listdir, stat as get_stat
+from os.path import abspath
+import unittest
+
+from library import LibraryCache, get_cache_key
+from info import OVERVIEWS_DIRECTORY
+
+# Writes a file of size bytes and returns its stat result, which is what the cache checks its entries against
+def write_file(file_name:str, size:int = 4):
+    with open(file_name, "wb") as file:
+        file.write(bytes(size))
+    return get_stat(file_name)
+
+# Each test runs in its own empty folder, since the cache file and the overviews folder are relative to the working directory
+class LibraryCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.previous_directory:str = getcwd()
+        self.directory:TemporaryDirectory = TemporaryDirectory()
+        chdir(self.directory.name)
+        makedirs("songs")
+
+    def tearDown(self):
+        chdir(self.previous_directory)
+        self.directory.cleanup()
+
+    # The player and analysis.py each save their own changes without losing the ones that the other program saved first
+    def test_save_merges_entries_from_another_cache(self):
+        player_cache:LibraryCache = LibraryCache()
+        analysis_cache:LibraryCache = LibraryCache()
+        player_cache.put("songs/a.wav", write_file("songs/a.wav"), {"lyrics" : False})
+        player_cache.save()
+        analysis_cache.put("songs/b.wav", write_file("songs/b.wav"), {"lyrics" : False, "features" : {"bpm" : 120}})
+        analysis_cache.save()
+
+        cache:LibraryCache = LibraryCache()
+        self.assertEqual(cache.peek("songs/a.wav"), {"lyrics" : False})
+        self.assertEqual(cache.peek("songs/b.wav"), {"lyrics" : False, "features" : {"bpm" : 120}})
+
+    # If both programs changed the entry of the same version of a file, the results that only the other program has are added to it
+    def test_save_merges_results_into_an_entry_that_was_changed_here(self):
+        stat = write_file("songs/a.wav")
+        player_cache:LibraryCache = LibraryCache()
+        analysis_cache:LibraryCache = LibraryCache()
+        analysis_cache.put("songs/a.wav", stat, {"lyrics" : False, "features" : {"bpm" : 120}})
+        analysis_cache.save()
+        player_cache.put("songs/a.wav", stat, {"lyrics" : True})
+        player_cache.save()
+
+        self.assertEqual(LibraryCache().peek("songs/a.wav"), {"lyrics" : True, "features" : {"bpm" : 120}})
+        self.assertEqual(player_cache.peek("songs/a.wav"), {"lyrics" : True, "features" : {"bpm" : 120}})
+
+    def test_reload_returns_the_keys_that_another_cache_saved(self):
+        player_cache:LibraryCache = LibraryCache()
+        analysis_cache:LibraryCache = LibraryCache()
+        self.assertEqual(player_cache.reload(), set())
+        analysis_cache.put("songs/a.wav", write_file("songs/a.wav"), {"lyrics" : False})
+        analysis_cache.save()
+
+        self.assertEqual(player_cache.reload(), {get_cache_key("songs/a.wav")})
+        self.assertEqual(player_cache.peek("songs/a.wav"), {"lyrics" : False})
+        self.assertEqual(player_cache.reload(), set()) # Nothing changed since the last reload
+
+    # Entries are found no matter how the songs folder is named, including the entries of caches saved before the keys were normalized
+    def test_keys_are_normalized(self):
+        stat = write_file("songs/a.wav")
+        with open(LibraryCache.CACHE_FILE_PATH, "w", encoding = "utf-8") as file:
+            file.write(f'{{"version":{LibraryCache.VERSION},"entries":{{"songs/a.wav":{{"size":{stat.st_size},"mtime":{stat.st_mtime_ns},"metadata":{{"lyrics":false}}}}}}}}')
+
+        cache:LibraryCache = LibraryCache()
+        self.assertEqual(list(cache.entries.keys()), [get_cache_key("songs/a.wav")])
+        self.assertEqual(cache.get(abspath("songs/a.wav"), stat), {"lyrics" : False})
+        self.assertEqual(cache.get("songs/../songs/a.wav", stat), {"lyrics" : False})
+
+    def test_changed_files_miss_the_cache(self):
+        cache:LibraryCache = LibraryCache()
+        cache.put("songs/a.wav", write_file("songs/a.wav"), {"lyrics" : False})
+        self.assertIsNone(cache.get("songs/a.wav", write_file("songs/a.wav", 8)))
+
+    # A pruned entry has to stay removed even though the cache file still had it when the cache was saved
+    def test_pruned_entries_stay_removed(self):
+        cache:LibraryCache = LibraryCache()
+        cache.put("songs/a.wav", write_file("songs/a.wav"), {"lyrics" : False})
+        cache.put("songs/b.wav", write_file("songs/b.wav"), {"lyrics" : False})
+        cache.save()
+        cache.prune({"songs/b.wav"})
+        cache.save()
+
+        self.assertIsNone(cache.peek("songs/a.wav"))
+        self.assertEqual(list(LibraryCache().entries.keys()), [get_cache_key("songs/b.wav")])
+
+    # Songs with the same overview share its file, so it's only deleted once no entry uses it
+    def test_save_deletes_overviews_that_no_entry_uses(self):
+        makedirs(OVERVIEWS_DIRECTORY)
+        for overview_name in ("shared", "only a", "old b", "new b"):
+            write_file(f"{OVERVIEWS_DIRECTORY}/{overview_name}.bin")
+
+        cache:LibraryCache = LibraryCache()
+        cache.put("songs/a.wav", write_file("songs/a.wav"), {"lyrics" : False, "overview" : "only a"})
+        cache.put("songs/b.wav", write_file("songs/b.wav"), {"lyrics" : False, "overview" : "old b"})
+        cache.put("songs/c.wav", write_file("songs/c.wav"), {"lyrics" : False, "overview" : "shared"})
+        cache.put("songs/d.wav", write_file("songs/d.wav"), {"lyrics" : False, "overview" : "shared"})
+        cache.save()
+        self.assertEqual(len(listdir(OVERVIEWS_DIRECTORY)), 4)
+
+        cache.put("songs/b.wav", write_file("songs/b.wav", 8), {"lyrics" : False, "overview" : "new b"})
+        cache.prune({"songs/b.wav", "songs/d.wav"})
+        cache.save()
+        self.assertEqual(sorted(listdir(OVERVIEWS_DIRECTORY)), ["new b.bin", "shared.bin"])
+
+if __name__ == "__main__":
+    unittest.main()
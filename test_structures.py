@@ -0,0 +1,145 @@
+from collections import Counter
+from random import Random
+import unittest
+
+from structures import FenwickTree, CooldownRing, CountedQueue
+
+# Returns the index that the running total of values first reaches target at, by adding up the values one at a time
+def find_by_scanning(values:"list[int]", target:int) -> int:
+    running_total:int = 0
+    for index, value in enumerate(values):
+        running_total += value
+        if running_total >= target:
+            return index
+
+class FenwickTreeTests(unittest.TestCase):
+    # Checks every query of the tree against the same query done by scanning a plain list
+    def assert_matches(self, tree:FenwickTree, values:"list[int]") -> None:
+        self.assertEqual(len(tree), len(values))
+        self.assertEqual(tree.values, values)
+        for count in range(len(values) + 1):
+            self.assertEqual(tree.prefix_sum(count), sum(values[:count]))
+        self.assertEqual(tree.total(), sum(values))
+        for target in range(1, sum(values) + 1):
+            self.assertEqual(tree.find(target), find_by_scanning(values, target))
+        for index in range(len(values)):
+            following_indexes:list[int] = [i % len(values) for i in range(index + 1, index + len(values) + 1)]
+            self.assertEqual(tree.find_next(index), next((i for i in following_indexes if values[i] > 0), None))
+
+    def test_empty_tree(self):
+        tree:FenwickTree = FenwickTree()
+        self.assert_matches(tree, [])
+        tree.append(3)
+        self.assert_matches(tree, [3])
+
+    def test_find_next_wraps_around_and_skips_zeros(self):
+        tree:FenwickTree = FenwickTree([0, 2, 0, 0, 1, 0])
+        self.assertEqual(tree.find_next(1), 4)
+        self.assertEqual(tree.find_next(4), 1)
+        self.assertEqual(tree.find_next(5), 1)
+        self.assertIsNone(FenwickTree([0, 0, 0]).find_next(1))
+
+    # Builds, updates, appends to, and pops from trees at random, checking them against plain lists after every change
+    def test_random_changes(self):
+        random:Random = Random(8)
+        for _ in range(50):
+            values:list[int] = [random.randint(0, 5) for _ in range(random.randint(0, 40))]
+            tree:FenwickTree = FenwickTree(values)
+            self.assert_matches(tree, values)
+            for _ in range(20):
+                change:float = random.random()
+                if change < 0.4 and values:
+                    index:int = random.randrange(len(values))
+                    values[index] = random.randint(0, 5)
+                    tree[index] = values[index]
+                elif change < 0.7:
+                    values.append(random.randint(0, 5))
+                    tree.append(values[-1])
+                elif values:
+                    self.assertEqual(tree.pop(), values.pop())
+                self.assert_matches(tree, values)
+
+class CooldownRingTests(unittest.TestCase):
+    def assert_counts(self, ring:CooldownRing) -> None:
+        self.assertEqual(ring.counts, dict(Counter(name for names in ring for name in names)))
+
+    def test_push_replaces_the_oldest_list_once_full(self):
+        ring:CooldownRing = CooldownRing(2)
+        self.assertEqual(ring.push(["a", "b"]), [])
+        self.assertEqual(ring.push(["b", "c"]), [])
+        self.assertEqual(ring.push(["d"]), ["a", "b"])
+        self.assertEqual(list(ring), [["b", "c"], ["d"]])
+        self.assertNotIn("a", ring)
+        self.assertIn("b", ring) # Still in the newer list
+        self.assert_counts(ring)
+
+    def test_zero_capacity_keeps_nothing(self):
+        ring:CooldownRing = CooldownRing(0)
+        self.assertEqual(ring.push(["a"]), ["a"])
+        self.assertEqual(len(ring), 0)
+        self.assertNotIn("a", ring)
+
+    def test_resize_keeps_the_newest_lists(self):
+        ring:CooldownRing = CooldownRing(3)
+        for names in (["a"], ["b"], ["c"]):
+            ring.push(names)
+        self.assertEqual(ring.resize(1), ["a", "b"])
+        self.assertEqual(list(ring), [["c"]])
+        self.assertEqual(ring.resize(3), [])
+        ring.push(["d"])
+        self.assertEqual(list(ring), [["c"], ["d"]])
+        self.assert_counts(ring)
+
+    def test_discard_removes_every_occurrence(self):
+        ring:CooldownRing = CooldownRing(3)
+        for names in (["a", "b"], ["b"], ["a", "c"]):
+            ring.push(names)
+        ring.discard({"a", "b"})
+        self.assertEqual(list(ring), [[], [], ["c"]])
+        self.assertNotIn("a", ring)
+        self.assertNotIn("b", ring)
+        self.assert_counts(ring)
+
+class CountedQueueTests(unittest.TestCase):
+    def assert_counts(self, queue:CountedQueue) -> None:
+        self.assertEqual(dict(queue.counts), dict(Counter(queue)))
+
+    def test_counts_follow_the_items(self):
+        queue:CountedQueue = CountedQueue(["a", "b", "a"])
+        queue.append("c")
+        queue.extend(["a", "d"])
+        self.assertEqual(queue.count("a"), 3)
+        self.assertEqual(queue.popleft(), "a")
+        self.assertEqual(queue.pop_at(1), "a")
+        self.assertEqual(list(queue), ["b", "c", "a", "d"])
+        self.assertEqual(queue.count("a"), 1)
+        self.assertEqual(queue.count("e"), 0)
+        self.assert_counts(queue)
+
+    def test_index_of_occurrence(self):
+        queue:CountedQueue = CountedQueue(["a", "b", "a", "c", "a"])
+        self.assertEqual(queue.index_of_occurrence("a", 1), 0)
+        self.assertEqual(queue.index_of_occurrence("a", 3), 4)
+        self.assertIsNone(queue.index_of_occurrence("a", 4))
+        self.assertIsNone(queue.index_of_occurrence("a", 0))
+        self.assertIsNone(queue.index_of_occurrence("d", 1))
+
+    def test_remove_all_and_dedupe(self):
+        queue:CountedQueue = CountedQueue(["a", "b", "a", "c", "b", "d"])
+        self.assertEqual(queue.remove_all({"c", "e"}), 1)
+        self.assertEqual(queue.dedupe({"b"}), 1)
+        self.assertEqual(list(queue), ["a", "b", "b", "d"])
+        self.assertNotIn("c", queue)
+        self.assert_counts(queue)
+
+    def test_shuffle_and_clear(self):
+        queue:CountedQueue = CountedQueue(list(range(20)))
+        queue.shuffle()
+        self.assertEqual(sorted(queue), list(range(20)))
+        self.assert_counts(queue)
+        queue.clear()
+        self.assertEqual(len(queue), 0)
+        self.assertNotIn(0, queue)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+from tempfile import TemporaryDirectory
+from struct import pack
+import unittest
+import wave
+
+from wav import read_wav_info, make_wav_header, stream_wav_blocks, map_wav_data, WavInfo, WavFormatError, WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_EXTENSIBLE, HEADER_READ_SIZE
+
+# Returns a "fmt " chunk for the format described by the arguments
+def make_fmt_chunk(format_tag:int, channels:int, frame_rate:int, sample_width:int) -> bytes:
+    fmt:bytes = pack("<HHIIHH", format_tag, channels, frame_rate, frame_rate * channels * sample_width, channels * sample_width, 8 * sample_width)
+    return b"fmt " + pack("<I", len(fmt)) + fmt
+
+# Returns a chunk of any other kind, padded to an even size like every chunk in a RIFF file
+def make_chunk(chunk_id:bytes, data:bytes) -> bytes:
+    return chunk_id + pack("<I", len(data)) + data + b"\x00" * (len(data) % 2)
+
+# Writes a RIFF/WAVE file made of chunks
+def write_riff(file_name:str, chunks:bytes) -> None:
+    with open(file_name, "wb") as file:
+        file.write(b"RIFF" + pack("<I", 4 + len(chunks)) + b"WAVE" + chunks)
+
+class ReadWavInfoTests(unittest.TestCase):
+    def test_file_written_by_the_wave_module(self):
+        with TemporaryDirectory() as directory:
+            with wave.open(f"{directory}/song.wav", "wb") as file:
+                file.setnchannels(2)
+                file.setsampwidth(3)
+                file.setframerate(48000)
+                file.writeframes(bytes(range(6)) * 100)
+            info:WavInfo = read_wav_info(f"{directory}/song.wav")
+            self.assertEqual(info, WavInfo(WAVE_FORMAT_PCM, 2, 48000, 3, 100, 44, 600))
+
+    # make_wav_header() has to write headers that read_wav_info() reads back the same way, including the "fact" chunk that floats need
+    def test_float_header_round_trips(self):
+        with TemporaryDirectory() as directory:
+            audio:bytes = pack("<6f", 0, 0.5, -0.5, 1, -1, 0.25)
+            with open(f"{directory}/song.wav", "wb") as file:
+                file.write(make_wav_header(WavInfo(WAVE_FORMAT_IEEE_FLOAT, 2, 44100, 4, 3, 0, 0), 3) + audio)
+            info:WavInfo = read_wav_info(f"{directory}/song.wav")
+            self.assertEqual((info.format_tag, info.channels, info.frame_rate, info.sample_width, info.frames), (WAVE_FORMAT_IEEE_FLOAT, 2, 44100, 4, 3))
+            with map_wav_data(f"{directory}/song.wav", info) as data:
+                self.assertEqual(bytes(data), audio)
+
+    def test_extensible_format_uses_its_sub_format(self):
+        with TemporaryDirectory() as directory:
+            extension:bytes = pack("<HHI", 22, 32, 0b11) + pack("<H", WAVE_FORMAT_IEEE_FLOAT) + bytes(14) # cbSize, valid bits, channel mask, then the sub-format GUID
+            fmt:bytes = make_fmt_chunk(WAVE_FORMAT_EXTENSIBLE, 2, 44100, 4)
+            fmt = b"fmt " + pack("<I", 40) + fmt[8:] + extension
+            write_riff(f"{directory}/song.wav", fmt + make_chunk(b"data", bytes(16)))
+            info:WavInfo = read_wav_info(f"{directory}/song.wav")
+            self.assertEqual((info.format_tag, info.frames), (WAVE_FORMAT_IEEE_FLOAT, 2))
+
+    # Chunks with an odd size are followed by a padding byte, which the next chunk header comes after
+    def test_skips_odd_sized_and_large_chunks(self):
+        with TemporaryDirectory() as directory:
+            chunks:bytes = make_chunk(b"LIST", b"abc") + make_fmt_chunk(WAVE_FORMAT_PCM, 1, 8000, 2) + make_chunk(b"junk", bytes(3 * HEADER_READ_SIZE + 1)) + make_chunk(b"data", bytes(range(10)))
+            write_riff(f"{directory}/song.wav", chunks)
+            info:WavInfo = read_wav_info(f"{directory}/song.wav")
+            self.assertEqual((info.channels, info.sample_width, info.frames), (1, 2, 5))
+            self.assertEqual(info.data_offset, 12 + len(chunks) - 10)
+            with map_wav_data(f"{directory}/song.wav", info) as data:
+                self.assertEqual(bytes(data), bytes(range(10)))
+
+    # A file that was cut off has less audio than its "data" chunk says, and might end partway through a frame
+    def test_truncated_data_is_rounded_down_to_whole_frames(self):
+        with TemporaryDirectory() as directory:
+            write_riff(f"{directory}/song.wav", make_fmt_chunk(WAVE_FORMAT_PCM, 2, 44100, 2) + b"data" + pack("<I", 4000) + bytes(10))
+            info:WavInfo = read_wav_info(f"{directory}/song.wav")
+            self.assertEqual((info.frames, info.data_size), (2, 8))
+
+    def test_invalid_files_raise_wav_format_error(self):
+        with TemporaryDirectory() as directory:
+            invalid_files:dict[str, bytes] = {
+                "not riff" : b"ID3\x03" + bytes(40),
+                "empty" : b"",
+                "no data chunk" : b"RIFF" + pack("<I", 28) + b"WAVE" + make_fmt_chunk(WAVE_FORMAT_PCM, 2, 44100, 2),
+                "no fmt chunk" : b"RIFF" + pack("<I", 16) + b"WAVE" + make_chunk(b"data", bytes(4)),
+                "adpcm" : b"RIFF" + pack("<I", 40) + b"WAVE" + make_fmt_chunk(0x0002, 2, 44100, 2) + make_chunk(b"data", bytes(4)),
+            }
+            for file_name, contents in invalid_files.items():
+                with open(f"{directory}/{file_name}.wav", "wb") as file:
+                    file.write(contents)
+                with self.assertRaises(WavFormatError, msg = file_name):
+                    read_wav_info(f"{directory}/{file_name}.wav")
+
+class StreamWavBlocksTests(unittest.TestCase):
+    def test_streams_whole_frames_of_the_requested_range(self):
+        with TemporaryDirectory() as directory:
+            audio:bytes = bytes(i % 256 for i in range(4 * 1000))
+            with wave.open(f"{directory}/song.wav", "wb") as file:
+                file.setnchannels(2)
+                file.setsampwidth(2)
+                file.setframerate(44100)
+                file.writeframes(audio)
+            info:WavInfo = read_wav_info(f"{directory}/song.wav")
+
+            for block_size, start_frame, end_frame in ((4096, 0, None), (1001, 0, None), (3, 10, 20), (64, 990, 5000), (64, 500, 500), (64, 2000, None)):
+                blocks:list[bytes] = [bytes(block) for block in stream_wav_blocks(f"{directory}/song.wav", info, block_size, start_frame, end_frame)]
+                self.assertTrue(all(len(block) % info.frame_size == 0 for block in blocks))
+                end:int = min(end_frame, info.frames) if end_frame != None else info.frames
+                self.assertEqual(b"".join(blocks), audio[start_frame * 4 : end * 4])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+from os import fstat
+from struct import unpack_from, pack
+from mmap import mmap, ACCESS_READ
+from contextlib import contextmanager
+from typing import NamedTuple, Iterator
+
+try:
+    from mmap import MADV_SEQUENTIAL
+except ImportError: # madvise() is only available on some platforms
+    MADV_SEQUENTIAL = None
+
+# Format tags from the "fmt " chunk of a WAV file
+WAVE_FORMAT_PCM:int = 0x0001
+WAVE_FORMAT_IEEE_FLOAT:int = 0x0003
+WAVE_FORMAT_EXTENSIBLE:int = 0xFFFE # The actual format is stored in the first 2 bytes of the extension's sub-format GUID
+SUPPORTED_FORMATS:"set[int]" = {WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT}
+
+HEADER_READ_SIZE:int = 4096 # Enough to contain the "fmt " and "data" chunk headers of almost every WAV file in a single read
+
+class WavFormatError(ValueError):
+    pass
+
+class WavInfo(NamedTuple):
+    format_tag:int # WAVE_FORMAT_PCM or WAVE_FORMAT_IEEE_FLOAT (extensible files are reported with the format of their sub-format)
+    channels:int
+    frame_rate:int
+    sample_width:int # Bytes per sample for each channel
+    frames:int
+    data_offset:int # The position of the first byte of audio in the file
+    data_size:int # The number of bytes of audio, rounded down to a whole number of frames
+
+    @property
+    def frame_size(self) -> int:
+        return self.channels * self.sample_width
+
+# Reads the RIFF chunk headers of a WAV file without reading any of the audio
+# Only the "fmt " and "data" chunks are parsed. Any other chunks are skipped over
+# Raises WavFormatError if the file isn't a WAV file, or if its samples are neither PCM nor floats
+def read_wav_info(file_name:str) -> WavInfo:
+    with open(file_name, "rb") as file:
+        file_size:int = fstat(file.fileno()).st_size
+        buffer:bytes = file.read(HEADER_READ_SIZE)
+        buffer_offset:int = 0 # The position in the file of the first byte in buffer
+
+        # Returns up to size bytes starting from position, only reading from the file if they aren't already in the buffer
+        def read_at(position:int, size:int) -> bytes:
+            nonlocal buffer, buffer_offset
+            if position < buffer_offset or position + size > buffer_offset + len(buffer):
+                file.seek(position)
+                buffer = file.read(max(size, HEADER_READ_SIZE))
+                buffer_offset = position
+            return buffer[position - buffer_offset : position - buffer_offset + size]
+
+        if len(buffer) < 12 or buffer[:4] != b"RIFF" or buffer[8:12] != b"WAVE":
+            raise WavFormatError(f"{file_name} is not a RIFF/WAVE file")
+
+        fmt:tuple[int, int, int, int, int] = None # (format tag, channels, frame rate, block align, bits per sample)
+        data_offset:int = None
+        data_size:int = None
+
+        position:int = 12 # The position in the file of the next chunk header
+        while position + 8 <= file_size and (fmt is None or data_offset is None):
+            chunk_header:bytes = read_at(position, 8)
+            if len(chunk_header) < 8:
+                break
+            chunk_id:bytes = chunk_header[:4]
+            chunk_size:int = unpack_from("<I", chunk_header, 4)[0]
+
+            if chunk_id == b"fmt ":
+                chunk:bytes = read_at(position + 8, min(chunk_size, 40))
+                if len(chunk) < 16:
+                    raise WavFormatError(f"{file_name} has an invalid \"fmt \" chunk")
+
+                format_tag, channels, frame_rate, _, block_align, bits_per_sample = unpack_from("<HHIIHH", chunk)
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(chunk) >= 40:
+                    format_tag = unpack_from("<H", chunk, 24)[0] # The first 2 bytes of the sub-format GUID
+                fmt = (format_tag, channels, frame_rate, block_align, bits_per_sample)
+
+            elif chunk_id == b"data":
+                data_offset = position + 8
+                data_size = min(chunk_size, file_size - data_offset) # The size in the header can be wrong if the file was cut off or is still being written
+
+            position += 8 + chunk_size + (chunk_size % 2) # Chunks are padded to an even number of bytes
+
+    if fmt is None or data_offset is None:
+        raise WavFormatError(f"{file_name} is missing its \"fmt \" or \"data\" chunk")
+
+    format_tag, channels, frame_rate, block_align, bits_per_sample = fmt
+    if format_tag not in SUPPORTED_FORMATS:
+        raise WavFormatError(f"{file_name} uses an unsupported format (0x{format_tag:04x})")
+    if channels <= 0 or frame_rate <= 0:
+        raise WavFormatError(f"{file_name} has invalid audio properties")
+
+    sample_width:int = block_align // channels if block_align >= channels else (bits_per_sample + 7) // 8
+    if sample_width <= 0:
+        raise WavFormatError(f"{file_name} has invalid audio properties")
+    frame_size:int = channels * sample_width
+    frames:int = data_size // frame_size
+
+    return WavInfo(format_tag, channels, frame_rate, sample_width, frames, data_offset, frames * frame_size)
+
+# Returns the headers of a WAV file with frames frames of audio in the format described by info. The audio goes right after the headers
+# Unlike the wave module, which always labels its files as PCM, this keeps the format tag, so float audio is written as float audio
+# The audio has to be followed by a padding byte if its size is odd
+def make_wav_header(info:WavInfo, frames:int) -> bytes:
+    data_size:int = frames * info.frame_size
+    fmt:bytes = pack("<HHIIHH", info.format_tag, info.channels, info.frame_rate, info.frame_rate * info.frame_size, info.frame_size, 8 * info.sample_width)
+    chunks:bytes = b"fmt " + pack("<I", len(fmt)) + fmt
+    if info.format_tag != WAVE_FORMAT_PCM: # Every format other than PCM needs the size of the format's extension (which is empty) and a "fact" chunk with the number of frames
+        chunks = b"fmt " + pack("<I", len(fmt) + 2) + fmt + pack("<H", 0)
+        chunks += b"fact" + pack("<II", 4, frames)
+    chunks += b"data" + pack("<I", data_size)
+    return b"RIFF" + pack("<I", 4 + len(chunks) + data_size + data_size % 2) + b"WAVE" + chunks
+
+# Memory-maps a WAV file and returns a memoryview of its audio, for reading any part of the audio without loading the file into memory
+# Use this with a with statement, which unmaps the file afterwards. Any views made from the returned view have to be released (or deleted) first
+@contextmanager
+def map_wav_data(file_name:str, info:WavInfo) -> "Iterator[memoryview]":
+    if info.data_size == 0: # Empty files can't be memory-mapped
+        yield memoryview(b"")
+        return
+
+    with open(file_name, "rb") as file, mmap(file.fileno(), 0, access = ACCESS_READ) as mapping:
+        if MADV_SEQUENTIAL != None:
+            mapping.madvise(MADV_SEQUENTIAL)
+
+        view:memoryview = memoryview(mapping)[info.data_offset : info.data_offset + info.data_size]
+        try:
+            yield view
+        finally:
+            view.release() # The mapping can only be closed once every view of it has been released
+
+# Yields the audio of a WAV file in blocks of up to block_size bytes, without loading the file into memory
+# The file is memory-mapped and each block is a memoryview slice of the mapping, so nothing is copied and only the pages that are being played need to be resident
+# Each block is released once the next block is requested, so don't keep a reference to a block after it's been used
+# start_frame, end_frame: the range of frames to stream. Streams until the end of the audio if end_frame is None
+def stream_wav_blocks(file_name:str, info:WavInfo, block_size:int, start_frame:int = 0, end_frame:int = None) -> "Iterator[memoryview]":
+    block_size = max(info.frame_size, block_size - block_size % info.frame_size) # Only yield whole frames
+    start:int = max(0, start_frame) * info.frame_size
+    end:int = min(end_frame, info.frames) * info.frame_size if end_frame != None else info.data_size
+    if start >= end:
+        return
+
+    with map_wav_data(file_name, info) as data:
+        for position in range(start, end, block_size):
+            block:memoryview = data[position : min(position + block_size, end)]
+            try:
+                yield block
+            finally:
+                block.release()